@@ -14,6 +14,7 @@ def create_app(config_name='development'):
     
     # Load configuration
     app.config.from_object(config[config_name])
+    app.config['CONFIG_NAME'] = config_name
     
     # Initialize extensions
     db.init_app(app)
@@ -30,6 +31,19 @@ def create_app(config_name='development'):
     app.register_blueprint(payslip_bp)
     app.register_blueprint(analytics_bp)
     
+    # Register CLI commands
+    from app.cli import payroll_cli
+    
+    app.cli.add_command(payroll_cli)
+    
+    # Background jobs left by a previous process are recovered when this one serves
+    # its first request, so CLI commands never pick them up
+    from app.services.job_service import JobService
+    
+    @app.before_request
+    def recover_jobs():
+        JobService.recover_once()
+    
     # Error handlers
     @app.errorhandler(400)
     def bad_request(error):
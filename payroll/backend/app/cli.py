@@ -0,0 +1,223 @@
+import json
+import time
+import click
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.models import PayrollRun, Employee
+
+payroll_cli = AppGroup('payroll', help='Payroll batch commands')
+
+def _draft_runs_query(month, year):
+    """Query draft payroll runs for a month"""
+    return db.session.query(PayrollRun).filter(
+        PayrollRun.month == month,
+        PayrollRun.year == year,
+        PayrollRun.status == 'draft'
+    )
+
+def plan_partitions(month, year, workers, partition_by):
+    """Split the draft runs for a month into partitions for parallel processing"""
+    if partition_by == 'department':
+        departments = _draft_runs_query(month, year).join(
+            Employee, PayrollRun.employee_id == Employee.id
+        ).with_entities(Employee.department).distinct().all()
+        return [('department', d[0]) for d in departments]
+    
+    # Equal-sized employee id ranges
+    employee_ids = [
+        row[0] for row in _draft_runs_query(month, year)
+        .with_entities(PayrollRun.employee_id)
+        .order_by(PayrollRun.employee_id)
+    ]
+    if not employee_ids:
+        return []
+    
+    size = -(-len(employee_ids) // workers)
+    return [
+        ('id_range', employee_ids[start], employee_ids[min(start + size, len(employee_ids)) - 1])
+        for start in range(0, len(employee_ids), size)
+    ]
+
+def process_partition(config_name, month, year, partition, chunk_size):
+    """Process one partition in a worker process with its own app, engine and connection"""
+    from app import create_app
+    from app.services import PayrollService
+    
+    app = create_app(config_name)
+    with app.app_context():
+        try:
+            started = time.perf_counter()
+            # One transaction per partition: a failure rolls back only this partition
+            result = PayrollService.process_month(
+                month, year, chunk_size=chunk_size, partition=partition, atomic=True
+            )
+            result['elapsed'] = time.perf_counter() - started
+            return result
+        finally:
+            db.session.remove()
+            db.engine.dispose()
+
+def _describe(partition):
+    """Human-readable partition label for progress output"""
+    if partition[0] == 'department':
+        return f"department {partition[1] or 'Unassigned'}"
+    return f"employees {partition[1]}-{partition[2]}"
+
+@payroll_cli.command('run')
+@click.option('--month', type=click.IntRange(1, 12), required=True)
+@click.option('--year', type=int, required=True)
+@click.option('--workers', type=click.IntRange(1), default=4, show_default=True)
+@click.option('--partition-by', type=click.Choice(['department', 'id-range']), default='department', show_default=True)
+@click.option('--chunk-size', type=click.IntRange(1), default=500, show_default=True)
+@click.option('--retries', type=click.IntRange(0), default=1, show_default=True,
+              help='Times to retry a failed partition')
+def run_payroll(month, year, workers, partition_by, chunk_size, retries):
+    """Process all draft payroll runs for a month across worker processes"""
+    partitions = plan_partitions(month, year, workers, partition_by.replace('-', '_'))
+    if not partitions:
+        click.echo(f'No draft payroll runs for {month}/{year}')
+        return
+    
+    config_name = current_app.config.get('CONFIG_NAME', 'default')
+    click.echo(f'Processing {month}/{year} in {len(partitions)} partitions with {workers} workers')
+    
+    # Release the parent's pooled connections before worker processes start
+    db.session.remove()
+    db.engine.dispose()
+    
+    summary = {'processed_count': 0, 'error_count': 0, 'errors': [], 'failed_partitions': []}
+    attempts = {partition: 0 for partition in partitions}
+    pending = list(partitions)
+    started = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending:
+            futures = {
+                executor.submit(process_partition, config_name, month, year, partition, chunk_size): partition
+                for partition in pending
+            }
+            pending = []
+            
+            for future in as_completed(futures):
+                partition = futures[future]
+                attempts[partition] += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if attempts[partition] <= retries:
+                        click.echo(f'  ✗ {_describe(partition)} failed ({e}), retrying')
+                        pending.append(partition)
+                    else:
+                        click.echo(f'  ✗ {_describe(partition)} failed: {e}')
+                        summary['failed_partitions'].append({'partition': list(partition), 'error': str(e)})
+                    continue
+                
+                summary['processed_count'] += result['processed_count']
+                summary['error_count'] += result['error_count']
+                summary['errors'].extend(result['errors'])
+                click.echo(
+                    f"  ✓ {_describe(partition)}: {result['processed_count']} runs "
+                    f"in {result['elapsed']:.2f}s"
+                )
+    
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f"Processed {summary['processed_count']} payroll runs in {elapsed:.2f}s "
+        f"({summary['error_count']} errors, {len(summary['failed_partitions'])} failed partitions)"
+    )
+    for error in summary['errors']:
+        click.echo(f"  - run {error['payroll_run_id']} (employee {error['employee_id']}): {error['error']}")
+    
+    if summary['failed_partitions']:
+        raise SystemExit(1)
+
+def _parse_pairs(values, option):
+    """Parse repeated NAME=NUMBER options into (name, float) pairs"""
+    pairs = []
+    for value in values:
+        name, _, number = value.rpartition('=')
+        try:
+            if not name:
+                raise ValueError(value)
+            pairs.append((name, float(number)))
+        except ValueError:
+            raise click.BadParameter(f'expected NAME=NUMBER, got {value!r}', param_hint=option)
+    return pairs
+
+@payroll_cli.command('simulate')
+@click.option('--month', type=click.IntRange(1, 12), required=True)
+@click.option('--year', type=int, required=True)
+@click.option('--overrides', 'overrides_file', type=click.File('r'),
+              help='JSON file with salary_multipliers, extra_allowances and tax_brackets')
+@click.option('--multiplier', multiple=True, metavar='DEPARTMENT=FACTOR',
+              help='Salary multiplier for a department; repeatable')
+@click.option('--allowance', multiple=True, metavar='TYPE=AMOUNT',
+              help='Extra allowance for every employee; repeatable')
+@click.option('--chunk-size', type=click.IntRange(1), default=1000, show_default=True)
+@click.option('--output', type=click.File('w'), default='-', show_default=True)
+def simulate_payroll(month, year, overrides_file, multiplier, allowance, chunk_size, output):
+    """Write a what-if payroll calculation as NDJSON without saving anything"""
+    from app.services import SimulationService
+    
+    overrides = json.load(overrides_file) if overrides_file else {}
+    multipliers = dict(overrides.get('salary_multipliers') or {})
+    multipliers.update(_parse_pairs(multiplier, '--multiplier'))
+    overrides['salary_multipliers'] = multipliers
+    overrides['extra_allowances'] = list(overrides.get('extra_allowances') or []) + [
+        {'type': name, 'amount': amount} for name, amount in _parse_pairs(allowance, '--allowance')
+    ]
+    
+    errors = SimulationService.validate_overrides(overrides)
+    if errors:
+        raise click.UsageError('; '.join(errors))
+    
+    for line in SimulationService.simulate(month, year, overrides, chunk_size=chunk_size):
+        output.write(json.dumps(line) + '\n')
+
+
+@payroll_cli.command('rebuild-summary')
+@click.option('--year', type=int, help='Only rebuild this year')
+@click.option('--month', type=click.IntRange(1, 12), help='Only rebuild this month')
+def rebuild_summary(year, month):
+    """Recompute the monthly payroll summary and salary sketches from existing payslips"""
+    from app.services import SummaryService, DistributionService
+    
+    started = time.perf_counter()
+    rows = SummaryService.rebuild(year=year, month=month)
+    sketches = DistributionService.rebuild(year=year, month=month)
+    db.session.commit()
+    click.echo(f'Rebuilt {rows} summary rows and {sketches} salary sketches in {time.perf_counter() - started:.2f}s')
+
+@payroll_cli.command('import-employees')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format (default: from the file extension)')
+@click.option('--chunk-size', type=click.IntRange(1), default=1000, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Validate without inserting')
+@click.option('--report', type=click.File('w'), help='Write every rejected row to this file as NDJSON')
+def import_employees(source, fmt, chunk_size, dry_run, report):
+    """Bulk-create employees from a CSV or NDJSON file ('-' for stdin)"""
+    from app.services import ImportService
+    
+    fmt = fmt or ('ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+    on_error = (lambda error: report.write(json.dumps(error) + '\n')) if report else None
+    started = time.perf_counter()
+    try:
+        result = ImportService.import_employees(
+            ImportService.read_rows(source, fmt), chunk_size=chunk_size, dry_run=dry_run, on_error=on_error,
+            progress=lambda imported, failed: click.echo(f'  {imported} imported, {failed} rejected')
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    
+    click.echo(
+        f"{'Validated' if dry_run else 'Imported'} {result['success_count']} employees in "
+        f"{time.perf_counter() - started:.2f}s ({result['error_count']} rejected)"
+    )
+    if not report:
+        for error in result['errors']:
+            click.echo(f"  - line {error['line']} ({error['employee_id']}): {'; '.join(error['errors'])}")
+        if result['errors_truncated']:
+            click.echo(f"  ... {result['error_count'] - len(result['errors'])} more, use --report for all")
@@ -6,8 +6,15 @@ from .deduction import Deduction
 from .payroll_run import PayrollRun
 from .payslip import Payslip
 from .payslip_detail import PayslipDetail
+from .tax_bracket import TaxBracket
+from .job import Job
+from .payroll_checkpoint import PayrollCheckpoint
+from .payroll_monthly_summary import PayrollMonthlySummary
+from .payroll_distribution_sketch import PayrollDistributionSketch
 
 __all__ = [
     'User', 'Employee', 'Salary', 'Allowance', 'Deduction',
-    'PayrollRun', 'Payslip', 'PayslipDetail'
+    'PayrollRun', 'Payslip', 'PayslipDetail', 'TaxBracket',
+    'Job', 'PayrollCheckpoint', 'PayrollMonthlySummary',
+    'PayrollDistributionSketch'
 ]
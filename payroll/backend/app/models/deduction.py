@@ -13,6 +13,10 @@ class Deduction(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
+    __table_args__ = (
+        db.Index('idx_deductions_updated_at', 'updated_at'),
+    )
+    
     # Relationships
     employee = db.relationship('Employee', back_populates='deductions')
     
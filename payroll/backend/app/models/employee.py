@@ -42,13 +42,17 @@ class Employee(db.Model):
     payslips = db.relationship('Payslip', back_populates='employee', cascade='all, delete-orphan')
     payroll_runs = db.relationship('PayrollRun', back_populates='employee', cascade='all, delete-orphan')
     
-    def to_dict(self):
-        # Get current salary
-        current_salary = None
-        for salary in self.salaries:
-            if salary.end_date is None or salary.end_date >= db.func.current_date():
-                current_salary = salary.basic_salary
-                break
+    def to_dict(self, current_salaries=None):
+        """Serialize the employee with its current basic salary
+        
+        Lists should pass current_salaries ({employee_id: basic_salary} from
+        PayrollService.current_salaries for the whole page); otherwise this
+        employee's salary is looked up on its own.
+        """
+        if current_salaries is None:
+            from app.services.payroll_service import PayrollService
+            current_salaries = PayrollService.current_salaries([self.id])
+        current_salary = current_salaries.get(self.id)
         
         return {
             'id': self.id,
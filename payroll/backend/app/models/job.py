@@ -0,0 +1,48 @@
+from datetime import datetime
+from app import db
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued, running, succeeded, failed
+    params = db.Column(db.JSON)
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    errors = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    worker = db.Column(db.String(100))  # host:pid of the process running the job
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    def throughput(self):
+        """Items processed per second since the job started"""
+        if not self.started_at or not self.processed:
+            return 0.0
+        elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+        return round(self.processed / elapsed, 2) if elapsed > 0 else 0.0
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'params': self.params or {},
+            'progress': {
+                'total': self.total or 0,
+                'processed': self.processed or 0,
+                'failed': self.failed or 0,
+                'percent': round(100.0 * (self.processed or 0) / self.total, 1) if self.total else 0.0
+            },
+            'throughput_per_second': self.throughput(),
+            'errors': self.errors or [],
+            'result': self.result,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
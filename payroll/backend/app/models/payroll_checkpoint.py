@@ -0,0 +1,31 @@
+from app import db
+
+class PayrollCheckpoint(db.Model):
+    __tablename__ = 'payroll_checkpoints'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    operation = db.Column(db.String(50), nullable=False)  # bulk_create, process_month
+    month = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer)  # last employee id (bulk_create) or payroll run id (process_month, up to the first failed chunk) done
+    processed_count = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='in_progress', nullable=False)  # in_progress, completed, incomplete
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.UniqueConstraint('operation', 'month', 'year', name='uk_payroll_checkpoints_operation_month_year'),
+    )
+    
+    def to_dict(self):
+        return {
+            'operation': self.operation,
+            'month': self.month,
+            'year': self.year,
+            'last_id': self.last_id,
+            'processed_count': self.processed_count or 0,
+            'error_count': self.error_count or 0,
+            'status': self.status,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
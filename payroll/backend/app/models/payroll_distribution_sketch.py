@@ -0,0 +1,31 @@
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
+from app import db
+
+class PayrollDistributionSketch(db.Model):
+    """Quantile sketch of one payslip amount per payroll month and department"""
+    __tablename__ = 'payroll_distribution_sketches'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    # Current department of the payslip's employee; '' for none
+    department = db.Column(db.String(100), nullable=False, default='')
+    metric = db.Column(db.String(50), nullable=False)  # net_salary, gross_salary
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+    # QuantileSketch.to_dict() as JSON; MEDIUMTEXT on MySQL as in the migration
+    sketch = db.Column(db.Text().with_variant(MEDIUMTEXT(), 'mysql'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', 'department', 'metric', name='uk_payroll_distribution_sketches_key'),
+    )
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'department': self.department or None,
+            'metric': self.metric,
+            'value_count': self.value_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,46 @@
+from app import db
+
+class PayrollMonthlySummary(db.Model):
+    """Running aggregates of payslips per payroll month and department"""
+    __tablename__ = 'payroll_monthly_summary'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    # Current department of the payslip's employee; '' for none
+    department = db.Column(db.String(100), nullable=False, default='')
+    payslip_count = db.Column(db.Integer, nullable=False, default=0)
+    net_sum = db.Column(db.Double, nullable=False, default=0.0)
+    net_min = db.Column(db.Double)
+    net_max = db.Column(db.Double)
+    net_sumsq = db.Column(db.Double, nullable=False, default=0.0)
+    gross_sum = db.Column(db.Double, nullable=False, default=0.0)
+    gross_min = db.Column(db.Double)
+    gross_max = db.Column(db.Double)
+    gross_sumsq = db.Column(db.Double, nullable=False, default=0.0)
+    tax_sum = db.Column(db.Double, nullable=False, default=0.0)
+    tax_min = db.Column(db.Double)
+    tax_max = db.Column(db.Double)
+    tax_sumsq = db.Column(db.Double, nullable=False, default=0.0)
+    deductions_sum = db.Column(db.Double, nullable=False, default=0.0)
+    deductions_min = db.Column(db.Double)
+    deductions_max = db.Column(db.Double)
+    deductions_sumsq = db.Column(db.Double, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', 'department', name='uk_payroll_monthly_summary_year_month_department'),
+    )
+    
+    def to_dict(self):
+        data = {
+            'year': self.year,
+            'month': self.month,
+            'department': self.department or None,
+            'payslip_count': self.payslip_count,
+        }
+        for metric in ('net', 'gross', 'tax', 'deductions'):
+            for stat in ('sum', 'min', 'max', 'sumsq'):
+                value = getattr(self, f'{metric}_{stat}')
+                data[f'{metric}_{stat}'] = float(value) if value is not None else None
+        return data
@@ -11,6 +11,8 @@ class PayrollRun(db.Model):
     deductions = db.Column(db.Float, default=0.0)
     net_salary = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='draft', nullable=False)
+    # Set when a salary change affects a draft run
+    needs_recalculation = db.Column(db.Boolean, default=False, nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
@@ -18,6 +20,8 @@ class PayrollRun(db.Model):
     # Add unique constraint for one payroll per employee per month
     __table_args__ = (
         db.UniqueConstraint('employee_id', 'month', 'year', name='uk_payroll_runs_employee_month_year'),
+        db.Index('idx_payroll_runs_needs_recalculation', 'needs_recalculation', 'status'),
+        db.Index('idx_payroll_runs_year_month_id', 'year', 'month', 'id'),
     )
     
     # Relationships
@@ -36,5 +40,6 @@ class PayrollRun(db.Model):
             'deductions': float(self.deductions) if self.deductions is not None else 0.0,
             'net_salary': float(self.net_salary) if self.net_salary is not None else 0.0,
             'status': self.status,
+            'needs_recalculation': bool(self.needs_recalculation),
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
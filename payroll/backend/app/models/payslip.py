@@ -18,6 +18,11 @@ class Payslip(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
+    # Keyset pagination order of the payslip list
+    __table_args__ = (
+        db.Index('idx_payslips_created_at_id', 'created_at', 'id'),
+    )
+    
     # Relationships
     payroll_run = db.relationship('PayrollRun', back_populates='payslips')
     employee = db.relationship('Employee', back_populates='payslips')
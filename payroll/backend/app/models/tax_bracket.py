@@ -0,0 +1,25 @@
+from app import db
+
+class TaxBracket(db.Model):
+    __tablename__ = 'tax_brackets'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jurisdiction = db.Column(db.String(50), nullable=False, default='default')
+    year = db.Column(db.Integer, nullable=False)
+    upper_bound = db.Column(db.Float)  # NULL for the open-ended top bracket
+    rate = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.Index('idx_tax_brackets_jurisdiction_year', 'jurisdiction', 'year'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jurisdiction': self.jurisdiction,
+            'year': self.year,
+            'upper_bound': float(self.upper_bound) if self.upper_bound is not None else None,
+            'rate': float(self.rate)
+        }
@@ -1,13 +1,79 @@
+from functools import wraps
+from urllib.parse import urlencode
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Payslip, User, PayrollRun, Employee
-from sqlalchemy import func, extract
+from app.models import User, Employee, PayrollMonthlySummary
+from app.services.analytics_cache import get_analytics_cache
+from app.services.analytics_engine import get_analytics_engine, GROUPABLE, METRICS, STATS, DIMENSIONS
+from app.services.distribution_service import DistributionService, SKETCH_METRICS
+from sqlalchemy import func
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
+def cached(view):
+    """Serve an analytics handler's 200 responses from the analytics cache
+    
+    Entries are keyed by endpoint and query string and dropped whenever payslips,
+    payroll runs or employees are committed. Access is checked before the cache is read.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_analytics_cache()
+        if cache is None:
+            return view(*args, **kwargs)
+        
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or not user.can_view_analytics():
+            return view(*args, **kwargs)
+        
+        key = f"{request.endpoint}?{urlencode(sorted(request.args.items(multi=True)))}"
+        body = cache.get(key)
+        if body is not None:
+            return body, 200
+        
+        # A commit while the view runs moves the generation on and the result isn't stored
+        generation = cache.generation()
+        body, status = view(*args, **kwargs)
+        if status == 200:
+            cache.set(key, body, generation)
+        return body, status
+    return wrapper
+
+def net_totals(group_by=(), year=None, month=None):
+    """(group values..., payslip count, net total) rows, grouped by year, month or department
+    
+    Reads the in-memory analytics engine, or the monthly summary table when the
+    engine is disabled.
+    """
+    engine = get_analytics_engine()
+    if engine is not None:
+        filters = {'year': year, 'month': month} if year and month else {}
+        return [
+            tuple(row[name] for name in group_by) + (row['count'], row['net_salary_sum'])
+            for row in engine.aggregate(group_by, ('net_salary',), ('count', 'sum'), filters)
+        ]
+    
+    columns = [getattr(PayrollMonthlySummary, name) for name in group_by]
+    query = db.session.query(
+        *columns,
+        func.sum(PayrollMonthlySummary.payslip_count),
+        func.sum(PayrollMonthlySummary.net_sum)
+    )
+    
+    if year and month:
+        query = query.filter(
+            PayrollMonthlySummary.year == year,
+            PayrollMonthlySummary.month == month
+        )
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    
+    return [tuple(r[:-2]) + (int(r[-2] or 0), float(r[-1] or 0)) for r in query.all()]
+
 @analytics_bp.route('/summary', methods=['GET'])
 @jwt_required()
+@cached
 def get_summary():
     """Get overall payroll summary"""
     current_user_id = get_jwt_identity()
@@ -19,17 +85,9 @@ def get_summary():
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
     
-    query = Payslip.query
-    
-    if year and month:
-        query = query.join(PayrollRun).filter(
-            PayrollRun.year == year,
-            PayrollRun.month == month
-        )
-    
-    total_payroll = db.session.query(func.sum(Payslip.net_salary)).select_from(query).scalar() or 0
+    totals = net_totals(year=year, month=month)
+    total_payslips, total_payroll = totals[0] if totals else (0, 0)
     total_employees = Employee.query.filter_by(is_active=True).count()
-    total_payslips = query.count()
     
     return {
         'total_payroll': float(total_payroll),
@@ -40,6 +98,7 @@ def get_summary():
 
 @analytics_bp.route('/department-distribution', methods=['GET'])
 @jwt_required()
+@cached
 def get_department_distribution():
     """Get salary distribution by department"""
     current_user_id = get_jwt_identity()
@@ -51,25 +110,13 @@ def get_department_distribution():
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
     
-    query = db.session.query(
-        Employee.department,
-        func.count(Payslip.id).label('count'),
-        func.sum(Payslip.net_salary).label('total')
-    ).join(Payslip).join(PayrollRun)
-    
-    if year and month:
-        query = query.filter(
-            PayrollRun.year == year,
-            PayrollRun.month == month
-        )
-    
-    results = query.group_by(Employee.department).all()
+    results = net_totals(('department',), year, month)
     
     return {
         'departments': [
             {
                 'department': r[0] or 'Unassigned',
-                'employee_count': r[1],
+                'employee_count': int(r[1]),
                 'total_salary': float(r[2])
             }
             for r in results
@@ -78,6 +125,7 @@ def get_department_distribution():
 
 @analytics_bp.route('/monthly-trend', methods=['GET'])
 @jwt_required()
+@cached
 def get_monthly_trend():
     """Get monthly payroll trends"""
     current_user_id = get_jwt_identity()
@@ -86,23 +134,190 @@ def get_monthly_trend():
     if not user or not user.can_view_analytics():
         return {'error': 'Unauthorized'}, 401
     
-    results = db.session.query(
-        PayrollRun.year,
-        PayrollRun.month,
-        func.sum(Payslip.net_salary).label('total'),
-        func.count(Payslip.id).label('count')
-    ).join(Payslip).group_by(
-        PayrollRun.year, PayrollRun.month
-    ).order_by(PayrollRun.year, PayrollRun.month).all()
+    results = net_totals(('year', 'month'))
     
     return {
         'trends': [
             {
                 'year': r[0],
                 'month': r[1],
-                'total_payroll': float(r[2]),
-                'employee_count': r[3]
+                'total_payroll': float(r[3]),
+                'employee_count': int(r[2])
             }
             for r in results
         ]
     }, 200
+
+@analytics_bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+@cached
+def get_dashboard():
+    """Get the summary, department distribution and monthly trend in one response
+    
+    All three views are rolled up from one (year, month, department) aggregate, so the
+    request makes at most three queries: the user, the aggregate from the monthly summary
+    table (none while the analytics engine is current) and the active employee count.
+    year and month (alone or together) filter the summary and departments; trend_months
+    limits the trend to that many calendar months ending at the selected period or the
+    latest month with payslips.
+    """
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_view_analytics():
+        return {'error': 'Unauthorized'}, 401
+    
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    trend_months = request.args.get('trend_months', type=int)
+    if trend_months is not None and trend_months < 1:
+        return {'error': 'trend_months must be a positive integer'}, 400
+    
+    total_payslips = total_payroll = 0
+    departments = {}
+    trends = {}
+    for row_year, row_month, department, count, total in net_totals(('year', 'month', 'department')):
+        trend = trends.setdefault((row_year, row_month), [0, 0])
+        trend[0] += count
+        trend[1] += total
+        if (year and row_year != year) or (month and row_month != month):
+            continue
+        total_payslips += count
+        total_payroll += total
+        entry = departments.setdefault(department or 'Unassigned', [0, 0])
+        entry[0] += count
+        entry[1] += total
+    
+    periods = sorted(trends)
+    if trend_months and periods:
+        # A window of calendar months: months without payslips still use up the window
+        end_year, end_month = (year, month or 12) if year else periods[-1]
+        end = end_year * 12 + end_month
+        periods = [
+            (row_year, row_month) for row_year, row_month in periods
+            if end - trend_months < row_year * 12 + row_month <= end
+        ]
+    
+    total_employees = Employee.query.filter_by(is_active=True).count()
+    
+    return {
+        'summary': {
+            'total_payroll': float(total_payroll),
+            'total_employees': total_employees,
+            'total_payslips': total_payslips,
+            'average_salary': float(total_payroll / total_employees) if total_employees > 0 else 0
+        },
+        'departments': [
+            {'department': department, 'employee_count': int(count), 'total_salary': float(total)}
+            for department, (count, total) in sorted(departments.items())
+        ],
+        'trends': [
+            {'year': period[0], 'month': period[1], 'total_payroll': float(trends[period][1]),
+             'employee_count': int(trends[period][0])}
+            for period in periods
+        ]
+    }, 200
+
+def _list_arg(name, default=()):
+    """Comma-separated and repeated query parameter values"""
+    values = [value.strip() for arg in request.args.getlist(name) for value in arg.split(',')]
+    return [value for value in values if value] or list(default)
+
+@analytics_bp.route('/query', methods=['GET'])
+@jwt_required()
+@cached
+def query_payslips():
+    """Group, filter and aggregate payslips in memory
+    
+    group_by, metrics and stats take comma-separated names; year, month, department,
+    employment_type and gender filter (repeat or comma-separate for several values).
+    """
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_view_analytics():
+        return {'error': 'Unauthorized'}, 401
+    
+    engine = get_analytics_engine()
+    if engine is None:
+        return {'error': 'Analytics engine is disabled'}, 503
+    
+    group_by = _list_arg('group_by')
+    metrics = _list_arg('metrics', ['net_salary'])
+    stats = _list_arg('stats', ['count', 'sum', 'mean'])
+    for name, values, allowed in (('group_by', group_by, GROUPABLE), ('metrics', metrics, METRICS),
+                                  ('stats', stats, STATS)):
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            return {'error': f"Unknown {name}: {', '.join(unknown)}; expected one of {', '.join(allowed)}"}, 400
+    
+    filters = {}
+    for name in ('year', 'month'):
+        values = _list_arg(name)
+        if values:
+            try:
+                filters[name] = [int(value) for value in values]
+            except ValueError:
+                return {'error': f'{name} must be an integer'}, 400
+    for name in DIMENSIONS:
+        values = _list_arg(name)
+        if values:
+            filters[name] = values
+    
+    rows = engine.aggregate(tuple(group_by), tuple(metrics), tuple(stats), filters)
+    return {'rows': rows}, 200
+
+@analytics_bp.route('/distribution', methods=['GET'])
+@jwt_required()
+@cached
+def get_distribution():
+    """Percentiles and histogram of net or gross salary from merged quantile sketches
+    
+    Percentiles are within relative_accuracy of the exact values (see QuantileSketch);
+    group_by is department or month, and year, month and department filter.
+    """
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_view_analytics():
+        return {'error': 'Unauthorized'}, 401
+    
+    metric = request.args.get('metric', 'net_salary')
+    if metric not in SKETCH_METRICS:
+        return {'error': f"Unknown metric: {metric}; expected one of {', '.join(SKETCH_METRICS)}"}, 400
+    
+    group_by = request.args.get('group_by') or None
+    if group_by not in (None, 'department', 'month'):
+        return {'error': 'group_by must be department or month'}, 400
+    
+    try:
+        percentiles = [float(value) for value in _list_arg('percentiles', ['10', '25', '50', '75', '90'])]
+        bins = request.args.get('bins', 10, type=int)
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+    except ValueError:
+        return {'error': 'percentiles must be numbers'}, 400
+    if any(not 0 <= p <= 100 for p in percentiles):
+        return {'error': 'percentiles must be between 0 and 100'}, 400
+    if not 1 <= bins <= 100:
+        return {'error': 'bins must be between 1 and 100'}, 400
+    
+    return DistributionService.distribution(
+        metric, percentiles, bins, group_by=group_by, year=year, month=month,
+        department=request.args.get('department')
+    ), 200
+
+@analytics_bp.route('/cache/metrics', methods=['GET'])
+@jwt_required()
+def get_cache_metrics():
+    """Get analytics cache hit and miss counters for this worker"""
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_view_analytics():
+        return {'error': 'Unauthorized'}, 401
+    
+    cache = get_analytics_cache()
+    if cache is None:
+        return {'enabled': False}, 200
+    return {'enabled': True, **cache.metrics()}, 200
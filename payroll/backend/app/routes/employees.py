@@ -2,11 +2,24 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app import db
 from app.models import Employee, User, Salary, Allowance, Deduction
+from app.services.interval_index import get_compensation_index
+from app.services.payroll_service import PayrollService
+from app.services.pagination import keyset_paginate
+from app.services.facet_service import FacetService
+from app.services.import_service import (
+    ImportService, EMAIL_PATTERN, PHONE_PATTERN, GENDERS, MARITAL_STATUSES, EMPLOYMENT_TYPES
+)
+from app.services.search_index import get_search_index
 from datetime import date
-import re
+import io
 
 employee_bp = Blueprint('employees', __name__, url_prefix='/api/employees')
 
+# Above this many search-index matches the list filter falls back to ILIKE
+SEARCH_FILTER_LIMIT = 1000
+# search_mode values of the employee list: ILIKE substring match, or the word index
+SEARCH_MODES = ('substring', 'index')
+
 def validate_employee_data(data, is_update=False):
     """Validate employee input data"""
     errors = []
@@ -20,15 +33,13 @@ def validate_employee_data(data, is_update=False):
     
     # Email validation
     if data.get('email'):
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, data['email']):
+        if not EMAIL_PATTERN.match(data['email']):
             errors.append('Invalid email format')
     
     # Phone validation (if provided)
     if data.get('phone'):
         # Allow various phone formats, basic validation
-        phone_pattern = r'^[+]?[\d\s\-\(\)]{10,20}$'
-        if not re.match(phone_pattern, data['phone']):
+        if not PHONE_PATTERN.match(data['phone']):
             errors.append('Invalid phone format')
     
     # Date validations
@@ -49,37 +60,38 @@ def validate_employee_data(data, is_update=False):
     
     # Gender validation
     if data.get('gender'):
-        valid_genders = ['Male', 'Female', 'Other', 'Prefer not to say']
-        if data['gender'] not in valid_genders:
+        if data['gender'] not in GENDERS:
             errors.append('Invalid gender value')
     
     # Marital status validation
     if data.get('marital_status'):
-        valid_statuses = ['Single', 'Married', 'Divorced', 'Widowed', 'Separated']
-        if data['marital_status'] not in valid_statuses:
+        if data['marital_status'] not in MARITAL_STATUSES:
             errors.append('Invalid marital status')
     
     # Employment type validation
     if data.get('employment_type'):
-        valid_types = ['Full-time', 'Part-time', 'Contract', 'Temporary', 'Intern']
-        if data['employment_type'] not in valid_types:
+        if data['employment_type'] not in EMPLOYMENT_TYPES:
             errors.append('Invalid employment type')
     
     # Salary validation
     if data.get('basic_salary'):
-        try:
-            salary = float(data['basic_salary'])
-            if salary < 0:
-                errors.append('Salary cannot be negative')
-        except (ValueError, TypeError):
-            errors.append('Invalid salary format')
+        errors.extend(ImportService.salary_errors(data['basic_salary']))
     
     return errors
 
 @employee_bp.route('', methods=['GET'])
 @jwt_required()
 def get_employees():
-    """Get all employees with advanced pagination, search and filtering"""
+    """Get all employees with advanced pagination, search and filtering
+    
+    Pass cursor (empty for the first page, then next_cursor or prev_cursor) instead
+    of page for keyset pagination; include_total=true adds the total count.
+    facets=department,employment_type,gender (or all) adds a summary with counts
+    per value over the filtered employees; without it no counts are run and there
+    is no summary (it used to be returned on every call).
+    search matches substrings; search_mode=index matches words, prefixes and typos
+    through the search index instead.
+    """
     current_user_id = int(get_jwt_identity())
     user = User.query.get(current_user_id)
     
@@ -95,6 +107,9 @@ def get_employees():
         
         # Search parameters
         search = request.args.get('search', '', type=str)
+        search_mode = request.args.get('search_mode', 'substring', type=str)
+        if search_mode not in SEARCH_MODES:
+            return {'error': f"Invalid search_mode. Use {' or '.join(SEARCH_MODES)}"}, 400
         department = request.args.get('department', '', type=str)
         employment_type = request.args.get('employment_type', '', type=str)
         gender = request.args.get('gender', '', type=str)
@@ -107,17 +122,31 @@ def get_employees():
         sort_by = request.args.get('sort_by', 'name', type=str)
         sort_order = request.args.get('sort_order', 'asc', type=str)
         
+        # Facet counts, only when asked for
+        try:
+            facets = FacetService.parse(request.args.get('facets', '', type=str))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
         query = Employee.query.filter_by(is_active=True)  # Only active employees
         
-        # Apply search filter
+        # Apply search filter: ILIKE, or ids from the search index when asked for; the index
+        # falls back to ILIKE when it is off, the term is too broad or it finds nothing
         if search:
-            query = query.filter(db.or_(
-                Employee.name.ilike(f'%{search}%'),
-                Employee.email.ilike(f'%{search}%'),
-                Employee.employee_id.ilike(f'%{search}%'),
-                Employee.position.ilike(f'%{search}%'),
-                Employee.address.ilike(f'%{search}%')
-            ))
+            matches = None
+            if search_mode == 'index':
+                index = get_search_index()
+                matches = index.match_ids(search, SEARCH_FILTER_LIMIT) if index is not None else None
+            if matches:
+                query = query.filter(Employee.id.in_(matches))
+            else:
+                query = query.filter(db.or_(
+                    Employee.name.ilike(f'%{search}%'),
+                    Employee.email.ilike(f'%{search}%'),
+                    Employee.employee_id.ilike(f'%{search}%'),
+                    Employee.position.ilike(f'%{search}%'),
+                    Employee.address.ilike(f'%{search}%')
+                ))
         
         # Apply filters
         if department:
@@ -151,15 +180,60 @@ def get_employees():
             else:
                 query = query.order_by(sort_column.asc())
         
+        filters = {
+            'search': search,
+            'search_mode': search_mode,
+            'department': department,
+            'employment_type': employment_type,
+            'gender': gender,
+            'hire_date_from': hire_date_from,
+            'hire_date_to': hire_date_to
+        }
+        
+        # Counts for the filtered results in one grouped query
+        summary = {}
+        if facets:
+            counts = FacetService.counts(query.whereclause, facets)
+            summary['summary'] = {'total_filtered': counts['total']}
+            for name in facets:
+                summary['summary'][f'{name}s'] = [
+                    {'name': value, 'count': count} for value, count in counts[name] if value
+                ]
+        
+        # Keyset pagination on (sort column, id): pass cursor instead of page
+        if 'cursor' in request.args:
+            columns = [Employee.id]
+            if sort_by in valid_sort_fields and sort_by != 'id':
+                columns.insert(0, getattr(Employee, sort_by))
+            try:
+                employees = keyset_paginate(
+                    query, columns, descending=sort_order.lower() == 'desc',
+                    cursor=request.args.get('cursor'), per_page=per_page,
+                    with_total=request.args.get('include_total', 'false').lower() == 'true'
+                )
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            
+            salaries = PayrollService.current_salaries([emp.id for emp in employees.items])
+            return {
+                'employees': [emp.to_dict(salaries) for emp in employees.items],
+                'pagination': {
+                    'total': employees.total,
+                    'per_page': per_page,
+                    'next_cursor': employees.next_cursor,
+                    'prev_cursor': employees.prev_cursor
+                },
+                'filters': filters,
+                **summary
+            }, 200
+        
         employees = query.paginate(page=page, per_page=per_page, error_out=False)
         
-        # Get summary statistics for the filtered results
-        total_count = query.count()
-        departments = db.session.query(Employee.department, db.func.count(Employee.id)).filter(query.whereclause).group_by(Employee.department).all()
-        employment_types = db.session.query(Employee.employment_type, db.func.count(Employee.id)).filter(query.whereclause).group_by(Employee.employment_type).all()
+        # Current salaries for the whole page in one lookup
+        salaries = PayrollService.current_salaries([emp.id for emp in employees.items])
         
         return {
-            'employees': [emp.to_dict() for emp in employees.items],
+            'employees': [emp.to_dict(salaries) for emp in employees.items],
             'pagination': {
                 'total': employees.total,
                 'pages': employees.pages,
@@ -168,25 +242,57 @@ def get_employees():
                 'has_next': employees.has_next,
                 'has_prev': employees.has_prev
             },
-            'filters': {
-                'search': search,
-                'department': department,
-                'employment_type': employment_type,
-                'gender': gender,
-                'hire_date_from': hire_date_from,
-                'hire_date_to': hire_date_to
-            },
-            'summary': {
-                'total_filtered': total_count,
-                'departments': [{'name': d[0], 'count': d[1]} for d in departments if d[0]],
-                'employment_types': [{'name': e[0], 'count': e[1]} for e in employment_types if e[0]]
-            }
+            'filters': filters,
+            **summary
         }, 200
     
     except Exception as e:
         print(f"DEBUG GET: Error in get_employees: {e}")  # Debug
         return {'error': f'Failed to fetch employees: {str(e)}'}, 500
 
+@employee_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_employees():
+    """Ranked employee search by name, employee id, email, position and address
+    
+    Matches word prefixes and, in names and positions, single typos. Without the
+    search index (EMPLOYEE_SEARCH_ENABLED=false) it falls back to unranked ILIKE.
+    """
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_manage_employees():
+        return {'error': 'Unauthorized'}, 401
+    
+    term = request.args.get('q', '', type=str).strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    include_inactive = request.args.get('include_inactive', 'false').lower() == 'true'
+    if not term:
+        return {'error': 'q is required'}, 400
+    
+    index = get_search_index()
+    if index is not None:
+        ranked = index.search(term, limit=limit, active_only=not include_inactive)
+        employees = {emp.id: emp for emp in Employee.query.filter(Employee.id.in_([eid for eid, _ in ranked]))}
+        results = [(employees[eid], score) for eid, score in ranked if eid in employees]
+    else:
+        query = Employee.query.filter(db.or_(
+            Employee.name.ilike(f'%{term}%'),
+            Employee.email.ilike(f'%{term}%'),
+            Employee.employee_id.ilike(f'%{term}%'),
+            Employee.position.ilike(f'%{term}%'),
+            Employee.address.ilike(f'%{term}%')
+        ))
+        if not include_inactive:
+            query = query.filter_by(is_active=True)
+        results = [(emp, None) for emp in query.order_by(Employee.name).limit(limit)]
+    
+    salaries = PayrollService.current_salaries([emp.id for emp, _ in results])
+    return {
+        'query': term,
+        'employees': [dict(emp.to_dict(salaries), score=score) for emp, score in results]
+    }, 200
+
 @employee_bp.route('/<int:employee_id>', methods=['GET'])
 @jwt_required()
 def get_employee(employee_id):
@@ -206,31 +312,47 @@ def get_employee(employee_id):
         # Get base employee data
         data = employee.to_dict()
         
-        # Get current salary details
-        current_salary = Salary.query.filter(
-            Salary.employee_id == employee_id,
-            db.or_(Salary.end_date.is_(None), Salary.end_date >= date.today())
-        ).first()
+        today = date.today()
+        index = get_compensation_index()
         
-        data['current_salary'] = current_salary.to_dict() if current_salary else None
+        # Get current salary details
+        if index is not None:
+            salary_index = index.for_model(Salary)
+            current_salary = salary_index.latest_active(employee_id, today, date.max)
+            data['current_salary'] = salary_index.to_dict(current_salary) if current_salary else None
+        else:
+            current_salary = Salary.query.filter(
+                Salary.employee_id == employee_id,
+                db.or_(Salary.end_date.is_(None), Salary.end_date >= today)
+            ).first()
+            data['current_salary'] = current_salary.to_dict() if current_salary else None
         
         # Get salary history (last 12 months or all if less than 12)
         salary_history = Salary.query.filter_by(employee_id=employee_id).order_by(Salary.start_date.desc()).limit(12).all()
         data['salary_history'] = [s.to_dict() for s in salary_history]
         
-        # Get active allowances
-        allowances = Allowance.query.filter(
-            Allowance.employee_id == employee_id,
-            db.or_(Allowance.end_date.is_(None), Allowance.end_date >= date.today())
-        ).all()
-        data['allowances'] = [a.to_dict() for a in allowances]
-        
-        # Get active deductions
-        deductions = Deduction.query.filter(
-            Deduction.employee_id == employee_id,
-            db.or_(Deduction.end_date.is_(None), Deduction.end_date >= date.today())
-        ).all()
-        data['deductions'] = [d.to_dict() for d in deductions]
+        # Get active allowances and deductions
+        if index is not None:
+            allowance_index = index.for_model(Allowance)
+            deduction_index = index.for_model(Deduction)
+            data['allowances'] = [
+                allowance_index.to_dict(a) for a in allowance_index.active(employee_id, today, date.max)
+            ]
+            data['deductions'] = [
+                deduction_index.to_dict(d) for d in deduction_index.active(employee_id, today, date.max)
+            ]
+        else:
+            allowances = Allowance.query.filter(
+                Allowance.employee_id == employee_id,
+                db.or_(Allowance.end_date.is_(None), Allowance.end_date >= today)
+            ).all()
+            data['allowances'] = [a.to_dict() for a in allowances]
+            
+            deductions = Deduction.query.filter(
+                Deduction.employee_id == employee_id,
+                db.or_(Deduction.end_date.is_(None), Deduction.end_date >= today)
+            ).all()
+            data['deductions'] = [d.to_dict() for d in deductions]
         
         # Get recent payroll runs (last 6 months)
         from app.models.payroll_run import PayrollRun
@@ -243,8 +365,8 @@ def get_employee(employee_id):
         data['payslips_count'] = payslips_count
         
         # Calculate summary statistics
-        total_allowances = sum(a.amount for a in allowances if a.is_fixed)
-        total_deductions = sum(d.amount for d in deductions if d.is_fixed)
+        total_allowances = sum(a['amount'] for a in data['allowances'] if a['is_fixed'])
+        total_deductions = sum(d['amount'] for d in data['deductions'] if d['is_fixed'])
         
         data['summary'] = {
             'total_allowances': float(total_allowances),
@@ -345,6 +467,63 @@ def create_employee():
         db.session.rollback()
         return {'error': f'Database error: {str(e)}'}, 422
 
+@employee_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_employees():
+    """Bulk-create employees from a CSV or NDJSON upload
+    
+    Send the file as multipart field 'file' or as the raw request body; format is
+    csv or ndjson (default: from the file extension or content type). Columns are
+    the create fields plus basic_salary. Valid rows are inserted in chunks and every
+    invalid row is listed by line; dry_run=true only validates. If a chunk fails, the
+    error response still counts the rows committed before it.
+    """
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or user.role not in ['admin', 'finance']:
+        return {'error': 'Unauthorized'}, 401
+    
+    upload = request.files.get('file')
+    source = upload.stream if upload else request.stream
+    name = (upload.filename if upload else '') or ''
+    content_type = (upload.mimetype if upload else request.mimetype) or ''
+    fmt = request.args.get('format', type=str)
+    if not fmt:
+        fmt = 'ndjson' if name.endswith(('.ndjson', '.jsonl')) or 'json' in content_type else 'csv'
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    chunk_size = request.args.get('chunk_size', 1000, type=int)
+    
+    if chunk_size < 1:
+        return {'error': 'chunk_size must be positive'}, 400
+    
+    # Decoded as it is read, so the upload is never held in memory at once
+    stream = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    # Filled in as chunks commit: on a failure, the rows already imported are still reported
+    result = {}
+    try:
+        rows = ImportService.read_rows(stream, fmt)
+        ImportService.import_employees(rows, chunk_size=chunk_size, dry_run=dry_run, result=result)
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return {'error': str(e), **result}, 400
+    except Exception as e:
+        db.session.rollback()
+        return {'error': f'Database error: {str(e)}', **result}, 500
+    finally:
+        stream.detach()
+    
+    if dry_run:
+        return {
+            'message': f"Would import {result['success_count']} employees",
+            **result
+        }, 200
+    
+    return {
+        'message': f"Imported {result['success_count']} employees",
+        **result
+    }, 201
+
 @employee_bp.route('/<int:employee_id>', methods=['PUT'])
 @jwt_required()
 def update_employee(employee_id):
@@ -465,52 +644,22 @@ def get_employee_options():
         if not user or not user.can_manage_employees():
             return {'error': 'Unauthorized'}, 401
         
-        # Get unique departments
-        departments = db.session.query(Employee.department).filter(
-            Employee.department.isnot(None),
-            Employee.is_active == True
-        ).distinct().all()
-        
-        # Get unique employment types
-        employment_types = db.session.query(Employee.employment_type).filter(
-            Employee.employment_type.isnot(None),
-            Employee.is_active == True
-        ).distinct().all()
-        
-        # Get employee statistics
-        total_employees = Employee.query.filter_by(is_active=True).count()
-        
-        # Department distribution
-        dept_stats = db.session.query(
-            Employee.department, 
-            db.func.count(Employee.id).label('count')
-        ).filter_by(is_active=True).group_by(Employee.department).all()
-        
-        # Gender distribution
-        gender_stats = db.session.query(
-            Employee.gender,
-            db.func.count(Employee.id).label('count')
-        ).filter_by(is_active=True).group_by(Employee.gender).all()
-        
-        # Employment type distribution
-        employment_stats = db.session.query(
-            Employee.employment_type,
-            db.func.count(Employee.id).label('count')
-        ).filter_by(is_active=True).group_by(Employee.employment_type).all()
+        # Dropdown values and statistics from one grouped scan of active employees
+        counts = FacetService.counts(Employee.is_active == True)
         
         return {
             'form_options': {
-                'departments': [d[0] for d in departments if d[0]],
-                'employment_types': [e[0] for e in employment_types if e[0]],
+                'departments': [value for value, _ in counts['department'] if value],
+                'employment_types': [value for value, _ in counts['employment_type'] if value],
                 'genders': ['Male', 'Female', 'Other', 'Prefer not to say'],
                 'marital_statuses': ['Single', 'Married', 'Divorced', 'Widowed', 'Separated'],
                 'employment_type_options': ['Full-time', 'Part-time', 'Contract', 'Temporary', 'Intern']
             },
             'statistics': {
-                'total_employees': total_employees,
-                'by_department': [{'department': d[0] or 'Unassigned', 'count': d[1]} for d in dept_stats],
-                'by_gender': [{'gender': g[0] or 'Not specified', 'count': g[1]} for g in gender_stats],
-                'by_employment_type': [{'type': e[0] or 'Not specified', 'count': e[1]} for e in employment_stats]
+                'total_employees': counts['total'],
+                'by_department': [{'department': value or 'Unassigned', 'count': count} for value, count in counts['department']],
+                'by_gender': [{'gender': value or 'Not specified', 'count': count} for value, count in counts['gender']],
+                'by_employment_type': [{'type': value or 'Not specified', 'count': count} for value, count in counts['employment_type']]
             }
         }, 200
         
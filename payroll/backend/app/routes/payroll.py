@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import PayrollRun, User, Employee, Salary
+from app.models import PayrollRun, User, Employee, Job
+from app.services import PayrollService, TaxService, JobService, SimulationService, PrerenderService
+from app.services.pagination import keyset_paginate
 from datetime import date
 from sqlalchemy import extract
 
@@ -10,12 +13,17 @@ payroll_bp = Blueprint('payroll', __name__, url_prefix='/api/payroll')
 @payroll_bp.route('/runs', methods=['GET'])
 @jwt_required()
 def get_payroll_runs():
-    """Get payroll runs with optional filters"""
+    """Get payroll runs with optional filters
+    
+    Pass cursor (empty for the first page, then next_cursor or prev_cursor) instead
+    of page for keyset pagination; include_total=true adds the total count.
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     month = request.args.get('month', type=int)
     year = request.args.get('year', type=int)
     employee_id = request.args.get('employee_id', type=int)
+    needs_recalculation = request.args.get('needs_recalculation', type=str)
     
     query = PayrollRun.query
     
@@ -25,10 +33,30 @@ def get_payroll_runs():
         query = query.filter(PayrollRun.year == year)
     if employee_id:
         query = query.filter(PayrollRun.employee_id == employee_id)
+    if needs_recalculation is not None:
+        query = query.filter(PayrollRun.needs_recalculation.is_(needs_recalculation.lower() == 'true'))
     
-    runs = query.order_by(PayrollRun.year.desc(), PayrollRun.month.desc()).paginate(
-        page=page, per_page=per_page
-    )
+    query = query.options(db.joinedload(PayrollRun.employee))
+    
+    if 'cursor' in request.args:
+        try:
+            runs = keyset_paginate(
+                query, [PayrollRun.year, PayrollRun.month, PayrollRun.id], descending=True,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                with_total=request.args.get('include_total', 'false').lower() == 'true'
+            )
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return {
+            'payroll_runs': [run.to_dict() for run in runs.items],
+            'total': runs.total,
+            'next_cursor': runs.next_cursor,
+            'prev_cursor': runs.prev_cursor
+        }, 200
+    
+    runs = query.order_by(
+        PayrollRun.year.desc(), PayrollRun.month.desc()
+    ).paginate(page=page, per_page=per_page)
     
     return {
         'payroll_runs': [run.to_dict() for run in runs.items],
@@ -49,16 +77,12 @@ def get_employees_for_payroll():
     
     employees = Employee.query.filter_by(is_active=True).order_by(Employee.name).all()
     
-    # Include current salary for each employee
+    # Include current salary for each employee, looked up for all of them at once
+    salaries = PayrollService.current_salaries([emp.id for emp in employees])
     result = []
     for emp in employees:
-        emp_data = emp.to_dict()
-        # Get current salary
-        current_salary = Salary.query.filter(
-            Salary.employee_id == emp.id,
-            db.or_(Salary.end_date.is_(None), Salary.end_date >= date.today())
-        ).first()
-        emp_data['current_salary'] = float(current_salary.basic_salary) if current_salary else 0
+        emp_data = emp.to_dict(salaries)
+        emp_data['current_salary'] = float(salaries.get(emp.id, 0))
         result.append(emp_data)
     
     return {'employees': result}, 200
@@ -96,16 +120,12 @@ def create_payroll_run():
     if existing:
         return {'error': 'Payroll run already exists for this employee/month/year'}, 400
     
-    # Get current salary
-    current_salary = Salary.query.filter(
-        Salary.employee_id == employee_id,
-        db.or_(Salary.end_date.is_(None), Salary.end_date >= date.today())
-    ).first()
+    # Current salary, picked the same way as for bulk runs
+    basic_salary = PayrollService.current_salaries([employee.id]).get(employee.id)
     
-    if not current_salary:
+    if basic_salary is None:
         return {'error': 'No salary found for this employee'}, 400
     
-    basic_salary = current_salary.basic_salary
     net_salary = basic_salary - deductions
     
     payroll_run = PayrollRun(
@@ -137,70 +157,38 @@ def create_bulk_payroll_runs():
     month = data.get('month')
     year = data.get('year')
     default_deductions = float(data.get('default_deductions', 0))
+    dry_run = bool(data.get('dry_run', False))
+    resume = bool(data.get('resume', False))
+    chunk_size = int(data.get('chunk_size', 1000))
     
     if not month or not year:
         return {'error': 'Missing month or year'}, 400
     
-    # Get all active employees
-    employees = Employee.query.filter_by(is_active=True).all()
-    
-    success_count = 0
-    error_count = 0
-    errors = []
-    
-    for employee in employees:
-        try:
-            # Check if payroll run already exists for this employee/month/year
-            existing = PayrollRun.query.filter_by(
-                employee_id=employee.id, 
-                month=month, 
-                year=year
-            ).first()
-            if existing:
-                continue  # Skip if already exists
-            
-            # Get current salary
-            current_salary = Salary.query.filter(
-                Salary.employee_id == employee.id,
-                db.or_(Salary.end_date.is_(None), Salary.end_date >= date.today())
-            ).first()
-            
-            if not current_salary:
-                errors.append(f"No salary found for {employee.name}")
-                error_count += 1
-                continue
-            
-            basic_salary = current_salary.basic_salary
-            net_salary = basic_salary - default_deductions
-            
-            payroll_run = PayrollRun(
-                employee_id=employee.id,
-                month=month,
-                year=year,
-                basic_salary=basic_salary,
-                deductions=default_deductions,
-                net_salary=net_salary,
-                created_by=current_user_id
-            )
-            
-            db.session.add(payroll_run)
-            success_count += 1
-            
-        except Exception as e:
-            errors.append(f"Error for {employee.name}: {str(e)}")
-            error_count += 1
+    if chunk_size < 1:
+        return {'error': 'chunk_size must be positive'}, 400
     
     try:
-        db.session.commit()
-        return {
-            'message': f'Created {success_count} payroll runs',
-            'success_count': success_count,
-            'error_count': error_count,
-            'errors': errors
-        }, 201
+        result = PayrollService.create_bulk_runs(
+            month, year, current_user_id,
+            default_deductions=default_deductions,
+            dry_run=dry_run,
+            chunk_size=chunk_size,
+            resume=resume
+        )
     except Exception as e:
         db.session.rollback()
         return {'error': f'Database error: {str(e)}'}, 500
+    
+    if dry_run:
+        return {
+            'message': f"Would create {result['success_count']} payroll runs",
+            **result
+        }, 200
+    
+    return {
+        'message': f"Created {result['success_count']} payroll runs",
+        **result
+    }, 201
 
 @payroll_bp.route('/runs/<int:payroll_run_id>/process', methods=['POST'])
 @jwt_required()
@@ -221,112 +209,137 @@ def process_payroll(payroll_run_id):
         return {'error': 'Payroll run is not in draft status'}, 400
     
     try:
-        # Import here to avoid circular imports
-        from app.services.payroll_service import PayrollService
-        from app.models import Payslip, PayslipDetail, Allowance, Deduction
-        
-        # Use the salary already stored in the payroll run instead of recalculating
-        basic_salary = payroll_run.basic_salary
-        
-        # Calculate allowances for the payroll period
-        allowances = Allowance.query.filter(
-            Allowance.employee_id == payroll_run.employee_id,
-            Allowance.start_date <= date(payroll_run.year, payroll_run.month, 28),
-            db.or_(Allowance.end_date.is_(None), Allowance.end_date >= date(payroll_run.year, payroll_run.month, 1))
-        ).all()
-        
-        total_allowances = sum(a.amount for a in allowances)
-        
-        # Calculate deductions for the payroll period
-        deductions_records = Deduction.query.filter(
-            Deduction.employee_id == payroll_run.employee_id,
-            Deduction.start_date <= date(payroll_run.year, payroll_run.month, 28),
-            db.or_(Deduction.end_date.is_(None), Deduction.end_date >= date(payroll_run.year, payroll_run.month, 1))
-        ).all()
-        
-        total_deductions = sum(d.amount for d in deductions_records) + payroll_run.deductions
-        
-        # Calculate gross salary
-        gross_salary = basic_salary + total_allowances
-        
-        # Calculate tax
-        tax = PayrollService._calculate_tax(gross_salary)
-        
-        # Calculate net salary
-        net_salary = gross_salary - total_deductions - tax
-        
-        # Prepare payroll calculation data
-        payroll_calc = {
-            'basic_salary': basic_salary,
-            'total_allowances': total_allowances,
-            'total_deductions': total_deductions,
-            'gross_salary': gross_salary,
-            'tax': tax,
-            'net_salary': net_salary,
-            'allowances_detail': [{'type': a.allowance_type, 'amount': a.amount} for a in allowances],
-            'deductions_detail': [{'type': d.deduction_type, 'amount': d.amount} for d in deductions_records]
-        }
-        
-        # Check if payslip already exists
-        existing_payslip = Payslip.query.filter_by(payroll_run_id=payroll_run_id).first()
-        if not existing_payslip:
-            # Create payslip
-            payslip = Payslip(
-                payroll_run_id=payroll_run_id,
-                employee_id=payroll_run.employee_id,
-                basic_salary=payroll_calc['basic_salary'],
-                total_allowances=payroll_calc['total_allowances'],
-                total_deductions=payroll_calc['total_deductions'],
-                gross_salary=payroll_calc['gross_salary'],
-                tax=payroll_calc['tax'],
-                net_salary=payroll_calc['net_salary']
-            )
-            db.session.add(payslip)
-            db.session.flush()  # To get payslip ID
-            
-            # Create payslip details for allowances
-            for allowance in payroll_calc['allowances_detail']:
-                detail = PayslipDetail(
-                    payslip_id=payslip.id,
-                    detail_type='allowance',
-                    description=allowance['type'],
-                    amount=allowance['amount']
-                )
-                db.session.add(detail)
-            
-            # Create payslip details for deductions
-            for deduction in payroll_calc['deductions_detail']:
-                detail = PayslipDetail(
-                    payslip_id=payslip.id,
-                    detail_type='deduction',
-                    description=deduction['type'],
-                    amount=deduction['amount']
-                )
-                db.session.add(detail)
-            
-            # Add tax detail if applicable
-            if payroll_calc['tax'] > 0:
-                tax_detail = PayslipDetail(
-                    payslip_id=payslip.id,
-                    detail_type='deduction',
-                    description='Income Tax',
-                    amount=payroll_calc['tax']
-                )
-                db.session.add(tax_detail)
-        
-        # Mark payroll as processed
-        payroll_run.status = 'processed'
+        PayrollService.process_run(payroll_run)
         
         db.session.commit()
-        
-        return {
-            'message': 'Payroll processed and payslip generated',
-            'payroll_run': payroll_run.to_dict()
-        }, 200
-        
     except Exception as e:
         db.session.rollback()
         return {'error': f'Failed to process payroll: {str(e)}'}, 500
+    
+    # After the commit and outside the try: a queuing problem can't fail the request
+    PrerenderService.enqueue_runs([payroll_run.id])
+    
+    return {
+        'message': 'Payroll processed and payslip generated',
+        'payroll_run': payroll_run.to_dict()
+    }, 200
+
+@payroll_bp.route('/runs/process-month', methods=['POST'])
+@jwt_required()
+def process_payroll_month():
+    """Process all draft payroll runs for a month and generate payslips in bulk"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    data = request.get_json()
+    month = data.get('month')
+    year = data.get('year')
+    chunk_size = int(data.get('chunk_size', 500))
+    resume = bool(data.get('resume', False))
+    
+    if not month or not year:
+        return {'error': 'Missing month or year'}, 400
+    
+    if chunk_size < 1:
+        return {'error': 'chunk_size must be positive'}, 400
+    
+    try:
+        result = PayrollService.process_month(month, year, chunk_size=chunk_size, resume=resume)
+    except Exception as e:
+        db.session.rollback()
+        return {'error': f'Database error: {str(e)}'}, 500
+    
+    return {
+        'message': f"Processed {result['processed_count']} payroll runs",
+        **result
+    }, 200
+
+@payroll_bp.route('/runs/recalculate', methods=['POST'])
+@jwt_required()
+def recalculate_payroll_runs():
+    """Recalculate draft payroll runs flagged by salary changes"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    data = request.get_json() or {}
+    chunk_size = int(data.get('chunk_size', 500))
+    
+    if chunk_size < 1:
+        return {'error': 'chunk_size must be positive'}, 400
+    
+    result = PayrollService.recalculate_runs(
+        month=data.get('month'), year=data.get('year'), chunk_size=chunk_size
+    )
+    
+    return {
+        'message': f"Recalculated {result['recalculated_count']} payroll runs",
+        **result
+    }, 200
+
+@payroll_bp.route('/runs/<int:payroll_run_id>/recalculate', methods=['POST'])
+@jwt_required()
+def recalculate_payroll_run(payroll_run_id):
+    """Recalculate a single draft payroll run from current compensation data"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    payroll_run = PayrollRun.query.get(payroll_run_id)
+    
+    if not payroll_run:
+        return {'error': 'Payroll run not found'}, 404
+    
+    if payroll_run.status != 'draft':
+        return {'error': 'Can only recalculate draft payroll runs'}, 400
+    
+    result = PayrollService.recalculate_runs(payroll_run_ids=[payroll_run_id], force=True)
+    if result['errors']:
+        return {'error': result['errors'][0]['error']}, 400
+    
+    return {
+        'message': 'Payroll run recalculated',
+        'payroll_run': payroll_run.to_dict()
+    }, 200
+
+@payroll_bp.route('/simulate', methods=['POST'])
+@jwt_required()
+def simulate_payroll():
+    """Stream a what-if payroll calculation for all active employees as NDJSON without saving"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    data = request.get_json()
+    month = data.get('month')
+    year = data.get('year')
+    overrides = data.get('overrides', {})
+    chunk_size = int(data.get('chunk_size', 1000))
+    
+    if not month or not year:
+        return {'error': 'Missing month or year'}, 400
+    
+    if chunk_size < 1:
+        return {'error': 'chunk_size must be positive'}, 400
+    
+    validation_errors = SimulationService.validate_overrides(overrides)
+    if validation_errors:
+        return {'error': 'Validation failed', 'details': validation_errors}, 400
+    
+    def generate():
+        for line in SimulationService.simulate(month, year, overrides, chunk_size=chunk_size):
+            yield json.dumps(line) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @payroll_bp.route('/runs/<int:payroll_run_id>', methods=['PUT'])
 @jwt_required()
@@ -354,3 +367,117 @@ def update_payroll_run(payroll_run_id):
     db.session.commit()
     
     return {'message': 'Payroll run updated', 'payroll_run': payroll_run.to_dict()}, 200
+
+@payroll_bp.route('/tax-brackets', methods=['GET'])
+@jwt_required()
+def get_tax_brackets():
+    """Get the tax brackets in effect for a year"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    year = request.args.get('year', date.today().year, type=int)
+    jurisdiction = request.args.get('jurisdiction', type=str)
+    
+    brackets = TaxService.get_brackets(year, jurisdiction)
+    
+    return {
+        'year': year,
+        'jurisdiction': jurisdiction or TaxService.default_jurisdiction(),
+        'effective_year': brackets[0].year if brackets else None,
+        'brackets': [b.to_dict() for b in brackets]
+    }, 200
+
+@payroll_bp.route('/tax-brackets', methods=['PUT'])
+@jwt_required()
+def update_tax_brackets():
+    """Replace the tax brackets for a year"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.is_admin():
+        return {'error': 'Unauthorized'}, 401
+    
+    data = request.get_json()
+    year = data.get('year')
+    jurisdiction = data.get('jurisdiction')
+    brackets = data.get('brackets', [])
+    
+    if not year:
+        return {'error': 'Missing year'}, 400
+    
+    validation_errors = TaxService.validate_brackets(brackets)
+    if validation_errors:
+        return {'error': 'Validation failed', 'details': validation_errors}, 400
+    
+    rows = TaxService.replace_brackets(year, brackets, jurisdiction)
+    db.session.commit()
+    
+    return {'message': 'Tax brackets updated', 'brackets': [b.to_dict() for b in rows]}, 200
+
+@payroll_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def create_payroll_job():
+    """Start a bulk payroll operation in the background"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    data = request.get_json()
+    job_type = data.get('job_type')
+    params = data.get('params', {})
+    
+    if job_type not in JobService.handlers:
+        return {'error': f"job_type must be one of: {', '.join(sorted(JobService.handlers))}"}, 400
+    
+    if not isinstance(params, dict):
+        return {'error': 'params must be an object'}, 400
+    
+    if not params.get('month') or not params.get('year'):
+        return {'error': 'Missing month or year'}, 400
+    
+    job = JobService.submit(job_type, params, current_user_id)
+    
+    return {'message': 'Job queued', 'job': job.to_dict()}, 202
+
+@payroll_bp.route('/jobs', methods=['GET'])
+@jwt_required()
+def get_payroll_jobs():
+    """Get recent background jobs"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    status = request.args.get('status', type=str)
+    
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    
+    jobs = query.order_by(Job.id.desc()).limit(limit).all()
+    
+    return {'jobs': [job.to_dict() for job in jobs]}, 200
+
+@payroll_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_payroll_job(job_id):
+    """Get progress of a background job"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    job = Job.query.get(job_id)
+    
+    if not job:
+        return {'error': 'Job not found'}, 404
+    
+    return {'job': job.to_dict()}, 200
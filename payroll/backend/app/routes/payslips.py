@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models import Payslip, User, Employee
-from app.services import PDFService
+from app.services import PDFService, ExportService, PrerenderService
+from app.services.pdf_cache import PDFCache, get_pdf_cache
+from app.services.pagination import keyset_paginate
 from io import BytesIO
 
 payslip_bp = Blueprint('payslips', __name__, url_prefix='/api/payslips')
@@ -10,7 +12,11 @@ payslip_bp = Blueprint('payslips', __name__, url_prefix='/api/payslips')
 @payslip_bp.route('', methods=['GET'])
 @jwt_required()
 def get_payslips():
-    """Get payslips with filters"""
+    """Get payslips with filters
+    
+    Pass cursor (empty for the first page, then next_cursor or prev_cursor) instead
+    of page for keyset pagination; include_total=true adds the total count.
+    """
     current_user_id = get_jwt_identity()
     user = User.query.get(current_user_id)
     
@@ -34,7 +40,20 @@ def get_payslips():
     if payroll_run_id:
         query = query.filter_by(payroll_run_id=payroll_run_id)
     
-    payslips = query.order_by(Payslip.created_at.desc()).paginate(page=page, per_page=per_page)
+    # Employee and month for the whole page come with the payslips
+    query = query.options(db.joinedload(Payslip.employee), db.joinedload(Payslip.payroll_run))
+    
+    if 'cursor' in request.args:
+        try:
+            payslips = keyset_paginate(
+                query, [Payslip.created_at, Payslip.id], descending=True,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                with_total=request.args.get('include_total', 'false').lower() == 'true'
+            )
+        except ValueError as e:
+            return {'error': str(e)}, 400
+    else:
+        payslips = query.order_by(Payslip.created_at.desc()).paginate(page=page, per_page=per_page)
     
     # Include employee information in response
     result = []
@@ -49,6 +68,14 @@ def get_payslips():
             payslip_data['year'] = payslip.payroll_run.year
         result.append(payslip_data)
     
+    if 'cursor' in request.args:
+        return {
+            'payslips': result,
+            'total': payslips.total,
+            'next_cursor': payslips.next_cursor,
+            'prev_cursor': payslips.prev_cursor
+        }, 200
+    
     return {
         'payslips': result,
         'total': payslips.total,
@@ -56,6 +83,45 @@ def get_payslips():
         'current_page': page
     }, 200
 
+@payslip_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_payslips():
+    """Download all payslips for a payroll month as a ZIP of PDFs, streamed while rendering"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    month = request.args.get('payroll_month', type=int)
+    year = request.args.get('year', type=int)
+    department = request.args.get('department', type=str)
+    
+    if not month or not year:
+        return {'error': 'Missing payroll_month or year'}, 400
+    
+    if not ExportService.has_payslips(month, year, department):
+        return {'error': 'No payslips found'}, 404
+    
+    filename = f"payslips_{year}_{month}{'_' + department if department else ''}.zip"
+    return Response(
+        stream_with_context(ExportService.stream_payslip_zip(month, year, department)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@payslip_bp.route('/prerender/metrics', methods=['GET'])
+@jwt_required()
+def get_prerender_metrics():
+    """Get queue depth and lag of background payslip PDF rendering"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    
+    if not user or not user.can_process_payroll():
+        return {'error': 'Unauthorized'}, 401
+    
+    return PrerenderService.metrics(), 200
+
 @payslip_bp.route('/<int:payslip_id>', methods=['GET'])
 @jwt_required()
 def get_payslip(payslip_id):
@@ -100,12 +166,37 @@ def download_payslip_pdf(payslip_id):
     
     employee = payslip.employee
     payroll_run = payslip.payroll_run
-    
-    pdf_buffer = PDFService.generate_payslip_pdf(payslip, employee, payroll_run)
+    download_name = f'payslip_{employee.employee_id}_{payroll_run.year}_{payroll_run.month}.pdf'
+    
+    cache = get_pdf_cache()
+    if cache is None:
+        pdf_buffer = PDFService.generate_payslip_pdf(payslip, employee, payroll_run)
+        return send_file(
+            pdf_buffer,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=download_name
+        )
+    
+    # The content hash doubles as the ETag; conditional requests get a 304 without rendering
+    key = PDFCache.key_for(payslip, employee, payroll_run, PDFService.renderer_name())
+    if key in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
+    
+    # Send from an open handle (or the fresh render): the file can be evicted at any time
+    pdf = cache.open(key)
+    if pdf is None:
+        pdf = PDFService.generate_payslip_pdf(payslip, employee, payroll_run)
+        cache.put(key, pdf.getvalue())
     
     return send_file(
-        pdf_buffer,
+        pdf,
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'payslip_{employee.employee_id}_{payroll_run.year}_{payroll_run.month}.pdf'
+        download_name=download_name,
+        etag=key,
+        last_modified=payslip.updated_at or payslip.created_at,
+        conditional=True
     )
@@ -1,4 +1,13 @@
 from .payroll_service import PayrollService
 from .pdf_service import PDFService
+from .tax_service import TaxService
+from .job_service import JobService
+from .simulation_service import SimulationService
+from .export_service import ExportService
+from .prerender_service import PrerenderService
+from .summary_service import SummaryService
+from .distribution_service import DistributionService
+from .facet_service import FacetService
+from .import_service import ImportService
 
-__all__ = ['PayrollService', 'PDFService']
+__all__ = ['PayrollService', 'PDFService', 'TaxService', 'JobService', 'SimulationService', 'ExportService', 'PrerenderService', 'SummaryService', 'DistributionService', 'FacetService', 'ImportService']
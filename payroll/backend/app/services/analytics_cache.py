@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import Payslip, PayrollRun, Employee
+
+class MemoryCacheBackend:
+    """Per-process LRU store; each worker process keeps and invalidates its own copy"""
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+    
+    def generation(self):
+        return self._generation
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+    
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    """LRU store in a local SQLite file shared by every worker process on the host
+    
+    Invalidation in one worker clears the entries for all of them.
+    """
+    
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS generation (id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO generation (id, value) VALUES (1, 0)')
+            self._local.conn = conn
+        return conn
+    
+    def generation(self):
+        return self._connection().execute('SELECT value FROM generation WHERE id = 1').fetchone()[0]
+    
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute('SELECT value, expires_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+    
+    def set(self, key, value, ttl, generation=None):
+        conn = self._connection()
+        now = time.time()
+        # One statement, so a clear() from any process either precedes it and wins or follows it
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) '
+            'SELECT ?, ?, ?, ? FROM generation WHERE id = 1 AND (? IS NULL OR value = ?)',
+            (key, json.dumps(value), now + ttl, now, generation, generation)
+        )
+        conn.execute(
+            'DELETE FROM entries WHERE key IN '
+            '(SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+    
+    def clear(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM entries')
+        conn.execute('UPDATE generation SET value = value + 1 WHERE id = 1')
+        conn.execute('COMMIT')
+    
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+def _memory_backend(app):
+    return MemoryCacheBackend(app.config.get('ANALYTICS_CACHE_MAX_ENTRIES', 256))
+
+def _sqlite_backend(app):
+    path = app.config.get('ANALYTICS_CACHE_PATH') or os.path.join(app.instance_path, 'analytics_cache.sqlite3')
+    return SQLiteCacheBackend(path, app.config.get('ANALYTICS_CACHE_MAX_ENTRIES', 256))
+
+# Backend factories by ANALYTICS_CACHE_BACKEND name. A backend needs get(key),
+# set(key, value, ttl, generation), clear(), generation() and __len__; clear() moves
+# the generation on and set() skips values computed under an older one. Values are
+# JSON-compatible dicts.
+BACKENDS = {'memory': _memory_backend, 'sqlite': _sqlite_backend}
+
+class AnalyticsCache:
+    """Cache of analytics responses with hit and miss counters"""
+    
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+    
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            self._stats['hits' if value is not None else 'misses'] += 1
+        return value
+    
+    def generation(self):
+        """Token to read before computing a value and pass to set()"""
+        return self.backend.generation()
+    
+    def set(self, key, value, generation=None):
+        """Store a value unless the cache was invalidated since generation was read"""
+        self.backend.set(key, value, self.ttl, generation)
+    
+    def invalidate(self):
+        self.backend.clear()
+        with self._lock:
+            self._stats['invalidations'] += 1
+    
+    def metrics(self):
+        """Counters for this process and the current number of entries"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'ttl': self.ttl,
+            'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+            **stats
+        }
+
+def get_analytics_cache():
+    """The app's analytics response cache, or None when disabled in config"""
+    if not current_app.config.get('ANALYTICS_CACHE_ENABLED', True):
+        return None
+    cache = current_app.extensions.get('analytics_cache')
+    if cache is None:
+        backend = BACKENDS[current_app.config.get('ANALYTICS_CACHE_BACKEND', 'memory')](current_app)
+        cache = AnalyticsCache(backend, current_app.config.get('ANALYTICS_CACHE_TTL', 300))
+        current_app.extensions['analytics_cache'] = cache
+    return cache
+
+_SOURCE_MODELS = (Payslip, PayrollRun, Employee)
+
+@event.listens_for(Session, 'after_flush')
+def _track_analytics_changes(session, flush_context):
+    """Note when payslips, payroll runs or employees change"""
+    if any(
+        isinstance(obj, _SOURCE_MODELS)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+    ):
+        session.info['analytics_changed'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_analytics_bulk_changes(orm_execute_state):
+    """Bulk inserts and updates, such as payslips written in chunks"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _SOURCE_MODELS:
+        orm_execute_state.session.info['analytics_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_analytics_cache(session):
+    """Drop cached analytics once the changes are visible to other sessions
+    
+    The cache is created here if this process hasn't used it yet, so commits from
+    the CLI, job threads or other workers also clear a shared backend.
+    """
+    if not session.info.pop('analytics_changed', False) or not has_app_context():
+        return
+    cache = get_analytics_cache()
+    if cache is not None:
+        cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_analytics_changes(session):
+    session.info.pop('analytics_changed', None)
@@ -0,0 +1,391 @@
+import math
+import time
+import threading
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Payslip, PayrollRun, Employee, PayrollMonthlySummary
+
+METRICS = ('basic_salary', 'total_allowances', 'gross_salary', 'total_deductions', 'tax', 'net_salary')
+# Employee attributes joined onto every payslip; their current values are used
+DIMENSIONS = ('department', 'employment_type', 'gender')
+GROUPABLE = ('year', 'month') + DIMENSIONS
+STATS = ('count', 'sum', 'mean', 'min', 'max', 'std')
+
+def _grow(array, capacity):
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class _Partition:
+    """Payslip facts of one payroll month in growable column arrays
+    
+    Aggregates are memoized per partition, so repeated queries over history only
+    recompute the months that received new payslips.
+    """
+    
+    def __init__(self, year, month):
+        self.year = year
+        self.month = month
+        self.size = 0
+        self.employee_ids = np.empty(0, dtype=np.int32)
+        self.values = {metric: np.empty(0) for metric in METRICS}
+        self.codes = {dimension: np.empty(0, dtype=np.int16) for dimension in DIMENSIONS}
+        self.memo = {}
+    
+    def append(self, employee_ids, values, codes):
+        end = self.size + len(employee_ids)
+        if end > len(self.employee_ids):
+            capacity = max(end, 2 * len(self.employee_ids), 1024)
+            self.employee_ids = _grow(self.employee_ids, capacity)
+            self.values = {name: _grow(array, capacity) for name, array in self.values.items()}
+            self.codes = {name: _grow(array, capacity) for name, array in self.codes.items()}
+        
+        self.employee_ids[self.size:end] = employee_ids
+        for name, array in values.items():
+            self.values[name][self.size:end] = array
+        for name, array in codes.items():
+            self.codes[name][self.size:end] = array
+        self.size = end
+        self.memo.clear()
+    
+    def recode(self, employee_codes):
+        """Re-join employee dimensions after they were reloaded"""
+        employee_ids = self.employee_ids[:self.size]
+        for name, lookup in employee_codes.items():
+            self.codes[name][:self.size] = lookup[employee_ids]
+        self.memo.clear()
+    
+    def aggregate(self, dimensions, metrics, needs, dimension_filters, cardinalities):
+        """Accumulators per tuple of dimension codes, for rows matching the filters"""
+        memo_key = (dimensions, metrics, needs, dimension_filters)
+        result = self.memo.get(memo_key)
+        if result is not None:
+            return result
+        
+        size = self.size
+        mask = None
+        for name, wanted in dimension_filters:
+            column = self.codes[name][:size]
+            match = column == wanted[0] if len(wanted) == 1 else np.isin(column, wanted)
+            mask = match if mask is None else mask & match
+        selected = np.flatnonzero(mask) if mask is not None else None
+        
+        def take(array):
+            return array[:size] if selected is None else array[:size][selected]
+        
+        if dimensions:
+            shape = tuple(cardinalities[name] for name in dimensions)
+            groups = take(self.codes[dimensions[0]]).astype(np.intp)
+            for name, cardinality in zip(dimensions[1:], shape[1:]):
+                groups = groups * cardinality + take(self.codes[name])
+            space = math.prod(shape)
+            counts = np.bincount(groups, minlength=space)
+            present = np.flatnonzero(counts)
+            keys = list(zip(*(codes.tolist() for codes in np.unravel_index(present, shape))))
+        else:
+            groups = None
+            counts = np.array([size if selected is None else len(selected)])
+            present = np.flatnonzero(counts)
+            keys = [()] if len(present) else []
+        
+        result = {key: {'count': int(counts[group])} for key, group in zip(keys, present)}
+        for metric in metrics:
+            values = take(self.values[metric])
+            stats = {}
+            if groups is not None:
+                stats['sum'] = np.bincount(groups, weights=values, minlength=space)[present]
+                if 'sumsq' in needs:
+                    stats['sumsq'] = np.bincount(groups, weights=values * values, minlength=space)[present]
+                if 'min' in needs:
+                    lowest = np.full(space, np.inf)
+                    np.minimum.at(lowest, groups, values)
+                    stats['min'] = lowest[present]
+                if 'max' in needs:
+                    highest = np.full(space, -np.inf)
+                    np.maximum.at(highest, groups, values)
+                    stats['max'] = highest[present]
+            elif len(present):
+                stats['sum'] = [values.sum()]
+                if 'sumsq' in needs:
+                    stats['sumsq'] = [np.dot(values, values)]
+                if 'min' in needs:
+                    stats['min'] = [values.min()]
+                if 'max' in needs:
+                    stats['max'] = [values.max()]
+            for i, key in enumerate(keys):
+                result[key][metric] = {name: float(column[i]) for name, column in stats.items()}
+        
+        self.memo[memo_key] = result
+        return result
+
+class AnalyticsEngine:
+    """In-memory columnar store of payslip facts joined with employee dimensions
+    
+    Facts are partitioned by payroll month and only ever appended: new payslips are
+    loaded by id as they are committed, and a month whose size differs from its
+    payslip count in payroll_monthly_summary is reloaded whole. Employee dimensions
+    are reloaded when employees change. After ttl seconds both are re-checked so
+    that writes made by other processes show up.
+    """
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._checked_at = None
+        self._stale_facts = False
+        self._stale_dimensions = False
+        self._stale_all = True
+        self._reset()
+    
+    def _reset(self):
+        self._partitions = {}
+        self.last_id = 0
+        self.labels = {name: [None] for name in DIMENSIONS}
+        self._label_codes = {name: {None: 0} for name in DIMENSIONS}
+        self._employee_codes = {name: np.zeros(0, dtype=np.int16) for name in DIMENSIONS}
+    
+    def __len__(self):
+        return sum(partition.size for partition in self._partitions.values())
+    
+    def mark_stale(self, facts=False, dimensions=False, everything=False):
+        with self._lock:
+            self._stale_facts |= facts
+            self._stale_dimensions |= dimensions
+            self._stale_all |= everything
+    
+    def ensure_fresh(self):
+        """Apply committed changes before a query"""
+        with self._lock:
+            expired = self._checked_at is None or time.monotonic() - self._checked_at > self.ttl
+            if self._stale_all:
+                self._reset()
+                self._load_dimensions()
+                self._load_facts()
+            else:
+                if self._stale_dimensions or expired:
+                    self._load_dimensions()
+                if self._stale_facts or expired:
+                    self._load_facts()
+            self._stale_all = self._stale_facts = self._stale_dimensions = False
+            if expired:
+                self._checked_at = time.monotonic()
+    
+    def set_employees(self, employee_ids, attributes):
+        """Replace the employee dimensions; attributes maps each dimension to a list of values"""
+        employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        size = int(employee_ids.max()) + 1 if len(employee_ids) else 0
+        for name in DIMENSIONS:
+            # Codes are append-only so memoized partition results stay meaningful
+            codes = self._label_codes[name]
+            for label in attributes[name]:
+                if label not in codes:
+                    codes[label] = len(codes)
+                    self.labels[name].append(label)
+            lookup = np.zeros(size, dtype=np.int16)
+            lookup[employee_ids] = [codes[label] for label in attributes[name]]
+            self._employee_codes[name] = lookup
+        for partition in self._partitions.values():
+            partition.recode(self._employee_codes)
+    
+    def append(self, employee_ids, years, months, values):
+        """Add payslip facts; values maps each metric to an array"""
+        employee_ids = np.asarray(employee_ids, dtype=np.int32)
+        if not len(employee_ids):
+            return
+        if employee_ids.max() >= len(self._employee_codes[DIMENSIONS[0]]):
+            # Payslips for employees created since the dimensions were loaded
+            self._load_dimensions()
+        
+        periods = np.asarray(years, dtype=np.int64) * 12 + np.asarray(months, dtype=np.int64) - 1
+        for period in np.unique(periods).tolist():
+            selected = np.flatnonzero(periods == period)
+            year, month = divmod(period, 12)
+            partition = self._partitions.get((year, month + 1))
+            if partition is None:
+                partition = self._partitions[(year, month + 1)] = _Partition(year, month + 1)
+            ids = employee_ids[selected]
+            partition.append(
+                ids,
+                {metric: np.asarray(values[metric], dtype=np.float64)[selected] for metric in METRICS},
+                {name: lookup[ids] for name, lookup in self._employee_codes.items()}
+            )
+    
+    def _load_dimensions(self):
+        rows = db.session.query(Employee.id, *(getattr(Employee, name) for name in DIMENSIONS)).all()
+        columns = list(zip(*rows)) if rows else [[] for _ in range(len(DIMENSIONS) + 1)]
+        self.set_employees(columns[0], dict(zip(DIMENSIONS, columns[1:])))
+    
+    def _scan_facts(self, conditions, chunk_size=50000):
+        """Append the payslips matching conditions, in id order"""
+        columns = [Payslip.id, Payslip.employee_id, PayrollRun.year, PayrollRun.month]
+        columns += [db.func.coalesce(getattr(Payslip, metric), 0) for metric in METRICS]
+        last_id = 0
+        while True:
+            rows = db.session.query(*columns).join(
+                PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+            ).filter(Payslip.id > last_id, *conditions).order_by(Payslip.id).limit(chunk_size).all()
+            if not rows:
+                return last_id
+            last_id = rows[-1][0]
+            data = list(zip(*rows))
+            self.append(data[1], data[2], data[3], dict(zip(METRICS, data[4:])))
+    
+    def _load_facts(self):
+        """Append payslips created since the last load, then reload months that are still off
+        
+        Ids are assigned at insert, not at commit: a transaction that commits after one
+        with higher ids was loaded (parallel partitions, job threads) leaves payslips
+        below last_id. The summary table is written in the same transactions, so its
+        per-month counts show which partitions missed rows. Months without summary
+        rows (payslips from before the table existed) keep the engine's own counts.
+        """
+        self.last_id = max(self.last_id, self._scan_facts([Payslip.id > self.last_id]))
+        
+        expected = dict(((year, month), int(count)) for year, month, count in db.session.query(
+            PayrollMonthlySummary.year, PayrollMonthlySummary.month,
+            db.func.sum(PayrollMonthlySummary.payslip_count)
+        ).group_by(PayrollMonthlySummary.year, PayrollMonthlySummary.month))
+        for key, count in expected.items():
+            partition = self._partitions.get(key)
+            if (partition.size if partition else 0) != count:
+                self._partitions.pop(key, None)
+                # Later payslips still arrive through the id scan above
+                self._scan_facts([PayrollRun.year == key[0], PayrollRun.month == key[1], Payslip.id <= self.last_id])
+    
+    def aggregate(self, group_by=(), metrics=('net_salary',), stats=('count', 'sum'), filters=None):
+        """Group, filter and aggregate payslips
+        
+        group_by and filter keys are names from GROUPABLE; a filter value is a single
+        value or a list. Returns one dict per group, sorted by group, with the group
+        values, 'count' and '<metric>_<stat>' entries.
+        """
+        self.ensure_fresh()
+        filters = {name: value if isinstance(value, (list, tuple, set)) else [value]
+                   for name, value in (filters or {}).items() if value is not None}
+        dimensions = tuple(name for name in group_by if name in DIMENSIONS)
+        needs = tuple(need for need, stat in (('max', 'max'), ('min', 'min'), ('sumsq', 'std')) if stat in stats)
+        
+        with self._lock:
+            dimension_filters = tuple(
+                (name, tuple(sorted(self._label_codes[name][label]
+                                    for label in filters[name] if label in self._label_codes[name])))
+                for name in DIMENSIONS if name in filters
+            )
+            if any(not wanted for _, wanted in dimension_filters):
+                return []
+            cardinalities = {name: len(self.labels[name]) for name in DIMENSIONS}
+            
+            groups = {}
+            for (year, month), partition in self._partitions.items():
+                if 'year' in filters and year not in filters['year']:
+                    continue
+                if 'month' in filters and month not in filters['month']:
+                    continue
+                period = {'year': year, 'month': month}
+                partial = partition.aggregate(dimensions, tuple(metrics), needs, dimension_filters, cardinalities)
+                for codes, accumulators in partial.items():
+                    labels = dict(zip(dimensions, codes))
+                    key = tuple(
+                        period[name] if name in period else self.labels[name][labels[name]]
+                        for name in group_by
+                    )
+                    merged = groups.get(key)
+                    if merged is None:
+                        groups[key] = {'count': accumulators['count'],
+                                       **{metric: dict(accumulators[metric]) for metric in metrics}}
+                        continue
+                    merged['count'] += accumulators['count']
+                    for metric in metrics:
+                        target, source = merged[metric], accumulators[metric]
+                        target['sum'] += source['sum']
+                        if 'sumsq' in source:
+                            target['sumsq'] += source['sumsq']
+                        if 'min' in source:
+                            target['min'] = min(target['min'], source['min'])
+                        if 'max' in source:
+                            target['max'] = max(target['max'], source['max'])
+        
+        rows = []
+        for key in sorted(groups, key=lambda values: tuple((value is None, value) for value in values)):
+            merged = groups[key]
+            count = merged['count']
+            row = dict(zip(group_by, key))
+            row['count'] = count
+            for metric in metrics:
+                accumulators = merged[metric]
+                mean = accumulators['sum'] / count
+                for stat in stats:
+                    if stat == 'count':
+                        continue
+                    if stat == 'mean':
+                        value = mean
+                    elif stat == 'std':
+                        value = math.sqrt(max(accumulators['sumsq'] / count - mean * mean, 0.0))
+                    else:
+                        value = accumulators[stat]
+                    row[f'{metric}_{stat}'] = value
+            rows.append(row)
+        return rows
+
+def get_analytics_engine():
+    """The app's analytics engine, or None when disabled in config"""
+    if not current_app.config.get('ANALYTICS_ENGINE_ENABLED', True):
+        return None
+    engine = current_app.extensions.get('analytics_engine')
+    if engine is None:
+        engine = AnalyticsEngine(ttl=current_app.config.get('ANALYTICS_ENGINE_TTL', 60))
+        current_app.extensions['analytics_engine'] = engine
+    return engine
+
+def _changed(obj, attributes):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+@event.listens_for(Session, 'after_flush')
+def _track_engine_changes(session, flush_context):
+    """Note new payslips and changed employees"""
+    changes = session.info.setdefault('analytics_engine_changes', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Employee):
+            changes.add('dimensions')
+        elif isinstance(obj, Payslip) and obj in session.new:
+            changes.add('facts')
+        elif isinstance(obj, Payslip) and (obj in session.deleted or _changed(obj, METRICS)):
+            # Facts are append-only; changing existing ones needs a full reload
+            changes.add('everything')
+        elif isinstance(obj, PayrollRun) and (obj in session.deleted or _changed(obj, ('year', 'month'))):
+            changes.add('everything')
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_engine_bulk_changes(orm_execute_state):
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    changes = orm_execute_state.session.info.setdefault('analytics_engine_changes', set())
+    if mapper.class_ is Payslip:
+        if orm_execute_state.is_insert:
+            changes.add('facts')
+        elif orm_execute_state.is_update or orm_execute_state.is_delete:
+            changes.add('everything')
+    elif mapper.class_ is Employee and (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    ):
+        changes.add('dimensions')
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_analytics_engine(session):
+    changes = session.info.pop('analytics_engine_changes', None)
+    if not changes or not has_app_context():
+        return
+    engine = current_app.extensions.get('analytics_engine')
+    if engine is not None:
+        engine.mark_stale(
+            facts='facts' in changes, dimensions='dimensions' in changes, everything='everything' in changes
+        )
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_engine_changes(session):
+    session.info.pop('analytics_engine_changes', None)
@@ -0,0 +1,164 @@
+import json
+from collections import defaultdict
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Payslip, PayrollRun, Employee, PayrollDistributionSketch
+from app.services.quantile_sketch import QuantileSketch, RELATIVE_ACCURACY
+
+# Payslip amounts with a stored sketch
+SKETCH_METRICS = ('net_salary', 'gross_salary')
+
+class DistributionService:
+    """Service for salary percentiles and histograms from per-month, per-department quantile sketches"""
+    
+    @staticmethod
+    def _group_values(rows):
+        """Amounts per (year, month, department, metric) from payslip dicts"""
+        values = defaultdict(list)
+        for row in rows:
+            for metric in SKETCH_METRICS:
+                values[(row['year'], row['month'], row['department'] or '', metric)].append(float(row[metric] or 0))
+        return values
+    
+    @staticmethod
+    def record_payslips(rows):
+        """Add newly created payslips to the stored sketches in the current transaction
+        
+        Sketch rows are locked while they are merged, so concurrent transactions
+        writing the same month and department apply their changes one after another.
+        They are locked in key order so two such transactions can't deadlock.
+        """
+        table = PayrollDistributionSketch.__table__
+        for (year, month, department, metric), values in sorted(DistributionService._group_values(rows).items()):
+            key = db.and_(
+                table.c.year == year, table.c.month == month,
+                table.c.department == department, table.c.metric == metric
+            )
+            select = db.select(table.c.id, table.c.sketch).where(key).with_for_update()
+            
+            existing = db.session.execute(select).first()
+            if existing is None:
+                sketch = QuantileSketch()
+                sketch.add(values)
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(db.insert(table).values(
+                            year=year, month=month, department=department, metric=metric,
+                            value_count=sketch.count, sketch=json.dumps(sketch.to_dict())
+                        ))
+                    continue
+                except IntegrityError:
+                    # Another transaction created the row first
+                    existing = db.session.execute(select).first()
+            
+            sketch = QuantileSketch.from_dict(json.loads(existing.sketch))
+            sketch.add(values)
+            db.session.execute(
+                db.update(table).where(table.c.id == existing.id)
+                .values(value_count=sketch.count, sketch=json.dumps(sketch.to_dict()))
+            )
+    
+    @staticmethod
+    def rebuild(year=None, month=None, chunk_size=10000, departments=None, connection=None):
+        """Recompute stored sketches from the payslips, for all months or the ones given
+        
+        departments limits the rebuild to those sketch departments ('' for none).
+        Runs in the current transaction; returns the number of sketch rows written.
+        """
+        table = PayrollDistributionSketch.__table__
+        department = db.func.coalesce(Employee.department, '')
+        delete = db.delete(table)
+        conditions = []
+        if year is not None:
+            delete = delete.where(table.c.year == year)
+            conditions.append(PayrollRun.year == year)
+        if month is not None:
+            delete = delete.where(table.c.month == month)
+            conditions.append(PayrollRun.month == month)
+        if departments is not None:
+            delete = delete.where(table.c.department.in_(list(departments)))
+            conditions.append(department.in_(list(departments)))
+        connection = connection or db.session.connection()
+        connection.execute(delete)
+        
+        sketches = defaultdict(QuantileSketch)
+        last_id = 0
+        while True:
+            rows = connection.execute(db.select(
+                Payslip.id, PayrollRun.year, PayrollRun.month, department.label('department'),
+                *(getattr(Payslip, metric) for metric in SKETCH_METRICS)
+            ).join(
+                PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+            ).join(
+                Employee, Payslip.employee_id == Employee.id
+            ).where(Payslip.id > last_id, *conditions).order_by(Payslip.id).limit(chunk_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            for key, values in DistributionService._group_values(row._asdict() for row in rows).items():
+                sketches[key].add(values)
+        
+        if sketches:
+            connection.execute(db.insert(table), [
+                {'year': year, 'month': month, 'department': department, 'metric': metric,
+                 'value_count': sketch.count, 'sketch': json.dumps(sketch.to_dict())}
+                for (year, month, department, metric), sketch in sketches.items()
+            ])
+        return len(sketches)
+    
+    @staticmethod
+    def merged_sketches(metric, group_by=None, year=None, month=None, department=None):
+        """Merge stored sketches into one per group: overall, per department or per month
+        
+        Returns (group, sketch) pairs sorted by group; department '' means unassigned.
+        """
+        query = db.session.query(
+            PayrollDistributionSketch.year, PayrollDistributionSketch.month,
+            PayrollDistributionSketch.department, PayrollDistributionSketch.sketch
+        ).filter(PayrollDistributionSketch.metric == metric)
+        
+        if year:
+            query = query.filter(PayrollDistributionSketch.year == year)
+        if month:
+            query = query.filter(PayrollDistributionSketch.month == month)
+        if department is not None:
+            query = query.filter(PayrollDistributionSketch.department == department)
+        
+        groups = {}
+        for row in query.all():
+            if group_by == 'department':
+                key = (row.department,)
+            elif group_by == 'month':
+                key = (row.year, row.month)
+            else:
+                key = ()
+            sketch = QuantileSketch.from_dict(json.loads(row.sketch))
+            if key in groups:
+                groups[key].merge(sketch)
+            else:
+                groups[key] = sketch
+        return sorted(groups.items())
+    
+    @staticmethod
+    def distribution(metric, percentiles=(10, 50, 90), bins=10, group_by=None, year=None, month=None,
+                     department=None):
+        """Count, range, percentiles and histogram per group from merged sketches"""
+        results = []
+        for key, sketch in DistributionService.merged_sketches(metric, group_by, year, month, department):
+            if group_by == 'department':
+                group = {'department': key[0] or 'Unassigned'}
+            elif group_by == 'month':
+                group = {'year': key[0], 'month': key[1]}
+            else:
+                group = {}
+            estimates = sketch.quantiles([p / 100 for p in percentiles])
+            results.append({
+                **group,
+                'count': sketch.count,
+                'min': sketch.min,
+                'max': sketch.max,
+                'percentiles': {f'p{p:g}': value for p, value in zip(percentiles, estimates)},
+                'histogram': sketch.histogram(bins)
+            })
+        return {'metric': metric, 'relative_accuracy': RELATIVE_ACCURACY, 'groups': results}
@@ -0,0 +1,134 @@
+import io
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+from flask import current_app
+from app import db
+from app.models import Payslip, PayrollRun, Employee
+from app.services.pdf_service import PDFService, render_payslip_pdf
+
+PAYSLIP_COLUMNS = ('basic_salary', 'total_allowances', 'gross_salary', 'total_deductions', 'tax', 'net_salary')
+EMPLOYEE_COLUMNS = ('name', 'employee_id', 'department', 'position')
+
+_executor = None
+_executor_lock = Lock()
+
+def _get_executor():
+    """Create the shared render pool on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers don't inherit the server's threads, locks or DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=current_app.config.get('PDF_EXPORT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+class _ChunkWriter(io.RawIOBase):
+    """Unseekable file object that collects written bytes until drained"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class ExportService:
+    """Service for exporting payslips in bulk"""
+    
+    @staticmethod
+    def payslip_filter(month, year, department=None):
+        """Build the filter selecting payslips for a payroll month, optionally one department"""
+        conditions = [PayrollRun.month == month, PayrollRun.year == year]
+        if department:
+            conditions.append(Employee.department == department)
+        return db.and_(*conditions)
+    
+    @staticmethod
+    def has_payslips(month, year, department=None):
+        """Check whether an export would contain anything"""
+        return db.session.query(
+            db.session.query(Payslip.id)
+            .join(PayrollRun, Payslip.payroll_run_id == PayrollRun.id)
+            .join(Employee, Payslip.employee_id == Employee.id)
+            .filter(ExportService.payslip_filter(month, year, department))
+            .exists()
+        ).scalar()
+    
+    @staticmethod
+    def iter_payslips(month, year, department=None, chunk_size=500):
+        """Yield (filename, payslip, employee, payroll_run) with plain dicts, paging by payslip id"""
+        columns = [Payslip.id, PayrollRun.month, PayrollRun.year]
+        columns += [getattr(Payslip, name) for name in PAYSLIP_COLUMNS]
+        columns += [getattr(Employee, name) for name in EMPLOYEE_COLUMNS]
+        
+        last_id = 0
+        while True:
+            rows = db.session.query(*columns).join(
+                PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+            ).join(
+                Employee, Payslip.employee_id == Employee.id
+            ).filter(
+                ExportService.payslip_filter(month, year, department),
+                Payslip.id > last_id
+            ).order_by(Payslip.id).limit(chunk_size).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            
+            for row in rows:
+                payslip = {name: getattr(row, name) for name in PAYSLIP_COLUMNS}
+                employee = {name: getattr(row, name) for name in EMPLOYEE_COLUMNS}
+                payroll_run = {'month': row.month, 'year': row.year}
+                filename = f"payslip_{row.employee_id}_{row.year}_{row.month}.pdf"
+                yield filename, payslip, employee, payroll_run
+    
+    @staticmethod
+    def stream_payslip_zip(month, year, department=None, max_in_flight=None):
+        """Render payslips in worker processes and yield a ZIP archive piece by piece
+        
+        At most max_in_flight PDFs are queued or held in memory at once, and each
+        finished entry is yielded as soon as it is added to the archive.
+        """
+        executor = _get_executor()
+        max_in_flight = max_in_flight or current_app.config.get('PDF_EXPORT_WORKERS', 2) * 4
+        renderer = PDFService.renderer_name()
+        
+        writer = _ChunkWriter()
+        pending = {}
+        try:
+            with zipfile.ZipFile(writer, 'w', zipfile.ZIP_STORED) as archive:
+                for filename, payslip, employee, payroll_run in ExportService.iter_payslips(
+                    month, year, department
+                ):
+                    if len(pending) >= max_in_flight:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            archive.writestr(pending.pop(future), future.result())
+                        yield writer.drain()
+                    future = executor.submit(render_payslip_pdf, payslip, employee, payroll_run, renderer)
+                    pending[future] = filename
+                
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        archive.writestr(pending.pop(future), future.result())
+                    yield writer.drain()
+            
+            # Central directory
+            yield writer.drain()
+        finally:
+            # The client went away or rendering failed; drop work nobody will read
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,55 @@
+from app import db
+from app.models import Employee
+
+# Facet name -> employee column it counts
+FACETS = {
+    'department': Employee.department,
+    'employment_type': Employee.employment_type,
+    'gender': Employee.gender,
+}
+
+class FacetService:
+    """Service for employee counts per department, employment type and gender"""
+    
+    @staticmethod
+    def parse(value):
+        """Facet names from a facets= parameter: a comma-separated list or 'all'
+        
+        Raises ValueError on unknown names.
+        """
+        names = [name.strip() for name in (value or '').split(',') if name.strip()]
+        if names == ['all']:
+            return list(FACETS)
+        unknown = [name for name in names if name not in FACETS]
+        if unknown:
+            raise ValueError(f"Unknown facets: {', '.join(unknown)}. Use {', '.join(FACETS)} or all")
+        return list(dict.fromkeys(names))
+    
+    @staticmethod
+    def counts(whereclause=None, facets=tuple(FACETS)):
+        """Total and per-value counts of each facet over employees matching whereclause
+        
+        One scan grouped by every requested column; each facet's counts are summed
+        from those combinations, which stay few (departments x types x genders).
+        Returns {'total': n, facet: [(value, count), ...]} with values sorted and
+        None (unassigned) last.
+        """
+        columns = [FACETS[name] for name in facets]
+        query = db.session.query(*columns, db.func.count(Employee.id))
+        if whereclause is not None:
+            query = query.filter(whereclause)
+        if columns:
+            query = query.group_by(*columns)
+        
+        total = 0
+        counts = {name: {} for name in facets}
+        for row in query.all():
+            count = row[-1]
+            total += count
+            for name, value in zip(facets, row):
+                counts[name][value] = counts[name].get(value, 0) + count
+        
+        result = {'total': total}
+        for name in facets:
+            result[name] = sorted(counts[name].items(), key=lambda item: (item[0] is None, item[0] or ''))
+        return result
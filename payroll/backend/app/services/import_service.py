@@ -0,0 +1,247 @@
+import csv
+import json
+import math
+import re
+from datetime import date
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Employee, Salary
+
+# Validation rules shared with the single-employee endpoints, compiled once
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_PATTERN = re.compile(r'^[+]?[\d\s\-\(\)]{10,20}$')
+GENDERS = ('Male', 'Female', 'Other', 'Prefer not to say')
+MARITAL_STATUSES = ('Single', 'Married', 'Divorced', 'Widowed', 'Separated')
+EMPLOYMENT_TYPES = ('Full-time', 'Part-time', 'Contract', 'Temporary', 'Intern')
+# Largest salary payroll_runs.basic_salary (DECIMAL(10,2)) holds; every salary is copied there
+MAX_SALARY = 99999999.99
+
+# Employee columns an import row may set
+IMPORT_FIELDS = (
+    'name', 'email', 'phone', 'department', 'position', 'bank_account', 'bank_name', 'employee_id',
+    'hire_date', 'date_of_birth', 'gender', 'marital_status', 'national_id', 'tax_id', 'address',
+    'emergency_contact_name', 'emergency_contact_phone', 'employment_type'
+)
+REQUIRED_FIELDS = ('name', 'email', 'employee_id')
+# Column lengths, checked up front so one long value can't fail a whole chunk
+MAX_LENGTHS = {
+    field: Employee.__table__.c[field].type.length for field in IMPORT_FIELDS
+    if getattr(Employee.__table__.c[field].type, 'length', None)
+}
+# Errors kept in the returned report; the rest are only counted (and passed to on_error)
+MAX_REPORTED_ERRORS = 1000
+
+class ImportService:
+    """Service for bulk employee imports from CSV or NDJSON streams"""
+    
+    @staticmethod
+    def read_rows(stream, fmt):
+        """Yield (line number, row dict or None, parse error) from a text stream, one row at a time
+        
+        CSV needs a header naming the columns; NDJSON has one JSON object per line.
+        Blank values become None and unknown columns are ignored.
+        """
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            header = [name.strip() for name in reader.fieldnames or []]
+            missing = [field for field in REQUIRED_FIELDS if field not in header]
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+            reader.fieldnames = header
+            for row in reader:
+                yield reader.line_num, {
+                    key: value.strip() or None for key, value in row.items()
+                    if key is not None and isinstance(value, str)
+                }, None
+        elif fmt == 'ndjson':
+            for line_number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError('expected a JSON object')
+                except ValueError as e:
+                    yield line_number, None, f'Invalid JSON: {e}'
+                    continue
+                yield line_number, {
+                    key: value.strip() or None if isinstance(value, str) else value
+                    for key, value in row.items()
+                }, None
+        else:
+            raise ValueError('Unsupported format. Use csv or ndjson')
+    
+    @staticmethod
+    def validate(row, today):
+        """(errors, employee values, basic salary or None) for one import row"""
+        errors = []
+        for field in REQUIRED_FIELDS:
+            if not row.get(field):
+                errors.append(f'{field} is required')
+        
+        values = {}
+        for field in IMPORT_FIELDS:
+            value = row.get(field)
+            if value is not None and not isinstance(value, str):
+                value = str(value)
+            if value is not None and field in MAX_LENGTHS and len(value) > MAX_LENGTHS[field]:
+                errors.append(f'{field} is longer than {MAX_LENGTHS[field]} characters')
+            values[field] = value
+        
+        if values['email'] and not EMAIL_PATTERN.match(values['email']):
+            errors.append('Invalid email format')
+        if values['phone'] and not PHONE_PATTERN.match(values['phone']):
+            errors.append('Invalid phone format')
+        
+        for field in ('hire_date', 'date_of_birth'):
+            if values[field]:
+                try:
+                    values[field] = date.fromisoformat(values[field])
+                except ValueError:
+                    errors.append(f'Invalid date format for {field}. Use YYYY-MM-DD')
+                    continue
+                if field == 'date_of_birth' and (values[field] > today or values[field].year < 1900):
+                    errors.append('Invalid date of birth')
+                elif field == 'hire_date' and values[field] > today:
+                    errors.append('Hire date cannot be in the future')
+        
+        if values['gender'] and values['gender'] not in GENDERS:
+            errors.append('Invalid gender value')
+        if values['marital_status'] and values['marital_status'] not in MARITAL_STATUSES:
+            errors.append('Invalid marital status')
+        if values['employment_type'] and values['employment_type'] not in EMPLOYMENT_TYPES:
+            errors.append('Invalid employment type')
+        
+        basic_salary = row.get('basic_salary')
+        if basic_salary not in (None, ''):
+            errors.extend(ImportService.salary_errors(basic_salary))
+            basic_salary = None if errors else float(basic_salary)
+        else:
+            basic_salary = None
+        return errors, values, basic_salary
+    
+    @staticmethod
+    def salary_errors(value):
+        """Errors for a basic salary: not a finite number, negative or above MAX_SALARY"""
+        try:
+            salary = float(value)
+        except (ValueError, TypeError):
+            return ['Invalid salary format']
+        if not math.isfinite(salary):
+            return ['Invalid salary format']
+        if salary < 0:
+            return ['Salary cannot be negative']
+        if salary > MAX_SALARY:
+            return [f'Salary cannot exceed {MAX_SALARY:,.2f}']
+        return []
+    
+    @staticmethod
+    def _existing_keys():
+        """Lower-cased emails and employee ids already taken (MySQL compares them case-insensitively)"""
+        emails, employee_ids = set(), set()
+        for email, employee_id in db.session.query(Employee.email, Employee.employee_id).yield_per(10000):
+            emails.add(email.lower())
+            employee_ids.add(employee_id.lower())
+        return emails, employee_ids
+    
+    @staticmethod
+    def _insert_chunk(chunk):
+        """Insert employees and their initial salaries
+        
+        chunk is a list of (line number, employee values, basic salary). Bulk inserts skip
+        the unit of work, so the search and compensation indexes reload on next use; new
+        employees have no payroll runs to flag for recalculation.
+        """
+        db.session.execute(db.insert(Employee), [dict(values, is_active=True) for _, values, _ in chunk])
+        
+        # MySQL has no INSERT ... RETURNING: read the new ids back by employee id
+        salaries = {values['employee_id'].lower(): salary for _, values, salary in chunk if salary is not None}
+        if salaries:
+            ids = db.session.query(Employee.id, Employee.employee_id).filter(
+                Employee.employee_id.in_([values['employee_id'] for _, values, salary in chunk if salary is not None])
+            )
+            today = date.today()
+            db.session.execute(db.insert(Salary), [
+                {'employee_id': employee_id, 'basic_salary': salaries[key.lower()], 'start_date': today}
+                for employee_id, key in ids if key.lower() in salaries
+            ])
+    
+    @staticmethod
+    def import_employees(rows, chunk_size=1000, dry_run=False, on_error=None, progress=None, result=None):
+        """Validate and insert employees from read_rows() output in chunked bulk inserts
+        
+        Emails and employee ids are checked against a preloaded set of existing ones and
+        against earlier rows of the same file. Each chunk commits on its own, so rows
+        before a failure stay imported; pass a result dict to be filled in as chunks
+        commit, so those counts survive an exception. Memory holds one chunk plus the
+        key sets; the report keeps the first MAX_REPORTED_ERRORS errors and
+        on_error(error) sees all.
+        """
+        if result is None:
+            result = {}
+        result.update({'success_count': 0, 'error_count': 0, 'errors': [], 'errors_truncated': False})
+        emails, employee_ids = ImportService._existing_keys()
+        file_emails, file_employee_ids = set(), set()
+        today = date.today()
+        
+        def fail(line, employee_id, messages):
+            error = {'line': line, 'employee_id': employee_id, 'errors': messages}
+            result['error_count'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append(error)
+            else:
+                result['errors_truncated'] = True
+            if on_error:
+                on_error(error)
+        
+        def write(chunk):
+            if not dry_run:
+                try:
+                    ImportService._insert_chunk(chunk)
+                    db.session.commit()
+                except IntegrityError:
+                    # Another writer took some of these keys since they were loaded:
+                    # insert row by row so only the conflicting rows fail
+                    db.session.rollback()
+                    imported = []
+                    for pending in chunk:
+                        try:
+                            with db.session.begin_nested():
+                                ImportService._insert_chunk([pending])
+                            imported.append(pending)
+                        except IntegrityError:
+                            fail(pending[0], pending[1]['employee_id'], ['Email or employee ID already exists'])
+                    db.session.commit()
+                    chunk = imported
+            result['success_count'] += len(chunk)
+            if progress:
+                progress(result['success_count'], result['error_count'])
+        
+        chunk = []
+        for line, row, parse_error in rows:
+            if parse_error:
+                fail(line, None, [parse_error])
+                continue
+            errors, values, basic_salary = ImportService.validate(row, today)
+            email = (values['email'] or '').lower()
+            employee_id = (values['employee_id'] or '').lower()
+            for key, existing, seen, label in (
+                (email, emails, file_emails, 'Email'), (employee_id, employee_ids, file_employee_ids, 'Employee ID')
+            ):
+                if key in existing:
+                    errors.append(f'{label} already exists')
+                elif key in seen:
+                    errors.append(f'{label} appears earlier in the file')
+            if errors:
+                fail(line, values['employee_id'], errors)
+                continue
+            
+            file_emails.add(email)
+            file_employee_ids.add(employee_id)
+            chunk.append((line, values, basic_salary))
+            if len(chunk) >= chunk_size:
+                write(chunk)
+                chunk = []
+        if chunk:
+            write(chunk)
+        return result
@@ -0,0 +1,272 @@
+import time
+from datetime import timedelta
+from bisect import bisect_right
+from collections import defaultdict
+from threading import RLock
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Salary, Allowance, Deduction
+
+class IntervalIndex:
+    """Effective-dated records of one model, sorted by start date per employee"""
+    
+    def __init__(self, model):
+        self.model = model
+        # Every column except the audit timestamps, so records can be serialized like the model
+        self.columns = [
+            column for column in model.__table__.columns
+            if column.key not in ('created_at', 'updated_at')
+        ]
+        self._records = {}  # employee_id -> (start dates, records)
+        self.count = 0  # records held, compared with the table's row count
+        self.watermark = None  # latest updated_at the index is known to hold every change up to
+        self.settled = False  # whether the watermark's second had passed at the last check
+    
+    def load(self, employee_ids=None):
+        """Load every record in one scan, or reload only the given employees
+        
+        Only a full load moves the watermark: a partial one says nothing about
+        other employees' rows.
+        """
+        query = db.session.query(*self.columns, self.model.updated_at, db.func.current_timestamp())
+        if employee_ids is not None:
+            query = query.filter(self.model.employee_id.in_(list(employee_ids)))
+        
+        keys = [column.key for column in self.columns]
+        grouped = defaultdict(list)
+        watermark = now = None
+        for row in query:
+            record = dict(zip(keys, row))
+            grouped[record['employee_id']].append(record)
+            updated_at, now = row[-2:]
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        if employee_ids is None:
+            self.watermark = watermark
+            self.settled = watermark is not None and watermark < now
+        
+        entries = {}
+        for employee_id, records in grouped.items():
+            records.sort(key=lambda r: (r['start_date'], r['id']))
+            entries[employee_id] = ([r['start_date'] for r in records], records)
+        
+        if employee_ids is None:
+            self._records = entries
+            self.count = sum(len(records) for _, records in entries.values())
+        else:
+            for employee_id in employee_ids:
+                previous = self._records.pop(employee_id, None)
+                if previous is not None:
+                    self.count -= len(previous[1])
+                if employee_id in entries:
+                    self._records[employee_id] = entries[employee_id]
+                    self.count += len(entries[employee_id][1])
+    
+    def changed_since_filter(self):
+        """Rows written after the watermark, or in its second while that hadn't passed yet"""
+        if self.settled:
+            return self.model.updated_at > self.watermark
+        # Timestamps are whole seconds: > one second earlier is >= the watermark, and
+        # also matches SQLite's stored text, which has no fractional part
+        return self.model.updated_at > self.watermark - timedelta(seconds=1)
+    
+    def active(self, employee_id, period_start, period_end):
+        """Records active at any point in [period_start, period_end], ordered by id"""
+        entry = self._records.get(employee_id)
+        if not entry:
+            return []
+        starts, records = entry
+        # Binary search drops everything starting after the period
+        candidates = records[:bisect_right(starts, period_end)]
+        active = [r for r in candidates if r['end_date'] is None or r['end_date'] >= period_start]
+        active.sort(key=lambda r: r['id'])
+        return active
+    
+    def latest_active(self, employee_id, period_start, period_end):
+        """The active record with the latest start date, or None"""
+        entry = self._records.get(employee_id)
+        if not entry:
+            return None
+        starts, records = entry
+        # Records are sorted by start date, so walk back from the end of the candidates
+        for record in reversed(records[:bisect_right(starts, period_end)]):
+            if record['end_date'] is None or record['end_date'] >= period_start:
+                return record
+        return None
+    
+    def active_many(self, employee_ids, period_start, period_end):
+        """Active records per employee for a set of employees, skipping employees with none"""
+        grouped = {}
+        for employee_id in employee_ids:
+            records = self.active(employee_id, period_start, period_end)
+            if records:
+                grouped[employee_id] = records
+        return grouped
+    
+    def to_dict(self, record):
+        """Serialize a record exactly as the model's to_dict would"""
+        # A transient instance is never added to the session
+        return self.model(**record).to_dict()
+
+class CompensationIndex:
+    """Interval indexes for salaries, allowances and deductions with change-driven refresh
+    
+    Commits in this process stale the employees they touched. Once per transaction
+    the tables are checked for writes by other workers: rows updated after the
+    latest updated_at loaded reload just their employees, and a row count that
+    still differs from the index (a delete) reloads everything.
+    """
+    
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.salaries = IntervalIndex(Salary)
+        self.allowances = IntervalIndex(Allowance)
+        self.deductions = IntervalIndex(Deduction)
+        self._by_model = {Salary: self.salaries, Allowance: self.allowances, Deduction: self.deductions}
+        self._lock = RLock()
+        self._loaded_at = None
+        self._stale = set()
+        self._stale_all = True
+    
+    def for_model(self, model):
+        """The index for Salary, Allowance or Deduction, refreshed if needed"""
+        self.ensure_fresh()
+        return self._by_model[model]
+    
+    def _check_other_writers(self):
+        """Pick up rows other processes wrote since the last check in this transaction's snapshot
+        
+        One query in the common case: each table's row count, latest updated_at and
+        number of rows past its index's watermark. Only tables with such rows run a
+        second query for the employees to reload.
+        """
+        session = db.session()
+        transaction = session.get_transaction()
+        if transaction is not None and session.info.get('compensation_checked') is transaction:
+            return
+        indexes = list(self._by_model.values())
+        columns = []
+        for index in indexes:
+            model = index.model
+            columns.append(db.select(db.func.count(model.id)).scalar_subquery())
+            columns.append(db.select(db.func.max(model.updated_at)).scalar_subquery())
+            changed = db.select(db.func.count(model.id))
+            if index.watermark is not None:
+                changed = changed.where(index.changed_since_filter())
+            columns.append(changed.scalar_subquery())
+        row = db.session.execute(db.select(*columns, db.func.current_timestamp())).one()
+        now = row[-1]
+        
+        for i, index in enumerate(indexes):
+            count, latest, changed = row[3 * i:3 * i + 3]
+            if changed and index.watermark is not None:
+                employee_ids = [
+                    employee_id for employee_id, in db.session.query(index.model.employee_id)
+                    .filter(index.changed_since_filter()).distinct()
+                ]
+                index.load(employee_ids)
+            # Every row up to the table's latest updated_at is now in the index
+            index.watermark = latest
+            if count != index.count:
+                # Rows were deleted (or written without updated_at) elsewhere
+                self._stale_all = True
+            # Timestamps have one-second resolution: until the watermark's second has
+            # passed, rows written later in it are looked for with >= instead of >
+            index.settled = index.watermark is None or index.watermark < now
+        # Repeatable reads show nothing newer within one transaction
+        session.info['compensation_checked'] = session.get_transaction()
+    
+    def ensure_fresh(self):
+        """Reload stale employees, and everything when rows were deleted elsewhere or after the TTL"""
+        with self._lock:
+            expired = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+            if not (self._stale_all or expired):
+                if self._stale:
+                    employee_ids = list(self._stale)
+                    for index in self._by_model.values():
+                        index.load(employee_ids)
+                    self._stale.clear()
+                self._check_other_writers()
+            if self._stale_all or expired:
+                for index in self._by_model.values():
+                    index.load()
+                self._loaded_at = time.monotonic()
+                self._stale_all = False
+                self._stale.clear()
+                db.session().info['compensation_checked'] = db.session().get_transaction()
+    
+    def mark_stale(self, employee_ids):
+        with self._lock:
+            self._stale.update(employee_ids)
+    
+    def mark_all_stale(self):
+        with self._lock:
+            self._stale_all = True
+
+_INDEXED_MODELS = (Salary, Allowance, Deduction)
+
+def _has_uncommitted_changes(session):
+    """Whether the session holds compensation changes the index can't see yet"""
+    if session.info.get('compensation_changes') or session.info.get('compensation_changes_all'):
+        return True
+    return any(
+        isinstance(obj, _INDEXED_MODELS)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+    )
+
+def get_compensation_index():
+    """The app's compensation index, or None when disabled or the session has uncommitted changes
+    
+    Callers fall back to querying the database when this returns None.
+    """
+    if not current_app.config.get('INTERVAL_INDEX_ENABLED', True):
+        return None
+    if _has_uncommitted_changes(db.session):
+        return None
+    index = current_app.extensions.get('compensation_index')
+    if index is None:
+        index = CompensationIndex(ttl=current_app.config.get('INTERVAL_INDEX_TTL', 300))
+        current_app.extensions['compensation_index'] = index
+    return index
+
+@event.listens_for(Session, 'after_flush')
+def _track_compensation_changes(session, flush_context):
+    """Collect employees whose salary, allowance or deduction rows changed"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, _INDEXED_MODELS):
+            changed = session.info.setdefault('compensation_changes', set())
+            changed.add(obj.employee_id)
+            # A record moved to another employee stales the previous owner as well
+            changed.update(inspect(obj).attrs.employee_id.history.deleted or ())
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_compensation_bulk_changes(orm_execute_state):
+    """Bulk DML bypasses the unit of work, so it stales the whole index"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _INDEXED_MODELS:
+        orm_execute_state.session.info['compensation_changes_all'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_compensation_index(session):
+    """Hand committed changes to the index; it reloads them on next use"""
+    changed = session.info.pop('compensation_changes', None)
+    changed_all = session.info.pop('compensation_changes_all', False)
+    if not (changed or changed_all) or not has_app_context():
+        return
+    index = current_app.extensions.get('compensation_index')
+    if index is None:
+        return
+    if changed_all:
+        index.mark_all_stale()
+    else:
+        index.mark_stale(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_compensation_changes(session):
+    """Forget uncommitted compensation changes"""
+    session.info.pop('compensation_changes', None)
+    session.info.pop('compensation_changes_all', None)
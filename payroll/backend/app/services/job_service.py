@@ -0,0 +1,195 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import current_app
+from app import db
+from app.models import Job
+from app.services.payroll_service import PayrollService
+
+# Keep job rows bounded; the full error list is in the job result when needed
+MAX_STORED_ERRORS = 100
+
+_executor = None
+_executor_lock = Lock()
+
+def _worker_name():
+    """host:pid of this process, recorded on the jobs it runs"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def _worker_alive(worker):
+    """Whether the process that claimed a job may still be running it
+    
+    Processes on other hosts can't be checked and count as alive; their jobs are
+    recovered once they stop reporting progress.
+    """
+    host, _, pid = (worker or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    if int(pid) == os.getpid():
+        # Recovery runs before this process takes any job: the pid was reused
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _get_executor():
+    """Create the shared worker pool on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('JOB_WORKERS', 2),
+                thread_name_prefix='payroll-job'
+            )
+        return _executor
+
+class JobService:
+    """Service for running long payroll operations in the background"""
+    
+    handlers = {}
+    
+    @staticmethod
+    def register(job_type):
+        """Decorator registering a handler(params, created_by, progress) for a job type"""
+        def decorator(func):
+            JobService.handlers[job_type] = func
+            return func
+        return decorator
+    
+    @staticmethod
+    def submit(job_type, params, created_by):
+        """Persist a queued job and hand it to the worker pool"""
+        if job_type not in JobService.handlers:
+            raise ValueError(f'Unknown job type: {job_type}')
+        if not isinstance(params, dict):
+            raise ValueError('Job params must be a dict')
+        
+        job = Job(job_type=job_type, params=params, created_by=created_by, status='queued')
+        db.session.add(job)
+        db.session.commit()
+        
+        app = current_app._get_current_object()
+        _get_executor().submit(JobService._run, app, job.id)
+        return job
+    
+    @staticmethod
+    def recover():
+        """Fail running jobs whose worker is gone and hand queued jobs to this process's pool
+        
+        Jobs live in the worker pool of the process that submitted them, so a restart
+        leaves them running or queued forever. A running job is orphaned when its
+        process on this host no longer exists, or when it has reported no progress for
+        JOB_STALE_AFTER seconds. Returns (failed count, requeued count).
+        """
+        stale_before = datetime.now() - timedelta(seconds=current_app.config.get('JOB_STALE_AFTER', 3600))
+        failed = 0
+        for job in Job.query.filter_by(status='running').all():
+            if _worker_alive(job.worker) and job.updated_at is not None and job.updated_at >= stale_before:
+                continue
+            job.status = 'failed'
+            job.errors = (job.errors or []) + ['Worker stopped before the job finished']
+            job.finished_at = datetime.now()
+            failed += 1
+        db.session.commit()
+        
+        # Another live process may also hold some of these; _run only starts unclaimed jobs
+        app = current_app._get_current_object()
+        queued = [job_id for job_id, in db.session.query(Job.id).filter_by(status='queued').order_by(Job.id)]
+        for job_id in queued:
+            _get_executor().submit(JobService._run, app, job_id)
+        return failed, len(queued)
+    
+    @staticmethod
+    def recover_once():
+        """Run recover() on the app's first call, if JOB_RECOVERY_ENABLED"""
+        with _executor_lock:
+            if current_app.extensions.get('jobs_recovered'):
+                return
+            current_app.extensions['jobs_recovered'] = True
+        if current_app.config.get('JOB_RECOVERY_ENABLED', True):
+            JobService.recover()
+    
+    @staticmethod
+    def _run(app, job_id):
+        """Execute a job inside its own app context and session, unless another worker claimed it"""
+        with app.app_context():
+            try:
+                claimed = db.session.execute(
+                    db.update(Job).where(Job.id == job_id, Job.status == 'queued')
+                    .values(status='running', started_at=datetime.now(), worker=_worker_name())
+                ).rowcount
+                db.session.commit()
+                if not claimed:
+                    return
+                job = db.session.get(Job, job_id)
+                
+                handler = JobService.handlers[job.job_type]
+                params = dict(job.params or {})
+                created_by = job.created_by
+                
+                def progress(processed, failed, total=None):
+                    JobService._report_progress(job_id, processed, failed, total)
+                
+                result = handler(params, created_by, progress)
+                
+                job = db.session.get(Job, job_id)
+                job.status = 'succeeded'
+                job.result = result
+                job.errors = (result or {}).get('errors', [])[:MAX_STORED_ERRORS]
+                job.finished_at = datetime.now()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(Job, job_id)
+                if job:
+                    job.status = 'failed'
+                    job.errors = (job.errors or []) + [str(e)]
+                    job.finished_at = datetime.now()
+                    db.session.commit()
+            finally:
+                db.session.remove()
+    
+    @staticmethod
+    def _report_progress(job_id, processed, failed, total=None):
+        """Record progress counts for a running job"""
+        values = {'processed': processed, 'failed': failed}
+        if total is not None:
+            values['total'] = total
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+
+@JobService.register('bulk_create')
+def _bulk_create_job(params, created_by, progress):
+    """Create draft payroll runs for all active employees"""
+    return PayrollService.create_bulk_runs(
+        params['month'], params['year'], created_by,
+        default_deductions=float(params.get('default_deductions', 0)),
+        chunk_size=int(params.get('chunk_size', 1000)),
+        resume=bool(params.get('resume', False)),
+        progress=progress
+    )
+
+@JobService.register('process_month')
+def _process_month_job(params, created_by, progress):
+    """Process every draft payroll run for a month"""
+    return PayrollService.process_month(
+        params['month'], params['year'],
+        chunk_size=int(params.get('chunk_size', 500)),
+        resume=bool(params.get('resume', False)),
+        progress=progress
+    )
+
+@JobService.register('recalculate')
+def _recalculate_job(params, created_by, progress):
+    """Refresh draft payroll runs flagged by salary changes for a month"""
+    return PayrollService.recalculate_runs(
+        month=params['month'], year=params['year'],
+        chunk_size=int(params.get('chunk_size', 500)),
+        progress=progress
+    )
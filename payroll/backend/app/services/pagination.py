@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from app import db
+
+class KeysetPage:
+    """One page of rows read by keyset (cursor) pagination"""
+    
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+def _signature(columns, descending):
+    return [column.key for column in columns] + ['desc' if descending else 'asc']
+
+def encode_cursor(columns, descending, item, direction):
+    """Opaque cursor pointing just after (direction 'next') or before ('prev') an item"""
+    values = []
+    for column in columns:
+        value = getattr(item, column.key)
+        values.append(value.isoformat() if isinstance(value, (date, datetime)) else value)
+    payload = {'s': _signature(columns, descending), 'v': values, 'd': direction}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(columns, descending, token):
+    """(values, direction) of a cursor; ValueError if it is malformed or from another sort order"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if (payload['s'] != _signature(columns, descending) or payload['d'] not in ('next', 'prev')
+                or len(payload['v']) != len(columns)):
+            raise ValueError
+        values = []
+        for column, value in zip(columns, payload['v']):
+            if value is not None and isinstance(column.type, db.DateTime):
+                # Compared as text: SQLite stores CURRENT_TIMESTAMP defaults without the
+                # microseconds SQLAlchemy adds to bound datetimes; MySQL converts either way
+                value = db.literal(datetime.fromisoformat(value).isoformat(' '))
+            elif value is not None and isinstance(column.type, db.Date):
+                value = date.fromisoformat(value)
+            values.append(value)
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    return values, payload['d']
+
+def _after(columns, values, descending):
+    """Rows strictly after values in the ordering
+    
+    NULLs sort first ascending and last descending, as in MySQL and SQLite.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [c.is_(None) if v is None else c == v for c, v in zip(columns[:i], values[:i])]
+        nullable = column.expression.nullable
+        if value is None:
+            later = db.false() if descending else column.isnot(None)
+        elif descending:
+            later = db.or_(column < value, column.is_(None)) if nullable else column < value
+        else:
+            later = column > value
+        clauses.append(db.and_(*equal, later))
+    return db.or_(*clauses)
+
+def keyset_paginate(query, columns, descending=False, cursor=None, per_page=10, with_total=False):
+    """Read one page of query ordered by columns, the last of which must be unique
+    
+    Pages are found with a range condition on the sort key instead of OFFSET, so
+    every page costs the same as the first. The total is counted only when asked for.
+    """
+    values, direction = decode_cursor(columns, descending, cursor) if cursor else (None, 'next')
+    backwards = direction == 'prev'
+    # Earlier pages are read in reverse order and flipped back
+    reverse = descending != backwards
+    
+    page_query = query.order_by(None)
+    if values is not None:
+        page_query = page_query.filter(_after(columns, values, reverse))
+    page_query = page_query.order_by(*(column.desc() if reverse else column.asc() for column in columns))
+    
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+    
+    next_cursor = prev_cursor = None
+    if items:
+        if has_more or backwards:
+            next_cursor = encode_cursor(columns, descending, items[-1], 'next')
+        if (has_more and backwards) or (values is not None and not backwards):
+            prev_cursor = encode_cursor(columns, descending, items[0], 'prev')
+    
+    total = query.order_by(None).count() if with_total else None
+    return KeysetPage(items, next_cursor, prev_cursor, total)
@@ -0,0 +1,95 @@
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the scalar path gives identical results
+    np = None
+
+# Below this many rows the array setup costs more than it saves
+VECTORIZE_THRESHOLD = 32
+
+# Progressive tax brackets as (upper bound, rate); the last bracket is open-ended
+TAX_BRACKETS = [
+    (1000, 0.0),
+    (3000, 0.1),
+    (5000, 0.15),
+    (None, 0.2),
+]
+
+def compile_brackets(brackets):
+    """Compile (upper bound, rate) brackets into cumulative threshold tables
+    
+    Brackets must be sorted by upper bound with the open-ended bracket (None) last.
+    """
+    uppers = []
+    lowers = []
+    bases = []
+    rates = []
+    
+    lower = 0.0
+    base = 0.0
+    for upper, rate in brackets:
+        lowers.append(lower)
+        bases.append(base)
+        rates.append(rate)
+        if upper is None:
+            break
+        uppers.append(float(upper))
+        base += (upper - lower) * rate
+        lower = float(upper)
+    
+    table = {'uppers': uppers, 'lowers': lowers, 'bases': bases, 'rates': rates}
+    if np is not None:
+        table['arrays'] = {key: np.asarray(values, dtype=np.float64) for key, values in table.items()}
+    return table
+
+DEFAULT_TAX_TABLE = compile_brackets(TAX_BRACKETS)
+
+def calculate_tax(gross_salary, table=None):
+    """Calculate progressive tax for a single gross salary"""
+    table = table or DEFAULT_TAX_TABLE
+    # A salary equal to a bracket's upper bound is still taxed in that bracket
+    i = bisect_left(table['uppers'], gross_salary)
+    return table['bases'][i] + (gross_salary - table['lowers'][i]) * table['rates'][i]
+
+def calculate_tax_array(gross_salaries, table=None):
+    """Calculate progressive tax for an array of gross salaries"""
+    arrays = (table or DEFAULT_TAX_TABLE)['arrays']
+    i = np.searchsorted(arrays['uppers'], gross_salaries, side='left')
+    return arrays['bases'][i] + (gross_salaries - arrays['lowers'][i]) * arrays['rates'][i]
+
+def calculate_batch(basic_salaries, total_allowances, total_deductions, table=None, vectorized=None):
+    """Calculate gross, tax and net salary for parallel sequences of payroll inputs
+    
+    Returns a dict of lists of Python floats. The vectorized and scalar paths
+    evaluate the same expressions in the same order, so they agree exactly.
+    """
+    if vectorized is None:
+        vectorized = np is not None and len(basic_salaries) >= VECTORIZE_THRESHOLD
+    
+    if vectorized:
+        basic = np.asarray(basic_salaries, dtype=np.float64)
+        allowances = np.asarray(total_allowances, dtype=np.float64)
+        deductions = np.asarray(total_deductions, dtype=np.float64)
+        
+        gross = basic + allowances
+        tax = calculate_tax_array(gross, table)
+        net = gross - deductions - tax
+        
+        return {
+            'gross_salary': gross.tolist(),
+            'tax': tax.tolist(),
+            'net_salary': net.tolist()
+        }
+    
+    gross = []
+    tax = []
+    net = []
+    for basic, allowances, deductions in zip(basic_salaries, total_allowances, total_deductions):
+        gross_salary = float(basic) + float(allowances)
+        tax_amount = calculate_tax(gross_salary, table)
+        gross.append(gross_salary)
+        tax.append(tax_amount)
+        net.append(gross_salary - float(deductions) - tax_amount)
+    
+    return {'gross_salary': gross, 'tax': tax, 'net_salary': net}
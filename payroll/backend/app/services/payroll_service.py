@@ -1,6 +1,18 @@
 from datetime import datetime, date
+from collections import defaultdict
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 from app import db
-from app.models import Salary, Allowance, Deduction, Payslip, PayslipDetail, Employee
+from app.models import (
+    Salary, Allowance, Deduction, Payslip, PayslipDetail, Employee, PayrollRun, PayrollCheckpoint
+)
+from app.services import payroll_engine
+from app.services.tax_service import TaxService
+from app.services.interval_index import get_compensation_index
+from app.services.prerender_service import PrerenderService
+from app.services.summary_service import SummaryService
+from app.services.distribution_service import DistributionService
 
 class PayrollService:
     """Service for payroll calculations and processing"""
@@ -8,97 +20,701 @@ class PayrollService:
     @staticmethod
     def calculate_payroll(employee_id, month, year):
         """Calculate payroll for an employee for a specific month"""
-        print(f"DEBUG: Calculating payroll for employee {employee_id}, month {month}, year {year}")
-        
         employee = Employee.query.get(employee_id)
         if not employee:
-            print(f"DEBUG: Employee {employee_id} not found")
             return {'error': 'Employee not found'}
         
-        print(f"DEBUG: Found employee {employee.name}")
-        
-        # Get active salary on the specified month/year
-        salary = PayrollService._get_active_salary(employee_id, month, year)
-        if not salary:
-            print(f"DEBUG: No salary found for employee {employee_id}")
+        result = PayrollService.calculate_batch([employee_id], month, year)[0]
+        if 'error' in result:
             return {'error': f'No salary found for employee {employee.name}'}
+        return result
+    
+    @staticmethod
+    def calculate_batch(employee_ids, month, year, vectorized=None):
+        """Calculate payroll for many employees at once with the batch engine"""
+        employee_ids = list(employee_ids)
         
-        print(f"DEBUG: Found salary {salary.basic_salary}")
-        basic_salary = salary.basic_salary
+        # Latest salary active on the first of the month, per employee
+        salaries = PayrollService._active_salaries(employee_ids, date(year, month, 1))
         
-        # Calculate allowances
-        allowances = Allowance.query.filter(
-            Allowance.employee_id == employee_id,
-            Allowance.start_date <= date(year, month, 28),
-            db.or_(Allowance.end_date.is_(None), Allowance.end_date >= date(year, month, 1))
-        ).all()
+        allowances = PayrollService._load_active_records(
+            Allowance, Allowance.allowance_type, employee_ids, month, year
+        )
+        deductions = PayrollService._load_active_records(
+            Deduction, Deduction.deduction_type, employee_ids, month, year
+        )
         
-        total_allowances = sum(a.amount for a in allowances)
+        paid_ids = [employee_id for employee_id in employee_ids if employee_id in salaries]
+        totals = payroll_engine.calculate_batch(
+            [salaries[employee_id] for employee_id in paid_ids],
+            [sum(a['amount'] for a in allowances.get(employee_id, [])) for employee_id in paid_ids],
+            [sum(d['amount'] for d in deductions.get(employee_id, [])) for employee_id in paid_ids],
+            table=TaxService.get_table(year),
+            vectorized=vectorized
+        )
         
-        # Calculate deductions
-        deductions = Deduction.query.filter(
-            Deduction.employee_id == employee_id,
-            Deduction.start_date <= date(year, month, 28),
-            db.or_(Deduction.end_date.is_(None), Deduction.end_date >= date(year, month, 1))
-        ).all()
+        calculated = {}
+        for i, employee_id in enumerate(paid_ids):
+            allowances_detail = allowances.get(employee_id, [])
+            deductions_detail = deductions.get(employee_id, [])
+            calculated[employee_id] = {
+                'employee_id': employee_id,
+                'basic_salary': salaries[employee_id],
+                'total_allowances': sum(a['amount'] for a in allowances_detail),
+                'total_deductions': sum(d['amount'] for d in deductions_detail),
+                'gross_salary': totals['gross_salary'][i],
+                'tax': totals['tax'][i],
+                'net_salary': totals['net_salary'][i],
+                'allowances_detail': allowances_detail,
+                'deductions_detail': deductions_detail
+            }
+        
+        return [
+            calculated.get(employee_id, {
+                'employee_id': employee_id,
+                'error': f'No salary found for employee {employee_id}'
+            })
+            for employee_id in employee_ids
+        ]
+    
+    @staticmethod
+    def _active_salaries(employee_ids, target_date):
+        """Get the latest salary active on a date for each employee, as {employee_id: basic_salary}"""
+        salaries = {}
+        index = get_compensation_index()
+        if index is not None:
+            salary_index = index.for_model(Salary)
+            for employee_id in employee_ids:
+                salary = salary_index.latest_active(employee_id, target_date, target_date)
+                if salary:
+                    salaries[employee_id] = salary['basic_salary']
+            return salaries
+        
+        for ids in PayrollService._id_batches(list(employee_ids)):
+            salary_rows = db.session.query(Salary.employee_id, Salary.basic_salary).filter(
+                Salary.employee_id.in_(ids),
+                Salary.start_date <= target_date,
+                db.or_(Salary.end_date.is_(None), Salary.end_date >= target_date)
+            ).order_by(Salary.employee_id, Salary.start_date.desc())
+            for employee_id, basic_salary in salary_rows:
+                salaries.setdefault(employee_id, basic_salary)
+        return salaries
+    
+    @staticmethod
+    def current_salaries(employee_ids):
+        """Get the latest salary not ended before today for each employee, as {employee_id: basic_salary}"""
+        today = date.today()
+        salaries = {}
+        index = get_compensation_index()
+        if index is not None:
+            salary_index = index.for_model(Salary)
+            for employee_id in employee_ids:
+                salary = salary_index.latest_active(employee_id, today, date.max)
+                if salary:
+                    salaries[employee_id] = salary['basic_salary']
+            return salaries
+        
+        # One salary query per id batch
+        for ids in PayrollService._id_batches(list(employee_ids)):
+            salary_rows = db.session.query(Salary.employee_id, Salary.basic_salary).filter(
+                Salary.employee_id.in_(ids),
+                db.or_(Salary.end_date.is_(None), Salary.end_date >= today)
+            ).order_by(Salary.employee_id, Salary.start_date.desc(), Salary.id.desc())
+            for employee_id, basic_salary in salary_rows:
+                salaries.setdefault(employee_id, basic_salary)
+        return salaries
+    
+    @staticmethod
+    def _calculate_tax(gross_salary, year=None):
+        """Calculate tax based on gross salary, using the bracket table for the year if given"""
+        if year is None:
+            return payroll_engine.calculate_tax(gross_salary)
+        return TaxService.calculate_tax(gross_salary, year)
+    
+    @staticmethod
+    def _period_bounds(month, year):
+        """Get the date window used to match allowances and deductions to a payroll month"""
+        return date(year, month, 1), date(year, month, 28)
+    
+    @staticmethod
+    def _load_active_records(model, type_column, employee_ids, month, year):
+        """Load active allowance/deduction amounts for a set of employees, grouped by employee"""
+        period_start, period_end = PayrollService._period_bounds(month, year)
+        
+        grouped = defaultdict(list)
+        index = get_compensation_index()
+        if index is not None:
+            if not isinstance(employee_ids, (list, tuple)):
+                employee_ids = [row[0] for row in employee_ids]
+            records = index.for_model(model).active_many(employee_ids, period_start, period_end)
+            for employee_id, active in records.items():
+                grouped[employee_id] = [
+                    {'type': record[type_column.key], 'amount': record['amount']} for record in active
+                ]
+            return grouped
+        
+        for ids in PayrollService._id_batches(employee_ids):
+            rows = db.session.query(model.employee_id, type_column, model.amount).filter(
+                model.employee_id.in_(ids),
+                model.start_date <= period_end,
+                db.or_(model.end_date.is_(None), model.end_date >= period_start)
+            ).order_by(model.employee_id, model.id)
+            for employee_id, record_type, amount in rows:
+                grouped[employee_id].append({'type': record_type, 'amount': amount})
+        return grouped
+    
+    @staticmethod
+    def _id_batches(employee_ids, batch_size=1000):
+        """Split a list of ids into IN-clause sized batches; subqueries pass through unchanged"""
+        if not isinstance(employee_ids, (list, tuple)):
+            yield employee_ids
+            return
+        for start in range(0, len(employee_ids), batch_size):
+            yield employee_ids[start:start + batch_size]
+    
+    @staticmethod
+    def _build_payslips(payroll_runs, allowances, deductions, tax_table=None):
+        """Compute payslip rows and detail rows for draft payroll runs with the batch engine"""
+        allowance_totals = []
+        deduction_totals = []
+        for run in payroll_runs:
+            allowance_totals.append(sum(a['amount'] for a in allowances.get(run.employee_id, [])))
+            deduction_totals.append(
+                sum(d['amount'] for d in deductions.get(run.employee_id, [])) + (run.deductions or 0)
+            )
+        
+        # Use the salary already stored in the payroll run instead of recalculating
+        totals = payroll_engine.calculate_batch(
+            [run.basic_salary for run in payroll_runs], allowance_totals, deduction_totals,
+            table=tax_table
+        )
+        
+        payslip_rows = []
+        detail_rows = {}
+        for i, run in enumerate(payroll_runs):
+            tax = totals['tax'][i]
+            payslip_rows.append({
+                'payroll_run_id': run.id,
+                'employee_id': run.employee_id,
+                'basic_salary': run.basic_salary,
+                'total_allowances': allowance_totals[i],
+                'total_deductions': deduction_totals[i],
+                'gross_salary': totals['gross_salary'][i],
+                'tax': tax,
+                'net_salary': totals['net_salary'][i]
+            })
+            
+            details = [
+                {'detail_type': 'allowance', 'description': a['type'], 'amount': a['amount']}
+                for a in allowances.get(run.employee_id, [])
+            ]
+            details.extend(
+                {'detail_type': 'deduction', 'description': d['type'], 'amount': d['amount']}
+                for d in deductions.get(run.employee_id, [])
+            )
+            if tax > 0:
+                details.append({'detail_type': 'deduction', 'description': 'Income Tax', 'amount': tax})
+            detail_rows[run.id] = details
+        
+        return payslip_rows, detail_rows
+    
+    @staticmethod
+    def process_run(payroll_run):
+        """Generate the payslip for a single draft payroll run and mark it processed"""
+        allowances = PayrollService._load_active_records(
+            Allowance, Allowance.allowance_type, [payroll_run.employee_id],
+            payroll_run.month, payroll_run.year
+        )
+        deductions = PayrollService._load_active_records(
+            Deduction, Deduction.deduction_type, [payroll_run.employee_id],
+            payroll_run.month, payroll_run.year
+        )
+        
+        existing_payslip = Payslip.query.filter_by(payroll_run_id=payroll_run.id).first()
+        if not existing_payslip:
+            payslip_rows, detail_rows = PayrollService._build_payslips(
+                [payroll_run], allowances, deductions, TaxService.get_table(payroll_run.year)
+            )
+            PayrollService._write_payslips(payslip_rows, detail_rows)
+        
+        payroll_run.status = 'processed'
+    
+    @staticmethod
+    def mark_runs_dirty(changes, connection=None):
+        """Flag draft runs whose payroll month overlaps a salary change
+        
+        changes are (employee_id, start_date, end_date) tuples; end_date None is open-ended.
+        Paths that write compensation rows with bulk statements call this themselves.
+        """
+        runs = PayrollRun.__table__.c
+        period = runs.year * 12 + runs.month
+        conditions = []
+        for employee_id, start_date, end_date in changes:
+            # A month is affected if the change overlaps its 1st-28th payroll window
+            first = start_date.year * 12 + start_date.month + (1 if start_date.day > 28 else 0)
+            condition = db.and_(runs.employee_id == employee_id, period >= first)
+            if end_date is not None:
+                condition = db.and_(condition, period <= end_date.year * 12 + end_date.month)
+            conditions.append(condition)
+        
+        connection = connection or db.session.connection()
+        for start in range(0, len(conditions), 500):
+            connection.execute(
+                db.update(PayrollRun.__table__)
+                .where(runs.status == 'draft', db.or_(*conditions[start:start + 500]))
+                .values(needs_recalculation=True)
+            )
+    
+    @staticmethod
+    def recalculate_runs(payroll_run_ids=None, month=None, year=None, force=False, chunk_size=500,
+                         progress=None):
+        """Refresh basic and net salary of draft runs flagged by salary changes
+        
+        Only flagged runs are recalculated unless force=True, so the cost follows the
+        number of changed employees rather than the size of the month. basic_salary
+        becomes the employee's current salary, picked as when the run was created, and
+        net_salary stays basic_salary - deductions. Each chunk commits on its own.
+        """
+        query = db.session.query(
+            PayrollRun.id, PayrollRun.employee_id, PayrollRun.deductions
+        ).filter(PayrollRun.status == 'draft')
+        if not force:
+            query = query.filter(PayrollRun.needs_recalculation.is_(True))
+        if payroll_run_ids is not None:
+            query = query.filter(PayrollRun.id.in_(payroll_run_ids))
+        if month:
+            query = query.filter(PayrollRun.month == month)
+        if year:
+            query = query.filter(PayrollRun.year == year)
+        runs = query.order_by(PayrollRun.id).all()
+        
+        result = {'recalculated_count': 0, 'error_count': 0, 'errors': []}
+        for start in range(0, len(runs), chunk_size):
+            chunk = runs[start:start + chunk_size]
+            salaries = PayrollService.current_salaries({run.employee_id for run in chunk})
+            
+            updates = []
+            for run in chunk:
+                if run.employee_id not in salaries:
+                    result['errors'].append({
+                        'payroll_run_id': run.id,
+                        'employee_id': run.employee_id,
+                        'error': 'No salary found for this employee'
+                    })
+                    continue
+                basic_salary = salaries[run.employee_id]
+                updates.append({
+                    'id': run.id,
+                    'basic_salary': basic_salary,
+                    'net_salary': basic_salary - (run.deductions or 0),
+                    'needs_recalculation': False
+                })
+            
+            if updates:
+                db.session.execute(db.update(PayrollRun), updates)
+            db.session.commit()
+            result['recalculated_count'] += len(updates)
+            
+            if progress:
+                progress(result['recalculated_count'], len(result['errors']), len(runs))
+        
+        result['error_count'] = len(result['errors'])
+        return result
+    
+    @staticmethod
+    def partition_filter(partition):
+        """Build a PayrollRun filter for a partition of employees
+        
+        A partition is ('department', name) or ('id_range', first_id, last_id).
+        """
+        if partition is None:
+            return db.true()
+        
+        kind = partition[0]
+        if kind == 'department':
+            department = partition[1]
+            department_filter = (
+                Employee.department.is_(None) if department is None
+                else Employee.department == department
+            )
+            return PayrollRun.employee_id.in_(
+                db.session.query(Employee.id).filter(department_filter)
+            )
+        if kind == 'id_range':
+            return PayrollRun.employee_id.between(partition[1], partition[2])
+        raise ValueError(f'Unknown partition type: {kind}')
+    
+    @staticmethod
+    def process_month(month, year, chunk_size=500, partition=None, atomic=False, progress=None,
+                      resume=False):
+        """Process every draft payroll run for a month using set-based reads and bulk writes
+        
+        By default each chunk commits on its own. With atomic=True the whole call is
+        one transaction and the first failing chunk raises after rolling back.
+        progress, if given, is called as progress(processed, failed, total) after each chunk.
+        Whole-month chunked runs record a checkpoint per chunk. Processed runs leave
+        draft, so a rerun picks up exactly the runs still left, including those of
+        failed chunks; resume=True keeps the checkpoint's counts instead of resetting them.
+        """
+        draft_filter = db.and_(
+            PayrollRun.month == month,
+            PayrollRun.year == year,
+            PayrollRun.status == 'draft',
+            PayrollService.partition_filter(partition)
+        )
         
-        total_deductions = sum(d.amount for d in deductions)
+        checkpoint = None
+        if partition is None and not atomic:
+            checkpoint = PayrollService._start_checkpoint('process_month', month, year, resume)
         
-        # Calculate gross salary
-        gross_salary = basic_salary + total_allowances
+        # Plain rows rather than ORM objects so per-chunk commits don't expire and reload them
+        runs = db.session.query(
+            PayrollRun.id, PayrollRun.employee_id, PayrollRun.basic_salary, PayrollRun.deductions
+        ).filter(draft_filter).order_by(PayrollRun.id).all()
         
-        # Calculate tax (simple flat percentage - customize as needed)
-        tax = PayrollService._calculate_tax(gross_salary)
+        result = {'processed_count': 0, 'error_count': 0, 'errors': []}
+        if checkpoint:
+            result['resumed_from'] = checkpoint['last_id']
+        if not runs:
+            if checkpoint:
+                PayrollService._save_checkpoint(checkpoint['id'], status='completed')
+                db.session.commit()
+            return result
         
-        # Calculate net salary
-        net_salary = gross_salary - total_deductions - tax
+        # One query per table for the whole month instead of two per payroll run
+        employee_ids = db.session.query(PayrollRun.employee_id).filter(draft_filter)
+        allowances = PayrollService._load_active_records(
+            Allowance, Allowance.allowance_type, employee_ids, month, year
+        )
+        deductions = PayrollService._load_active_records(
+            Deduction, Deduction.deduction_type, employee_ids, month, year
+        )
         
-        return {
-            'employee_id': employee_id,
-            'basic_salary': basic_salary,
-            'total_allowances': total_allowances,
-            'total_deductions': total_deductions,
-            'gross_salary': gross_salary,
-            'tax': tax,
-            'net_salary': net_salary,
-            'allowances_detail': [{'type': a.allowance_type, 'amount': a.amount} for a in allowances],
-            'deductions_detail': [{'type': d.deduction_type, 'amount': d.amount} for d in deductions]
+        tax_table = TaxService.get_table(year)
+        
+        existing_payslips = {
+            row[0] for row in db.session.query(Payslip.payroll_run_id).join(PayrollRun).filter(draft_filter)
         }
+        
+        # last_id only moves while every chunk so far succeeded
+        failed_chunk = False
+        for start in range(0, len(runs), chunk_size):
+            chunk = runs[start:start + chunk_size]
+            processed = []
+            for run in chunk:
+                if run.basic_salary is None:
+                    result['errors'].append({
+                        'payroll_run_id': run.id,
+                        'employee_id': run.employee_id,
+                        'error': 'Payroll run has no basic salary'
+                    })
+                    continue
+                processed.append(run)
+            
+            chunk_errors = len(chunk) - len(processed)
+            try:
+                payslip_rows, detail_rows = PayrollService._build_payslips(
+                    [run for run in processed if run.id not in existing_payslips],
+                    allowances, deductions, tax_table
+                )
+                PayrollService._write_payslips(payslip_rows, detail_rows)
+                if processed:
+                    db.session.execute(
+                        db.update(PayrollRun)
+                        .where(PayrollRun.id.in_([run.id for run in processed]))
+                        .values(status='processed')
+                    )
+                if checkpoint:
+                    counts = {} if failed_chunk else {'last_id': chunk[-1].id}
+                    PayrollService._save_checkpoint(
+                        checkpoint['id'],
+                        processed_count=PayrollCheckpoint.processed_count + len(processed),
+                        error_count=PayrollCheckpoint.error_count + chunk_errors,
+                        **counts
+                    )
+                if atomic:
+                    db.session.flush()
+                else:
+                    db.session.commit()
+                result['processed_count'] += len(processed)
+            except Exception as e:
+                db.session.rollback()
+                if atomic:
+                    raise
+                failed_chunk = True
+                if checkpoint:
+                    PayrollService._save_checkpoint(
+                        checkpoint['id'], error_count=PayrollCheckpoint.error_count + len(chunk)
+                    )
+                    db.session.commit()
+                # Only this chunk is lost; earlier chunks are already committed
+                for run in processed:
+                    result['errors'].append({
+                        'payroll_run_id': run.id,
+                        'employee_id': run.employee_id,
+                        'error': f'Database error: {str(e)}'
+                    })
+            else:
+                # Outside the try: the chunk is committed whatever happens here
+                if not atomic:
+                    PrerenderService.enqueue_runs([run.id for run in processed])
+            
+            if progress:
+                progress(result['processed_count'], len(result['errors']), len(runs))
+        
+        if checkpoint:
+            PayrollService._save_checkpoint(
+                checkpoint['id'], status='incomplete' if result['errors'] else 'completed'
+            )
+        if atomic or checkpoint:
+            db.session.commit()
+        
+        result['error_count'] = len(result['errors'])
+        return result
     
     @staticmethod
-    def _get_active_salary(employee_id, month, year):
-        """Get active salary for employee on specific month/year"""
-        target_date = date(year, month, 1)
-        print(f"DEBUG: Looking for salary for employee {employee_id} on {target_date}")
+    def _write_payslips(payslip_rows, detail_rows):
+        """Bulk insert payslips and their detail rows in the current transaction"""
+        if not payslip_rows:
+            return
         
-        # First, check all salaries for this employee
-        all_salaries = Salary.query.filter(Salary.employee_id == employee_id).all()
-        print(f"DEBUG: Found {len(all_salaries)} total salaries for employee {employee_id}")
-        for s in all_salaries:
-            print(f"DEBUG: Salary {s.id}: {s.basic_salary}, start: {s.start_date}, end: {s.end_date}")
+        db.session.execute(db.insert(Payslip), payslip_rows)
         
-        salary = Salary.query.filter(
-            Salary.employee_id == employee_id,
-            Salary.start_date <= target_date,
-            db.or_(Salary.end_date.is_(None), Salary.end_date >= target_date)
-        ).order_by(Salary.start_date.desc()).first()
+        # Read back generated ids so the detail rows can reference their payslip, along
+        # with the month and department the summary and sketch tables are keyed by
+        written = db.session.query(
+            Payslip.payroll_run_id, Payslip.id, PayrollRun.year, PayrollRun.month, Employee.department
+        ).join(
+            PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+        ).join(
+            Employee, Payslip.employee_id == Employee.id
+        ).filter(
+            Payslip.payroll_run_id.in_([row['payroll_run_id'] for row in payslip_rows])
+        ).all()
+        payslip_ids = {row.payroll_run_id: row.id for row in written}
+        keys = {row.payroll_run_id: {'year': row.year, 'month': row.month, 'department': row.department}
+                for row in written}
+        keyed_rows = [dict(row, **keys[row['payroll_run_id']]) for row in payslip_rows]
+        SummaryService.record_payslips(keyed_rows)
+        DistributionService.record_payslips(keyed_rows)
         
-        if salary:
-            print(f"DEBUG: Selected salary {salary.id}: {salary.basic_salary}")
-        else:
-            print(f"DEBUG: No active salary found for employee {employee_id} on {target_date}")
+        rows = []
+        for run_id, details in detail_rows.items():
+            for detail in details:
+                rows.append(dict(detail, payslip_id=payslip_ids[run_id]))
+        
+        if rows:
+            db.session.execute(db.insert(PayslipDetail), rows)
+    
+    
+    @staticmethod
+    def plan_bulk_runs(month, year, default_deductions=0, after_employee_id=None, limit=None):
+        """Plan draft payroll runs for active employees that don't have one for the month yet
+        
+        Returns (planned, errors, last_employee_id) where last_employee_id is the highest
+        employee id examined, or None when there were no candidates left.
+        """
+        # Anti-join: active employees with no payroll run for this month/year
+        candidates = db.session.query(Employee.id, Employee.name).outerjoin(
+            PayrollRun,
+            db.and_(
+                PayrollRun.employee_id == Employee.id,
+                PayrollRun.month == month,
+                PayrollRun.year == year
+            )
+        ).filter(
+            Employee.is_active == True,
+            PayrollRun.id.is_(None)
+        )
+        if after_employee_id is not None:
+            candidates = candidates.filter(Employee.id > after_employee_id)
+        candidates = candidates.order_by(Employee.id)
+        if limit:
+            candidates = candidates.limit(limit)
+        employees = candidates.all()
+        
+        if not employees:
+            return [], [], None
+        
+        # The latest current salary wins per employee
+        salaries = PayrollService.current_salaries([employee_id for employee_id, _ in employees])
+        
+        planned = []
+        errors = []
+        for employee_id, name in employees:
+            basic_salary = salaries.get(employee_id)
+            if basic_salary is None:
+                errors.append(f"No salary found for {name}")
+                continue
+            
+            planned.append({
+                'employee_id': employee_id,
+                'employee_name': name,
+                'month': month,
+                'year': year,
+                'basic_salary': basic_salary,
+                'deductions': default_deductions,
+                'net_salary': basic_salary - default_deductions
+            })
+        
+        return planned, errors, employees[-1][0]
+    
+    @staticmethod
+    def create_bulk_runs(month, year, created_by, default_deductions=0, dry_run=False,
+                         chunk_size=1000, resume=False, progress=None):
+        """Create draft payroll runs for every active employee with chunked bulk inserts
+        
+        Each chunk commits together with a checkpoint of the last employee id handled,
+        so resume=True continues after a crash without rescanning finished chunks.
+        """
+        if dry_run:
+            planned, errors, _ = PayrollService.plan_bulk_runs(month, year, default_deductions)
+            return {
+                'success_count': len(planned),
+                'error_count': len(errors),
+                'errors': errors,
+                'planned_runs': planned
+            }
+        
+        checkpoint = PayrollService._start_checkpoint('bulk_create', month, year, resume)
+        last_id = checkpoint['last_id']
+        result = {'success_count': 0, 'error_count': 0, 'errors': [], 'resumed_from': last_id}
+        retried = False
+        
+        while True:
+            planned, errors, last_seen = PayrollService.plan_bulk_runs(
+                month, year, default_deductions, after_employee_id=last_id, limit=chunk_size
+            )
+            if last_seen is None:
+                break
             
-        return salary
-    
-    @staticmethod
-    def _calculate_tax(gross_salary):
-        """Calculate tax based on gross salary"""
-        # Simple tax bracket system - customize as needed
-        if gross_salary <= 1000:
-            return 0
-        elif gross_salary <= 3000:
-            return (gross_salary - 1000) * 0.1
-        elif gross_salary <= 5000:
-            return 200 + (gross_salary - 3000) * 0.15
+            rows = [
+                dict({key: value for key, value in run.items() if key != 'employee_name'}, created_by=created_by)
+                for run in planned
+            ]
+            try:
+                if rows:
+                    db.session.execute(db.insert(PayrollRun), rows)
+                PayrollService._save_checkpoint(
+                    checkpoint['id'],
+                    last_id=last_seen,
+                    processed_count=PayrollCheckpoint.processed_count + len(rows),
+                    error_count=PayrollCheckpoint.error_count + len(errors)
+                )
+                db.session.commit()
+            except IntegrityError:
+                # Another writer created some of these runs; the unique constraint kept them
+                # single. Re-plan the same window once, which now skips the existing rows.
+                db.session.rollback()
+                if retried:
+                    raise
+                retried = True
+                continue
+            
+            retried = False
+            last_id = last_seen
+            result['success_count'] += len(rows)
+            result['error_count'] += len(errors)
+            result['errors'].extend(errors)
+            if progress:
+                progress(result['success_count'], result['error_count'])
+        
+        PayrollService._save_checkpoint(checkpoint['id'], status='completed')
+        db.session.commit()
+        return result
+    
+    @staticmethod
+    def _start_checkpoint(operation, month, year, resume):
+        """Get the checkpoint for an operation, resetting it unless resuming"""
+        checkpoint = PayrollCheckpoint.query.filter_by(
+            operation=operation, month=month, year=year
+        ).first()
+        
+        if checkpoint is None:
+            checkpoint = PayrollCheckpoint(operation=operation, month=month, year=year)
+            db.session.add(checkpoint)
+        elif not resume:
+            checkpoint.last_id = None
+            checkpoint.processed_count = 0
+            checkpoint.error_count = 0
+        checkpoint.status = 'in_progress'
+        db.session.commit()
+        
+        return {'id': checkpoint.id, 'last_id': checkpoint.last_id}
+    
+    @staticmethod
+    def _save_checkpoint(checkpoint_id, **values):
+        """Update checkpoint columns in the current transaction"""
+        db.session.execute(
+            db.update(PayrollCheckpoint).where(PayrollCheckpoint.id == checkpoint_id).values(**values)
+        )
+
+@event.listens_for(Session, 'after_flush')
+def _mark_runs_for_compensation_changes(session, flush_context):
+    """Flag draft runs covering the old or new dates of changed salaries
+    
+    A draft run stores only the basic salary and its own deductions; allowances and
+    deduction records are read when the run is processed, so their edits stale nothing.
+    """
+    changes = []
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Salary):
+            changes.append((obj.employee_id, obj.start_date, obj.end_date))
+    
+    for obj in session.dirty:
+        if not isinstance(obj, Salary) or not session.is_modified(obj):
+            continue
+        attrs = inspect(obj).attrs
+        starts = [obj.start_date, *attrs.start_date.history.deleted]
+        ends = [obj.end_date, *attrs.end_date.history.deleted]
+        values_changed = any(
+            attr.history.has_changes() for attr in attrs
+            if attr.key not in ('start_date', 'end_date', 'updated_at')
+        )
+        
+        if values_changed:
+            # Amount or owner changed: every month in the old or new interval is affected
+            spans = [(min(d for d in starts if d is not None), None if None in ends else max(ends))]
         else:
-            return 500 + (gross_salary - 5000) * 0.2
+            # Only dates moved: just the months between the old and new boundaries
+            spans = []
+            if attrs.start_date.history.deleted:
+                spans.append((min(starts), max(starts)))
+            if attrs.end_date.history.deleted:
+                bounded = [d for d in ends if d is not None]
+                spans.append((min(bounded), None if None in ends else max(bounded)))
+        
+        for employee_id in {obj.employee_id, *attrs.employee_id.history.deleted}:
+            changes.extend((employee_id, start_date, end_date) for start_date, end_date in spans)
+    
+    if changes:
+        PayrollService.mark_runs_dirty(changes, session.connection())
+
+@event.listens_for(Session, 'after_flush')
+def _regroup_moved_employees(session, flush_context):
+    """Move payslips of employees whose department changed to their new department
+    
+    Analytics count payslips under the employee's current department, so the
+    summary and sketch rows of both departments are recomputed for every month
+    the moved employees have payslips in.
+    """
+    moved, departments = set(), set()
+    for obj in session.dirty:
+        if not isinstance(obj, Employee):
+            continue
+        history = inspect(obj).attrs.department.history
+        if history.has_changes():
+            moved.add(obj.id)
+            departments.update(value or '' for value in (*history.added, *history.deleted))
+    if not moved:
+        return
+    
+    connection = session.connection()
+    months = connection.execute(
+        db.select(PayrollRun.year, PayrollRun.month).join(
+            Payslip, Payslip.payroll_run_id == PayrollRun.id
+        ).where(Payslip.employee_id.in_(sorted(moved))).distinct().order_by(PayrollRun.year, PayrollRun.month)
+    ).all()
+    for year, month in months:
+        SummaryService.rebuild(year, month, departments=sorted(departments), connection=connection)
+        DistributionService.rebuild(year, month, departments=sorted(departments), connection=connection)
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import tempfile
+from threading import Lock
+from flask import current_app
+
+# Bump when the payslip layout changes so previously rendered files stop matching
+LAYOUT_VERSION = 1
+
+PAYSLIP_FIELDS = (
+    'id', 'basic_salary', 'total_allowances', 'gross_salary', 'total_deductions', 'tax',
+    'net_salary', 'updated_at'
+)
+EMPLOYEE_FIELDS = ('name', 'employee_id', 'department', 'position')
+RUN_FIELDS = ('month', 'year')
+
+class PDFCache:
+    """On-disk store of rendered payslip PDFs keyed by a hash of their content
+    
+    Files live at <directory>/<key[:2]>/<key>.pdf. Reads refresh a file's mtime,
+    and writes evict the least recently used files once the total size passes
+    max_bytes.
+    """
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._size = None
+    
+    @staticmethod
+    def key_for(payslip, employee, payroll_run, renderer='platypus'):
+        """Hash every field the PDF shows, plus updated_at so edits get a new key"""
+        content = {
+            'layout': LAYOUT_VERSION,
+            'renderer': renderer,
+            'payslip': {name: getattr(payslip, name, None) for name in PAYSLIP_FIELDS},
+            'employee': {name: getattr(employee, name, None) for name in EMPLOYEE_FIELDS},
+            'payroll_run': {name: getattr(payroll_run, name, None) for name in RUN_FIELDS},
+        }
+        encoded = json.dumps(content, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def path_for(self, key):
+        """Where the PDF for a key is stored"""
+        return os.path.join(self.directory, key[:2], f'{key}.pdf')
+    
+    def get(self, key):
+        """Path of a cached PDF, or None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+    
+    def open(self, key):
+        """Open a cached PDF for reading, or None
+        
+        An open handle keeps reading the file even if it is evicted afterwards,
+        which a path returned by get() doesn't.
+        """
+        path = self.path_for(key)
+        try:
+            pdf = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return pdf
+    
+    def put(self, key, data):
+        """Store PDF bytes atomically and return the path"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+    
+    def _entries(self):
+        """(mtime, size, path) for every cached file"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+    
+    def _evict(self):
+        """Remove least recently used files until the cache is back under 90% of its budget"""
+        entries = sorted(self._entries())
+        # Re-sync with the disk; other processes may have added or removed files
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+def get_pdf_cache():
+    """The app's payslip PDF cache, or None when disabled in config"""
+    if not current_app.config.get('PDF_CACHE_ENABLED', True):
+        return None
+    cache = current_app.extensions.get('pdf_cache')
+    if cache is None:
+        directory = current_app.config.get('PDF_CACHE_DIR') or os.path.join(
+            current_app.instance_path, 'pdf_cache'
+        )
+        cache = PDFCache(directory, current_app.config.get('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+        current_app.extensions['pdf_cache'] = cache
+    return cache
@@ -1,23 +1,23 @@
+import zlib
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+from flask import current_app, has_app_context
+from types import SimpleNamespace
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.rl_accel import escapePDF, fp_str
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
-class PDFService:
-    """Service for generating PDF payslips"""
+class PayslipTemplate:
+    """Styles and column widths of the payslip layout, built once and reused"""
     
-    @staticmethod
-    def generate_payslip_pdf(payslip, employee, payroll_run):
-        """Generate PDF for a payslip"""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        
+    def __init__(self):
         styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
+        self.title_style = ParagraphStyle(
             'CustomTitle',
             parent=styles['Heading1'],
             fontSize=16,
@@ -25,20 +25,10 @@ class PDFService:
             spaceAfter=12
         )
         
-        # Title
-        elements.append(Paragraph("PAYSLIP", title_style))
-        elements.append(Spacer(1, 0.2*inch))
+        self.info_widths = [2*inch, 4*inch]
+        self.salary_widths = [3*inch, 3*inch]
         
-        # Employee information
-        emp_info = [
-            ['Employee Name:', employee.name],
-            ['Employee ID:', employee.employee_id],
-            ['Department:', employee.department or 'N/A'],
-            ['Position:', employee.position or 'N/A'],
-        ]
-        
-        emp_table = Table(emp_info, colWidths=[2*inch, 4*inch])
-        emp_table.setStyle(TableStyle([
+        self.employee_style = TableStyle([
             ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
             ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
@@ -46,27 +36,50 @@ class PDFService:
             ('FONTSIZE', (0, 0), (-1, -1), 10),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
             ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
+        ])
+        self.period_style = TableStyle([
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+        self.salary_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('FONTSIZE', (0, -1), (-1, -1), 12),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e0f2fe')),
+        ])
+    
+    def elements(self, payslip, employee, payroll_run, generated):
+        """Build the flowables for one payslip
         
-        elements.append(emp_table)
-        elements.append(Spacer(1, 0.3*inch))
+        Flowables keep layout state from wrap() and split(), so each render gets its
+        own, title and spacers included; only styles are shared.
+        """
+        # Employee information
+        emp_info = [
+            ['Employee Name:', employee.name],
+            ['Employee ID:', employee.employee_id],
+            ['Department:', employee.department or 'N/A'],
+            ['Position:', employee.position or 'N/A'],
+        ]
+        emp_table = Table(emp_info, colWidths=self.info_widths)
+        emp_table.setStyle(self.employee_style)
         
         # Payroll period
         period_info = [
             ['Month:', f"{payroll_run.month}/{payroll_run.year}"],
-            ['Generated:', datetime.now().strftime('%Y-%m-%d')],
+            ['Generated:', generated],
         ]
-        
-        period_table = Table(period_info, colWidths=[2*inch, 4*inch])
-        period_table.setStyle(TableStyle([
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        elements.append(period_table)
-        elements.append(Spacer(1, 0.3*inch))
+        period_table = Table(period_info, colWidths=self.info_widths)
+        period_table.setStyle(self.period_style)
         
         # Salary details
         salary_data = [
@@ -78,24 +91,237 @@ class PDFService:
             ['Tax', f"${payslip.tax:.2f}"],
             ['Net Salary', f"${payslip.net_salary:.2f}"],
         ]
+        salary_table = Table(salary_data, colWidths=self.salary_widths)
+        salary_table.setStyle(self.salary_style)
         
-        salary_table = Table(salary_data, colWidths=[3*inch, 3*inch])
-        salary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e0f2fe')),
-        ]))
+        return [
+            Paragraph("PAYSLIP", self.title_style), Spacer(1, 0.2*inch),
+            emp_table, Spacer(1, 0.3*inch),
+            period_table, Spacer(1, 0.3*inch),
+            salary_table,
+        ]
+    
+    def render(self, payslips):
+        """Render (payslip, employee, payroll_run) triples into one document, a page each"""
+        generated = datetime.now().strftime('%Y-%m-%d')
+        elements = []
+        for i, (payslip, employee, payroll_run) in enumerate(payslips):
+            if i:
+                elements.append(PageBreak())
+            elements.extend(self.elements(payslip, employee, payroll_run, generated))
         
-        elements.append(salary_table)
+        buffer = BytesIO()
+        SimpleDocTemplate(buffer, pagesize=letter).build(elements)
+        buffer.seek(0)
+        return buffer
+
+class DirectPayslipRenderer:
+    """Writes the payslip layout as PDF content directly, skipping platypus flow layout
+    
+    The layout never moves; every cell is a single line. The coordinates below are the
+    ones platypus produces for PayslipTemplate on a letter page with default margins:
+    tables are centred at x=90, and each table has its bottom-left corner as an origin
+    with text baselines relative to it. Labels, backgrounds and grid lines are encoded
+    once, so a page costs a handful of string formats plus one zlib call.
+    """
+    
+    TITLE_COLOR = colors.HexColor('#1f2937')
+    HEADER_COLOR = colors.HexColor('#3b82f6')
+    NET_ROW_COLOR = colors.HexColor('#e0f2fe')
+    
+    EMPLOYEE_ORIGIN = (90, 581.6)
+    EMPLOYEE_BASELINES = (71, 50, 29, 8)
+    PERIOD_ORIGIN = (90, 518.0)
+    PERIOD_BASELINES = (29, 8)
+    SALARY_ORIGIN = (90, 335.4)
+    SALARY_BASELINES = (147, 125, 102, 79, 56, 33, 8)
+    SALARY_LABELS = (
+        'Basic Salary', 'Total Allowances', 'Gross Salary', 'Total Deductions', 'Tax', 'Net Salary'
+    )
+    SALARY_FIELDS = (
+        'basic_salary', 'total_allowances', 'gross_salary', 'total_deductions', 'tax', 'net_salary'
+    )
+    
+    # Resource names used in every page's font dictionary
+    FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+    
+    def __init__(self):
+        self.encoding = {name: pdfmetrics.getFont(name).encName for name in self.FONTS}
+        self.static = self._static_content()
+    
+    def _text(self, font, size, x, y, text):
+        """Content for one text run; raises UnicodeEncodeError if the font can't encode it"""
+        encoded = escapePDF(text.encode(self.encoding[font]))
+        return f"BT /{self.FONTS[font]} {fp_str(size)} Tf 1 0 0 1 {fp_str(x)} {fp_str(y)} Tm ({encoded}) Tj ET\n"
+    
+    def _right_text(self, font, size, right, y, text):
+        return self._text(font, size, right - pdfmetrics.stringWidth(text, font, size), y, text)
+    
+    @staticmethod
+    def _fill(color):
+        return f"{fp_str(*color.rgb())} rg\n"
+    
+    @staticmethod
+    def _grid(x, y, width, height, rows, columns):
+        lines = [(x, y + h, x + width, y + h) for h in rows]
+        lines += [(x + w, y, x + w, y + height) for w in columns]
+        segments = ' '.join(f"{fp_str(x1, y1)} m {fp_str(x2, y2)} l" for x1, y1, x2, y2 in lines)
+        return f"q 1 J {fp_str(*colors.grey.rgb())} RG 1 w {segments} S Q\n"
+    
+    def _static_content(self):
+        """Everything on the page that doesn't depend on the payslip"""
+        parts = [self._fill(self.TITLE_COLOR), self._text('Helvetica-Bold', 16, 78, 698, 'PAYSLIP')]
+        
+        # Employee information
+        x, y = self.EMPLOYEE_ORIGIN
+        parts.append(self._fill(colors.lightgrey))
+        parts.append(f"{fp_str(x, y, 144, 84)} re f\n")
+        parts.append(self._grid(x, y, 432, 84, (0, 21, 42, 63, 84), (0, 144, 432)))
+        parts.append(self._fill(colors.black))
+        labels = ('Employee Name:', 'Employee ID:', 'Department:', 'Position:')
+        for label, baseline in zip(labels, self.EMPLOYEE_BASELINES):
+            parts.append(self._text('Helvetica-Bold', 10, x + 6, y + baseline, label))
+        
+        # Payroll period
+        x, y = self.PERIOD_ORIGIN
+        for label, baseline in zip(('Month:', 'Generated:'), self.PERIOD_BASELINES):
+            parts.append(self._text('Helvetica', 10, x + 6, y + baseline, label))
+        
+        # Salary details
+        x, y = self.SALARY_ORIGIN
+        header = self.SALARY_BASELINES[0]
+        parts.append(self._fill(self.HEADER_COLOR))
+        parts.append(f"{fp_str(x, y + 138, 432, 23)} re f\n")
+        parts.append(self._fill(self.NET_ROW_COLOR))
+        parts.append(f"{fp_str(x, y, 432, 23)} re f\n")
+        parts.append(self._grid(x, y, 432, 161, range(0, 162, 23), (0, 216, 432)))
+        parts.append(self._fill(colors.whitesmoke))
+        parts.append(self._text('Helvetica-Bold', 11, x + 6, y + header, 'Description'))
+        parts.append(self._right_text('Helvetica-Bold', 11, x + 426, y + header, 'Amount'))
+        parts.append(self._fill(colors.black))
+        for label, baseline in zip(self.SALARY_LABELS[:-1], self.SALARY_BASELINES[1:-1]):
+            parts.append(self._text('Helvetica', 10, x + 6, y + baseline, label))
+        parts.append(self._text('Helvetica-Bold', 12, x + 6, y + self.SALARY_BASELINES[-1], 'Net Salary'))
+        return ''.join(parts)
+    
+    def page(self, payslip, employee, payroll_run, generated):
+        """Content stream for one payslip"""
+        parts = [self.static]
         
-        doc.build(elements)
+        x, y = self.EMPLOYEE_ORIGIN
+        values = (employee.name, employee.employee_id, employee.department or 'N/A', employee.position or 'N/A')
+        for value, baseline in zip(values, self.EMPLOYEE_BASELINES):
+            parts.append(self._text('Helvetica', 10, x + 150, y + baseline, str(value)))
+        
+        x, y = self.PERIOD_ORIGIN
+        values = (f"{payroll_run.month}/{payroll_run.year}", generated)
+        for value, baseline in zip(values, self.PERIOD_BASELINES):
+            parts.append(self._text('Helvetica', 10, x + 150, y + baseline, value))
+        
+        x, y = self.SALARY_ORIGIN
+        rows = list(zip(self.SALARY_FIELDS, self.SALARY_BASELINES[1:]))
+        for i, (field, baseline) in enumerate(rows):
+            font, size = ('Helvetica-Bold', 12) if i == len(rows) - 1 else ('Helvetica', 10)
+            amount = f"${getattr(payslip, field):.2f}"
+            parts.append(self._right_text(font, size, x + 426, y + baseline, amount))
+        return ''.join(parts).encode('latin-1')
+    
+    def render(self, payslips):
+        """Render (payslip, employee, payroll_run) triples into one document, a page each"""
+        generated = datetime.now().strftime('%Y-%m-%d')
+        try:
+            pages = [self.page(payslip, employee, payroll_run, generated)
+                     for payslip, employee, payroll_run in payslips]
+        except UnicodeEncodeError:
+            # Text outside the standard fonts' encoding needs platypus' font substitution
+            return get_template().render(payslips)
+        
+        buffer = BytesIO()
+        buffer.write(self._document(pages))
         buffer.seek(0)
         return buffer
+    
+    def _document(self, pages):
+        """Assemble a PDF file around page content streams"""
+        font_refs = ' '.join(f"/{ref} {i + 3} 0 R" for i, ref in enumerate(self.FONTS.values()))
+        first_page = 3 + len(self.FONTS)
+        kids = ' '.join(f"{first_page + 2 * i} 0 R" for i in range(len(pages)))
+        
+        objects = [
+            b"<< /Pages 2 0 R /Type /Catalog >>",
+            f"<< /Count {len(pages)} /Kids [ {kids} ] /Type /Pages >>".encode(),
+        ]
+        for name, ref in self.FONTS.items():
+            objects.append(
+                f"<< /BaseFont /{name} /Encoding /WinAnsiEncoding /Name /{ref} /Subtype /Type1 /Type /Font >>".encode()
+            )
+        for i, content in enumerate(pages):
+            compressed = zlib.compress(content)
+            objects.append(
+                f"<< /Contents {first_page + 2 * i + 1} 0 R /MediaBox [ 0 0 {fp_str(*letter)} ] /Parent 2 0 R "
+                f"/Resources << /Font << {font_refs} >> /ProcSet [ /PDF /Text ] >> /Type /Page >>".encode()
+            )
+            objects.append(
+                f"<< /Filter /FlateDecode /Length {len(compressed)} >>\nstream\n".encode()
+                + compressed + b"\nendstream"
+            )
+        
+        out = [b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n"]
+        offsets = []
+        position = len(out[0])
+        for number, body in enumerate(objects, 1):
+            chunk = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+            offsets.append(position)
+            out.append(chunk)
+            position += len(chunk)
+        
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)]
+        xref += [b"%010d 00000 n \n" % offset for offset in offsets]
+        out.extend(xref)
+        out.append(b"trailer\n<< /Root 1 0 R /Size %d >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, position))
+        return b''.join(out)
+
+@lru_cache(maxsize=1)
+def get_template():
+    """The process-wide payslip template"""
+    return PayslipTemplate()
+
+RENDERERS = {'platypus': get_template, 'direct': lru_cache(maxsize=1)(DirectPayslipRenderer)}
+
+def get_renderer(name=None):
+    """The process-wide renderer by name, defaulting to the PDF_RENDERER setting"""
+    return RENDERERS[name or PDFService.renderer_name()]()
+
+class PDFService:
+    """Service for generating PDF payslips"""
+    
+    @staticmethod
+    def renderer_name():
+        """The configured renderer, 'platypus' or 'direct'; platypus outside an app context"""
+        if not has_app_context():
+            return 'platypus'
+        return current_app.config.get('PDF_RENDERER', 'platypus')
+    
+    @staticmethod
+    def generate_payslip_pdf(payslip, employee, payroll_run, renderer=None):
+        """Generate PDF for a payslip"""
+        return get_renderer(renderer).render([(payslip, employee, payroll_run)])
+    
+    @staticmethod
+    def generate_combined_pdf(payslips, renderer=None):
+        """Generate one PDF with a page per (payslip, employee, payroll_run) triple"""
+        return get_renderer(renderer).render(payslips)
+    
+    @staticmethod
+    def generate_payslip_pdfs(payslips, renderer=None):
+        """Generate a separate PDF buffer per (payslip, employee, payroll_run) triple"""
+        pdf_renderer = get_renderer(renderer)
+        return [pdf_renderer.render([item]) for item in payslips]
+
+def render_payslip_pdf(payslip, employee, payroll_run, renderer='platypus'):
+    """Render a payslip from plain dicts to PDF bytes; picklable for worker processes"""
+    buffer = PDFService.generate_payslip_pdf(
+        SimpleNamespace(**payslip), SimpleNamespace(**employee), SimpleNamespace(**payroll_run),
+        renderer=renderer
+    )
+    return buffer.getvalue()
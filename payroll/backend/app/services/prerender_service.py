@@ -0,0 +1,128 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from types import SimpleNamespace
+from flask import current_app
+from app import db
+from app.models import Payslip, PayrollRun, Employee
+from app.services.pdf_service import PDFService, render_payslip_pdf
+from app.services.pdf_cache import PDFCache, get_pdf_cache, PAYSLIP_FIELDS, EMPLOYEE_FIELDS
+
+_executor = None
+_lock = Lock()
+
+# Enqueue time of every pending render, and running counters
+_pending = {}
+_stats = {
+    'enqueued': 0, 'rendered': 0, 'skipped': 0, 'dropped': 0, 'failed': 0, 'enqueue_errors': 0,
+    'last_lag_seconds': None
+}
+
+def _get_executor():
+    """Create the shared pre-render pool on first use"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=current_app.config.get('PDF_PRERENDER_WORKERS', 1),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+class PrerenderService:
+    """Service for rendering payslip PDFs into the PDF cache ahead of the first download"""
+    
+    @staticmethod
+    def enabled():
+        """Whether pre-rendering is switched on and there is a cache to write to"""
+        return bool(current_app.config.get('PDF_PRERENDER_ENABLED', False)) and get_pdf_cache() is not None
+    
+    @staticmethod
+    def enqueue_runs(payroll_run_ids):
+        """Queue PDF rendering for the payslips of committed payroll runs; no-op unless enabled
+        
+        Errors are logged and counted rather than raised: the runs are already
+        committed and their PDFs still render on first download.
+        """
+        try:
+            return PrerenderService._enqueue_runs(payroll_run_ids)
+        except Exception:
+            current_app.logger.exception('Queuing payslip PDF pre-rendering failed')
+            with _lock:
+                _stats['enqueue_errors'] += 1
+            return 0
+    
+    @staticmethod
+    def _enqueue_runs(payroll_run_ids):
+        if not payroll_run_ids or not PrerenderService.enabled():
+            return 0
+        
+        cache = get_pdf_cache()
+        executor = _get_executor()
+        max_queue = current_app.config.get('PDF_PRERENDER_MAX_QUEUE', 10000)
+        renderer = PDFService.renderer_name()
+        
+        columns = [getattr(Payslip, name) for name in PAYSLIP_FIELDS]
+        columns += [getattr(Employee, name).label(f'employee_{name}') for name in EMPLOYEE_FIELDS]
+        columns += [PayrollRun.month, PayrollRun.year]
+        
+        queued = 0
+        for start in range(0, len(payroll_run_ids), 1000):
+            rows = db.session.query(*columns).join(
+                PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+            ).join(
+                Employee, Payslip.employee_id == Employee.id
+            ).filter(Payslip.payroll_run_id.in_(payroll_run_ids[start:start + 1000])).all()
+            
+            for row in rows:
+                payslip = {name: getattr(row, name) for name in PAYSLIP_FIELDS}
+                employee = {name: getattr(row, f'employee_{name}') for name in EMPLOYEE_FIELDS}
+                payroll_run = {'month': row.month, 'year': row.year}
+                
+                key = PDFCache.key_for(
+                    SimpleNamespace(**payslip), SimpleNamespace(**employee), SimpleNamespace(**payroll_run),
+                    renderer
+                )
+                with _lock:
+                    if cache.get(key) is not None:
+                        _stats['skipped'] += 1
+                        continue
+                    if len(_pending) >= max_queue:
+                        # Downloads still render on demand; the drop shows up in the metrics
+                        _stats['dropped'] += 1
+                        continue
+                    _stats['enqueued'] += 1
+                
+                future = executor.submit(render_payslip_pdf, payslip, employee, payroll_run, renderer)
+                with _lock:
+                    _pending[future] = time.monotonic()
+                future.add_done_callback(lambda f, key=key: PrerenderService._store(cache, key, f))
+                queued += 1
+        return queued
+    
+    @staticmethod
+    def _store(cache, key, future):
+        """Write a finished render to the cache; runs on the executor's callback thread"""
+        try:
+            cache.put(key, future.result())
+            outcome = 'rendered'
+        except Exception:
+            outcome = 'failed'
+        with _lock:
+            enqueued_at = _pending.pop(future, None)
+            _stats[outcome] += 1
+            if enqueued_at is not None:
+                _stats['last_lag_seconds'] = time.monotonic() - enqueued_at
+    
+    @staticmethod
+    def metrics():
+        """Queue depth, lag of the oldest pending render and running counters"""
+        with _lock:
+            oldest = min(_pending.values(), default=None)
+            return {
+                'enabled': PrerenderService.enabled(),
+                'queue_depth': len(_pending),
+                'oldest_pending_seconds': time.monotonic() - oldest if oldest is not None else 0.0,
+                **_stats
+            }
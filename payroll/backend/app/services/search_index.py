@@ -0,0 +1,328 @@
+import heapq
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from threading import RLock
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Employee
+
+# Searched columns and how much a match in each counts towards the rank
+FIELD_WEIGHTS = {'name': 4.0, 'employee_id': 4.0, 'email': 3.0, 'position': 2.0, 'address': 1.0}
+# Columns whose words also match with one typo
+FUZZY_FIELDS = ('name', 'position')
+# Vocabulary words a query prefix may expand to before results count as incomplete
+PREFIX_EXPANSIONS = 500
+# Rough number of indexed tokens per employee, to choose how later query words are matched
+CANDIDATE_TOKENS = 20
+
+_WORD = re.compile(r'[a-z0-9]+')
+_PARTS = re.compile(r'[a-z]+|[0-9]+')
+
+def normalize(text):
+    """Lower-case and strip accents so 'José' matches 'jose'"""
+    if not text or text.isascii():
+        return (text or '').lower()
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def tokenize(text):
+    """Words of a field value; letter/digit runs of mixed words and unpadded numbers are added
+    
+    'EMP000123' gives emp000123, emp, 000123 and 123, so any of them finds the employee.
+    """
+    tokens = []
+    for word in _WORD.findall(normalize(text)):
+        tokens.append(word)
+        parts = _PARTS.findall(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+        for part in parts:
+            stripped = part.lstrip('0')
+            if part.isdigit() and stripped and stripped != part:
+                tokens.append(stripped)
+    return tokens
+
+def _deletes(token):
+    """Every string one character shorter than token"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+def _within_one_edit(a, b):
+    """Whether a and b differ by at most one substitution, insertion, deletion or adjacent swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diff) == 1 or (
+            len(diff) == 2 and diff[1] == diff[0] + 1
+            and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+        )
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+class EmployeeSearchIndex:
+    """In-memory word index over employee name, id, email, position and address
+    
+    Query words match indexed words exactly, by prefix, or (for names and positions,
+    words of four letters or more) within one typo, found through a table of
+    one-letter deletions. Results are ranked by match quality times field weight and
+    must match every query word.
+    """
+    
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = RLock()
+        self._stale = set()
+        self._stale_all = True
+        self._checked_at = None
+        self._reset()
+    
+    def __len__(self):
+        return len(self._docs)
+    
+    def add(self, employee_id, is_active, fields, keep_sorted=True):
+        """Index (or re-index) one employee from {column: value}
+        
+        Bulk loads pass keep_sorted=False and sort the vocabulary once at the end.
+        """
+        self.remove(employee_id)
+        tokens = {}
+        fuzzy = set()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                if weight > tokens.get(token, 0):
+                    tokens[token] = weight
+                if field in FUZZY_FIELDS and len(token) >= 4 and token.isalpha():
+                    fuzzy.add(token)
+        for token in fuzzy:
+            self._fuzzy_counts[token] += 1
+            if self._fuzzy_counts[token] == 1:
+                self._variants[token].add(token)
+                for variant in _deletes(token):
+                    self._variants[variant].add(token)
+        for token, weight in tokens.items():
+            if token not in self._postings:
+                if keep_sorted:
+                    insort(self._vocabulary, token)
+                else:
+                    self._vocabulary.append(token)
+            self._postings[token][employee_id] = weight
+        self._docs[employee_id] = (bool(is_active), tokens, fuzzy)
+    
+    def remove(self, employee_id):
+        """Drop one employee, and any words and typo variants no other employee has"""
+        doc = self._docs.pop(employee_id, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            postings = self._postings[token]
+            postings.pop(employee_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+                else:
+                    self._vocabulary.remove(token)  # unsorted during a bulk load
+        for token in doc[2]:
+            self._fuzzy_counts[token] -= 1
+            if self._fuzzy_counts[token]:
+                continue
+            del self._fuzzy_counts[token]
+            for variant in _deletes(token) | {token}:
+                words = self._variants[variant]
+                words.discard(token)
+                if not words:
+                    del self._variants[variant]
+    
+    def _expand(self, word, prefix_limit):
+        """{indexed token: match quality} for one query word, and whether the prefix range was cut short"""
+        start = bisect_left(self._vocabulary, word)
+        end = start
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(word):
+            end += 1
+        # Exact 1.0; a prefix scores higher the more of the word it covers
+        tokens = {
+            token: 1.0 if token == word else 0.6 + 0.3 * len(word) / len(token)
+            for token in self._vocabulary[start:min(end, start + prefix_limit)]
+        }
+        
+        if len(word) >= 4 and word.isalpha():
+            candidates = set(self._variants.get(word, ()))
+            for variant in _deletes(word):
+                candidates.update(self._variants.get(variant, ()))
+            for token in candidates:
+                if token not in tokens and _within_one_edit(word, token):
+                    tokens[token] = 0.5
+        return tokens, end - start > prefix_limit
+    
+    def _match(self, query, active_only, prefix_limit=PREFIX_EXPANSIONS):
+        """{employee id: score} of employees matching every query word, and whether it is incomplete"""
+        words = set(_WORD.findall(normalize(query)))
+        if not words:
+            return {}, False
+        self.ensure_fresh()
+        with self._lock:
+            expansions = [self._expand(word, prefix_limit) for word in words]
+            truncated = any(cut for _, cut in expansions)
+            # Most selective word first; each later word either scans its postings or,
+            # when fewer candidates are left, looks its tokens up in theirs
+            costs = [sum(len(self._postings[token]) for token in tokens) for tokens, _ in expansions]
+            matches = None
+            for cost, (tokens, _) in sorted(zip(costs, expansions), key=lambda item: item[0]):
+                scores = {}
+                if matches is not None and len(matches) * CANDIDATE_TOKENS < cost:
+                    for employee_id in matches:
+                        for token, weight in self._docs[employee_id][1].items():
+                            quality = tokens.get(token)
+                            if quality is not None and quality * weight > scores.get(employee_id, 0):
+                                scores[employee_id] = quality * weight
+                else:
+                    for token, quality in tokens.items():
+                        for employee_id, weight in self._postings[token].items():
+                            if (matches is None or employee_id in matches) and quality * weight > scores.get(employee_id, 0):
+                                scores[employee_id] = quality * weight
+                matches = scores if matches is None else {eid: matches[eid] + score for eid, score in scores.items()}
+                if not matches:
+                    break
+            
+            if active_only:
+                matches = {eid: score for eid, score in matches.items() if self._docs[eid][0]}
+            return matches, truncated
+    
+    def search(self, query, limit=20, active_only=True):
+        """Best matches as [(employee id, score)], highest score first, then by employee id"""
+        matches, _ = self._match(query, active_only)
+        # Partial selection: broad words can match a large share of employees
+        ranked = heapq.nlargest(limit, matches.items(), key=lambda item: (item[1], -item[0]))
+        return [(employee_id, round(score, 3)) for employee_id, score in ranked[:limit]]
+    
+    def match_ids(self, query, max_results, active_only=True):
+        """Ids of every matching employee, or None when the query is too broad to list them"""
+        matches, truncated = self._match(query, active_only)
+        if truncated or len(matches) > max_results:
+            return None
+        return list(matches)
+    
+    def load(self, employee_ids=None, updated_since=None):
+        """Index all employees, only the given ids, or those updated since a timestamp"""
+        columns = [Employee.id, Employee.is_active, Employee.updated_at] + [
+            getattr(Employee, field) for field in FIELD_WEIGHTS
+        ]
+        query = db.session.query(*columns)
+        if employee_ids is not None:
+            query = query.filter(Employee.id.in_(list(employee_ids)))
+        elif updated_since is not None:
+            query = query.filter(Employee.updated_at >= updated_since)
+        
+        bulk = employee_ids is None and updated_since is None
+        found = set()
+        for row in query:
+            found.add(row.id)
+            self.add(row.id, row.is_active, {field: getattr(row, field) for field in FIELD_WEIGHTS},
+                     keep_sorted=not bulk)
+            if row.updated_at is not None and (self._watermark is None or row.updated_at > self._watermark):
+                self._watermark = row.updated_at
+        if bulk:
+            self._vocabulary.sort()
+        # Employees deleted from the table drop out of the index
+        for employee_id in set(employee_ids or ()) - found:
+            self.remove(employee_id)
+    
+    def _reset(self):
+        self._docs = {}  # employee id -> (is_active, {token: weight}, fuzzy tokens)
+        self._postings = defaultdict(dict)  # token -> {employee id: weight}
+        self._vocabulary = []  # sorted tokens, for prefix ranges
+        self._variants = defaultdict(set)  # fuzzy token or one of its deletions -> fuzzy tokens
+        self._fuzzy_counts = defaultdict(int)  # fuzzy token -> employees having it
+        self._watermark = None  # latest updated_at indexed
+    
+    def ensure_fresh(self):
+        """Apply committed changes; after the TTL also pick up rows other workers updated"""
+        with self._lock:
+            expired = self._checked_at is None or time.monotonic() - self._checked_at > self.ttl
+            if self._stale_all:
+                self._reset()
+                self.load()
+            else:
+                if self._stale:
+                    self.load(employee_ids=self._stale)
+                if expired and self._watermark is not None:
+                    self.load(updated_since=self._watermark)
+            self._stale_all = False
+            self._stale.clear()
+            if expired:
+                self._checked_at = time.monotonic()
+    
+    def mark_stale(self, employee_ids):
+        with self._lock:
+            self._stale.update(employee_ids)
+    
+    def mark_all_stale(self):
+        with self._lock:
+            self._stale_all = True
+
+def get_search_index():
+    """The app's employee search index, or None when disabled or the session has unsaved employee changes
+    
+    Callers fall back to ILIKE queries when this returns None.
+    """
+    if not current_app.config.get('EMPLOYEE_SEARCH_ENABLED', True):
+        return None
+    session = db.session
+    if session.info.get('search_changes') or session.info.get('search_changes_all') or any(
+        isinstance(obj, Employee) for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+    ):
+        return None
+    index = current_app.extensions.get('employee_search_index')
+    if index is None:
+        index = EmployeeSearchIndex(ttl=current_app.config.get('EMPLOYEE_SEARCH_TTL', 30))
+        current_app.extensions['employee_search_index'] = index
+    return index
+
+@event.listens_for(Session, 'after_flush')
+def _track_employee_changes(session, flush_context):
+    """Collect employees added, edited or deleted in this transaction"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Employee):
+            session.info.setdefault('search_changes', set()).add(obj.id)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_employee_bulk_changes(orm_execute_state):
+    """Bulk DML bypasses the unit of work, so it rebuilds the whole index"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Employee:
+        orm_execute_state.session.info['search_changes_all'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_search_index(session):
+    """Hand committed employee changes to the index; it re-indexes them on next use"""
+    changed = session.info.pop('search_changes', None)
+    changed_all = session.info.pop('search_changes_all', False)
+    if not (changed or changed_all) or not has_app_context():
+        return
+    index = current_app.extensions.get('employee_search_index')
+    if index is None:
+        return
+    if changed_all:
+        index.mark_all_stale()
+    else:
+        index.mark_stale(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_employee_changes(session):
+    """Forget uncommitted employee changes"""
+    session.info.pop('search_changes', None)
+    session.info.pop('search_changes_all', None)
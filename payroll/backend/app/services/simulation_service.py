@@ -0,0 +1,177 @@
+import math
+from collections import defaultdict
+from datetime import date
+from app import db
+from app.models import Employee, Allowance, Deduction
+from app.services import payroll_engine
+from app.services.payroll_service import PayrollService
+from app.services.tax_service import TaxService
+
+TOTAL_FIELDS = ('basic_salary', 'total_allowances', 'total_deductions', 'gross_salary', 'tax', 'net_salary')
+
+class SimulationService:
+    """Service for read-only what-if payroll simulations"""
+    
+    @staticmethod
+    def validate_overrides(overrides):
+        """Validate simulation overrides, returning a list of error messages"""
+        errors = []
+        if not isinstance(overrides, dict):
+            return ['overrides must be an object']
+        
+        for department, multiplier in (overrides.get('salary_multipliers') or {}).items():
+            try:
+                multiplier = float(multiplier)
+            except (TypeError, ValueError):
+                multiplier = math.nan
+            if not math.isfinite(multiplier):
+                errors.append(f'Invalid salary multiplier for {department}')
+            elif multiplier < 0:
+                errors.append(f'Salary multiplier for {department} cannot be negative')
+        
+        for i, allowance in enumerate(overrides.get('extra_allowances') or []):
+            if not isinstance(allowance, dict) or not allowance.get('type'):
+                errors.append(f'Extra allowance {i + 1}: type is required')
+                continue
+            try:
+                amount = float(allowance.get('amount'))
+            except (TypeError, ValueError):
+                amount = math.nan
+            if not math.isfinite(amount):
+                errors.append(f'Extra allowance {i + 1}: invalid amount')
+        
+        if overrides.get('tax_brackets') is not None:
+            errors.extend(TaxService.validate_brackets(overrides['tax_brackets']))
+        return errors
+    
+    @staticmethod
+    def simulate(month, year, overrides=None, chunk_size=1000):
+        """Yield a result per active employee and then aggregated totals, without writing
+        
+        overrides may hold salary_multipliers ({department: multiplier}), extra_allowances
+        ([{'type', 'amount', 'department'?}]) and tax_brackets ([{'upper_bound', 'rate'}]).
+        Employees are read in keyset chunks, so memory stays flat at any headcount.
+        """
+        overrides = overrides or {}
+        multipliers = {
+            department: float(multiplier)
+            for department, multiplier in (overrides.get('salary_multipliers') or {}).items()
+        }
+        extra_allowances = [
+            {'type': a['type'], 'amount': float(a['amount']), 'department': a.get('department')}
+            for a in overrides.get('extra_allowances') or []
+        ]
+        baseline_table = TaxService.get_table(year)
+        if overrides.get('tax_brackets') is not None:
+            table = payroll_engine.compile_brackets([
+                (None if b.get('upper_bound') is None else float(b['upper_bound']), float(b['rate']))
+                for b in overrides['tax_brackets']
+            ])
+        else:
+            table = baseline_table
+        vectorized = payroll_engine.np is not None
+        target_date = date(year, month, 1)
+        
+        totals = {field: 0.0 for field in TOTAL_FIELDS}
+        baseline = {field: 0.0 for field in TOTAL_FIELDS}
+        departments = defaultdict(lambda: {'headcount': 0, 'gross_salary': 0.0, 'net_salary': 0.0})
+        headcount = 0
+        skipped = 0
+        
+        last_id = 0
+        while True:
+            employees = db.session.query(Employee.id, Employee.name, Employee.department).filter(
+                Employee.is_active.is_(True),
+                Employee.id > last_id
+            ).order_by(Employee.id).limit(chunk_size).all()
+            if not employees:
+                break
+            last_id = employees[-1].id
+            
+            employee_ids = [employee.id for employee in employees]
+            salaries = PayrollService._active_salaries(employee_ids, target_date)
+            allowances = PayrollService._load_active_records(
+                Allowance, Allowance.allowance_type, employee_ids, month, year
+            )
+            deductions = PayrollService._load_active_records(
+                Deduction, Deduction.deduction_type, employee_ids, month, year
+            )
+            
+            paid = []
+            for employee in employees:
+                if employee.id in salaries:
+                    paid.append(employee)
+                else:
+                    skipped += 1
+                    yield {
+                        'type': 'employee',
+                        'employee_id': employee.id,
+                        'name': employee.name,
+                        'department': employee.department,
+                        'error': f'No salary found for {month}/{year}'
+                    }
+            if not paid:
+                continue
+            
+            base_salaries = [salaries[e.id] for e in paid]
+            base_allowances = [sum(a['amount'] for a in allowances.get(e.id, [])) for e in paid]
+            total_deductions = [sum(d['amount'] for d in deductions.get(e.id, [])) for e in paid]
+            
+            basic = [salary * multipliers.get(e.department, 1.0) for salary, e in zip(base_salaries, paid)]
+            total_allowances = [
+                amount + sum(
+                    a['amount'] for a in extra_allowances
+                    if a['department'] is None or a['department'] == e.department
+                )
+                for amount, e in zip(base_allowances, paid)
+            ]
+            
+            current = payroll_engine.calculate_batch(
+                base_salaries, base_allowances, total_deductions, table=baseline_table, vectorized=vectorized
+            )
+            simulated = payroll_engine.calculate_batch(
+                basic, total_allowances, total_deductions, table=table, vectorized=vectorized
+            )
+            
+            for i, employee in enumerate(paid):
+                result = {
+                    'type': 'employee',
+                    'employee_id': employee.id,
+                    'name': employee.name,
+                    'department': employee.department,
+                    'basic_salary': basic[i],
+                    'total_allowances': total_allowances[i],
+                    'total_deductions': total_deductions[i],
+                    'gross_salary': simulated['gross_salary'][i],
+                    'tax': simulated['tax'][i],
+                    'net_salary': simulated['net_salary'][i],
+                    'baseline_net_salary': current['net_salary'][i]
+                }
+                
+                headcount += 1
+                for field in TOTAL_FIELDS:
+                    totals[field] += result[field]
+                baseline['basic_salary'] += base_salaries[i]
+                baseline['total_allowances'] += base_allowances[i]
+                baseline['total_deductions'] += total_deductions[i]
+                for field in ('gross_salary', 'tax', 'net_salary'):
+                    baseline[field] += current[field][i]
+                
+                department = departments[employee.department or 'Unassigned']
+                department['headcount'] += 1
+                department['gross_salary'] += result['gross_salary']
+                department['net_salary'] += result['net_salary']
+                
+                yield result
+        
+        yield {
+            'type': 'summary',
+            'month': month,
+            'year': year,
+            'headcount': headcount,
+            'skipped': skipped,
+            'totals': totals,
+            'baseline': baseline,
+            'difference': {field: totals[field] - baseline[field] for field in TOTAL_FIELDS},
+            'departments': dict(departments)
+        }
@@ -0,0 +1,105 @@
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Payslip, PayrollRun, Employee, PayrollMonthlySummary
+
+# Summary column prefix -> payslip column it aggregates
+METRICS = {
+    'net': 'net_salary',
+    'gross': 'gross_salary',
+    'tax': 'tax',
+    'deductions': 'total_deductions',
+}
+
+class SummaryService:
+    """Service for the per-month, per-department payslip aggregates read by analytics"""
+    
+    @staticmethod
+    def aggregate(rows):
+        """Fold payslip dicts carrying year, month and department into stats per summary key"""
+        groups = {}
+        for row in rows:
+            key = (row['year'], row['month'], row['department'] or '')
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = {'payslip_count': 0}
+                for metric in METRICS:
+                    stats.update({f'{metric}_sum': 0.0, f'{metric}_sumsq': 0.0,
+                                  f'{metric}_min': None, f'{metric}_max': None})
+            
+            stats['payslip_count'] += 1
+            for metric, column in METRICS.items():
+                value = float(row[column] or 0)
+                stats[f'{metric}_sum'] += value
+                stats[f'{metric}_sumsq'] += value * value
+                if stats[f'{metric}_min'] is None or value < stats[f'{metric}_min']:
+                    stats[f'{metric}_min'] = value
+                if stats[f'{metric}_max'] is None or value > stats[f'{metric}_max']:
+                    stats[f'{metric}_max'] = value
+        return groups
+    
+    @staticmethod
+    def record_payslips(rows):
+        """Add newly created payslips to the summary in the current transaction
+        
+        Updates are relative (sum = sum + x), so concurrent transactions writing the
+        same month and department don't overwrite each other. Rows are written in key
+        order so two transactions locking the same rows can't deadlock.
+        """
+        table = PayrollMonthlySummary.__table__
+        for (year, month, department), stats in sorted(SummaryService.aggregate(rows).items()):
+            key = db.and_(table.c.year == year, table.c.month == month, table.c.department == department)
+            values = {'payslip_count': table.c.payslip_count + stats['payslip_count']}
+            for metric in METRICS:
+                current_min, current_max = table.c[f'{metric}_min'], table.c[f'{metric}_max']
+                new_min, new_max = stats[f'{metric}_min'], stats[f'{metric}_max']
+                values[f'{metric}_sum'] = table.c[f'{metric}_sum'] + stats[f'{metric}_sum']
+                values[f'{metric}_sumsq'] = table.c[f'{metric}_sumsq'] + stats[f'{metric}_sumsq']
+                values[f'{metric}_min'] = db.case((current_min <= new_min, current_min), else_=new_min)
+                values[f'{metric}_max'] = db.case((current_max >= new_max, current_max), else_=new_max)
+            
+            if db.session.execute(db.update(table).where(key).values(values)).rowcount:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(
+                        db.insert(table).values(year=year, month=month, department=department, **stats)
+                    )
+            except IntegrityError:
+                # Another transaction created the row first
+                db.session.execute(db.update(table).where(key).values(values))
+    
+    @staticmethod
+    def rebuild(year=None, month=None, departments=None, connection=None):
+        """Recompute summary rows from the payslips, for all months or the ones given
+        
+        departments limits the rebuild to those summary departments ('' for none).
+        Runs in the current transaction; returns the number of summary rows written.
+        """
+        table = PayrollMonthlySummary.__table__
+        department = db.func.coalesce(Employee.department, '')
+        columns = [PayrollRun.year, PayrollRun.month, department, db.func.count(Payslip.id)]
+        names = ['year', 'month', 'department', 'payslip_count']
+        for metric, column in METRICS.items():
+            value = db.func.coalesce(getattr(Payslip, column), 0)
+            columns += [db.func.sum(value), db.func.min(value), db.func.max(value), db.func.sum(value * value)]
+            names += [f'{metric}_sum', f'{metric}_min', f'{metric}_max', f'{metric}_sumsq']
+        
+        select = db.select(*columns).select_from(Payslip).join(
+            PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+        ).join(
+            Employee, Payslip.employee_id == Employee.id
+        ).group_by(PayrollRun.year, PayrollRun.month, department)
+        delete = db.delete(table)
+        if year is not None:
+            select = select.where(PayrollRun.year == year)
+            delete = delete.where(table.c.year == year)
+        if month is not None:
+            select = select.where(PayrollRun.month == month)
+            delete = delete.where(table.c.month == month)
+        if departments is not None:
+            select = select.where(department.in_(list(departments)))
+            delete = delete.where(table.c.department.in_(list(departments)))
+        
+        connection = connection or db.session.connection()
+        connection.execute(delete)
+        return connection.execute(db.insert(table).from_select(names, select)).rowcount
@@ -0,0 +1,158 @@
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import TaxBracket
+from app.services import payroll_engine
+
+class TaxService:
+    """Service for loading and caching compiled tax bracket tables"""
+    
+    @staticmethod
+    def default_jurisdiction():
+        """Get the jurisdiction used when a caller doesn't name one"""
+        return current_app.config.get('TAX_JURISDICTION', 'default')
+    
+    @staticmethod
+    def get_table(year, jurisdiction=None):
+        """Get the compiled bracket table in effect for a year and jurisdiction
+        
+        Cached per version of the bracket table, so edits committed by other
+        processes are picked up by the next transaction.
+        """
+        jurisdiction = jurisdiction or TaxService.default_jurisdiction()
+        version, settled = _table_version()
+        if not settled:
+            return _compiled_table.__wrapped__(year, jurisdiction, version)
+        return _compiled_table(year, jurisdiction, version)
+    
+    @staticmethod
+    def calculate_tax(gross_salary, year, jurisdiction=None):
+        """Calculate tax for a single gross salary using the configured brackets"""
+        return payroll_engine.calculate_tax(gross_salary, TaxService.get_table(year, jurisdiction))
+    
+    @staticmethod
+    def get_brackets(year, jurisdiction=None):
+        """Get the bracket rows in effect for a year, falling back to the latest earlier year"""
+        jurisdiction = jurisdiction or TaxService.default_jurisdiction()
+        
+        effective_year = db.session.query(db.func.max(TaxBracket.year)).filter(
+            TaxBracket.jurisdiction == jurisdiction,
+            TaxBracket.year <= year
+        ).scalar()
+        if effective_year is None:
+            return []
+        
+        # NULL (open-ended) upper bound sorts last
+        return TaxBracket.query.filter_by(
+            jurisdiction=jurisdiction, year=effective_year
+        ).order_by(TaxBracket.upper_bound.is_(None), TaxBracket.upper_bound).all()
+    
+    @staticmethod
+    def replace_brackets(year, brackets, jurisdiction=None):
+        """Replace the bracket rows for a year; the cache is cleared when the session commits"""
+        jurisdiction = jurisdiction or TaxService.default_jurisdiction()
+        
+        for bracket in TaxBracket.query.filter_by(jurisdiction=jurisdiction, year=year).all():
+            db.session.delete(bracket)
+        
+        rows = []
+        for bracket in brackets:
+            row = TaxBracket(
+                jurisdiction=jurisdiction,
+                year=year,
+                upper_bound=bracket.get('upper_bound'),
+                rate=float(bracket['rate'])
+            )
+            db.session.add(row)
+            rows.append(row)
+        return rows
+    
+    @staticmethod
+    def validate_brackets(brackets):
+        """Validate bracket input, returning a list of error messages"""
+        errors = []
+        if not brackets:
+            return ['At least one bracket is required']
+        
+        previous = None
+        for i, bracket in enumerate(brackets):
+            try:
+                rate = float(bracket.get('rate'))
+                if rate < 0 or rate > 1:
+                    errors.append(f'Bracket {i + 1}: rate must be between 0 and 1')
+            except (TypeError, ValueError):
+                errors.append(f'Bracket {i + 1}: invalid rate')
+            
+            upper = bracket.get('upper_bound')
+            if upper is None:
+                if i != len(brackets) - 1:
+                    errors.append(f'Bracket {i + 1}: only the last bracket can be open-ended')
+                continue
+            try:
+                upper = float(upper)
+            except (TypeError, ValueError):
+                errors.append(f'Bracket {i + 1}: invalid upper_bound')
+                continue
+            if previous is not None and upper <= previous:
+                errors.append(f'Bracket {i + 1}: upper_bound must be increasing')
+            previous = upper
+        
+        if brackets[-1].get('upper_bound') is not None:
+            errors.append('The last bracket must be open-ended (upper_bound null)')
+        return errors
+    
+    @staticmethod
+    def invalidate():
+        """Drop every cached compiled table"""
+        _compiled_table.cache_clear()
+
+def _table_version():
+    """(count, max id, max updated_at) of the bracket rows, read once per transaction, and whether it is settled
+    
+    Timestamps have one-second resolution: a version whose latest edit is in the
+    current second may still change without changing, so it isn't cached under.
+    """
+    session = db.session()
+    transaction = session.get_transaction()
+    checked = session.info.get('tax_brackets_version')
+    if transaction is not None and checked is not None and checked[0] is transaction:
+        return checked[1]
+    row = db.session.execute(db.select(
+        db.func.count(TaxBracket.id), db.func.max(TaxBracket.id), db.func.max(TaxBracket.updated_at),
+        db.func.current_timestamp()
+    )).one()
+    version = (tuple(row[:3]), row[2] is None or row[2] < row[3])
+    # Repeatable reads show nothing newer within one transaction
+    session.info['tax_brackets_version'] = (session.get_transaction(), version)
+    return version
+
+@lru_cache(maxsize=64)
+def _compiled_table(year, jurisdiction, version):
+    """Load and compile a bracket table once per version; falls back to the built-in brackets"""
+    brackets = TaxService.get_brackets(year, jurisdiction)
+    if not brackets:
+        return payroll_engine.DEFAULT_TAX_TABLE
+    return payroll_engine.compile_brackets([(b.upper_bound, b.rate) for b in brackets])
+
+@event.listens_for(Session, 'after_flush')
+def _track_tax_bracket_changes(session, flush_context):
+    """Remember that bracket rows changed so the cache is dropped on commit"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TaxBracket):
+            session.info['tax_brackets_changed'] = True
+            return
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_tax_tables(session):
+    """Clear compiled tables after bracket edits are committed"""
+    session.info.pop('tax_brackets_version', None)
+    if session.info.pop('tax_brackets_changed', False):
+        TaxService.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tax_bracket_changes(session):
+    """Forget uncommitted bracket edits"""
+    session.info.pop('tax_brackets_changed', None)
+    session.info.pop('tax_brackets_version', None)
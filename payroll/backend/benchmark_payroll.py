@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Payroll Benchmark Script
+Measures query counts and timings of the bulk payroll paths against an
+in-memory SQLite database seeded with synthetic employees, payslip PDF
+render throughput, and the accuracy of merged salary quantile sketches
+"""
+
+import sys
+import os
+import time
+import io
+import numpy as np
+from datetime import date
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import current_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Employee, Salary, Allowance, Deduction, Payslip, PayrollRun
+from app.services import PayrollService, PDFService, payroll_engine
+from app.services.pdf_service import PayslipTemplate
+from app.services.analytics_engine import AnalyticsEngine, METRICS
+from app.services.quantile_sketch import QuantileSketch
+from app.services.pagination import encode_cursor
+from app.services.search_index import EmployeeSearchIndex
+from app.routes.analytics import net_totals
+
+HEADCOUNTS = [100, 1000, 5000]
+ENGINE_ROWS = 100000
+PDF_COUNT = 200
+ANALYTICS_ROWS = 3000000
+SKETCH_ROWS = 1000000
+SEARCH_EMPLOYEES = 100000
+IMPORT_ROWS = 20000
+MONTH = 1
+YEAR = 2025
+
+class QueryCounter:
+    """Count SQL statements executed on an engine"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+    
+    def _on_execute(self, *args):
+        self.count += 1
+    
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+def seed(headcount):
+    """Create an admin user and `headcount` employees with salaries, allowances and deductions"""
+    db.drop_all()
+    db.create_all()
+    
+    admin = User(email='admin@payroll.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.flush()
+    
+    departments = ['Engineering', 'Finance', 'Human Resource', 'Operations', 'Sales']
+    db.session.execute(db.insert(Employee), [
+        {
+            'name': f'Employee {i}',
+            'email': f'employee{i}@payroll.com',
+            'employee_id': f'EMP{i:06d}',
+            'department': departments[i % len(departments)],
+            'position': 'Staff',
+            'is_active': True
+        }
+        for i in range(headcount)
+    ])
+    employee_ids = [row[0] for row in db.session.query(Employee.id).order_by(Employee.id)]
+    
+    db.session.execute(db.insert(Salary), [
+        {'employee_id': eid, 'basic_salary': 1500 + (eid % 50) * 100, 'start_date': date(2024, 1, 1)}
+        for eid in employee_ids
+    ])
+    db.session.execute(db.insert(Allowance), [
+        {'employee_id': eid, 'allowance_type': 'Housing', 'amount': 250, 'start_date': date(2024, 1, 1)}
+        for eid in employee_ids if eid % 2 == 0
+    ])
+    db.session.execute(db.insert(Deduction), [
+        {'employee_id': eid, 'deduction_type': 'Pension', 'amount': 75, 'start_date': date(2024, 1, 1)}
+        for eid in employee_ids if eid % 3 == 0
+    ])
+    db.session.commit()
+    return admin.id
+
+def timed(label, func):
+    """Run func while counting queries and print the result line"""
+    with QueryCounter(db.engine) as counter:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f"   - {label}: {counter.count} queries, {elapsed * 1000:.1f} ms")
+    return result
+
+def benchmark_bulk_create(headcount):
+    """Benchmark bulk payroll run creation, month processing and batch calculation"""
+    admin_id = seed(headcount)
+    print(f"\n📊 {headcount} employees")
+    
+    timed('bulk create (dry run)', lambda: PayrollService.create_bulk_runs(
+        MONTH, YEAR, admin_id, dry_run=True
+    ))
+    result = timed('bulk create', lambda: PayrollService.create_bulk_runs(MONTH, YEAR, admin_id))
+    assert result['success_count'] == headcount, result
+    timed('process month', lambda: PayrollService.process_month(MONTH, YEAR))
+    
+    employee_ids = [row[0] for row in db.session.query(Employee.id)]
+    app = current_app._get_current_object()
+    app.config['INTERVAL_INDEX_ENABLED'] = False
+    expected = timed('calculate batch (queries)', lambda: PayrollService.calculate_batch(employee_ids, MONTH, YEAR))
+    app.config['INTERVAL_INDEX_ENABLED'] = True
+    app.extensions.pop('compensation_index', None)
+    timed('calculate batch (index load)', lambda: PayrollService.calculate_batch(employee_ids, MONTH, YEAR))
+    result = timed('calculate batch (warm index)', lambda: PayrollService.calculate_batch(employee_ids, MONTH, YEAR))
+    assert result == expected, 'interval index and query results differ'
+
+def benchmark_dashboard():
+    """Query count and latency of the analytics dashboard over the last seeded month"""
+    print("\n📈 Analytics dashboard")
+    app = current_app._get_current_object()
+    admin = User.query.filter_by(email='admin@payroll.com').one()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+    client = app.test_client()
+    app.config['ANALYTICS_CACHE_ENABLED'] = False
+    
+    # The first engine request loads payslips; later requests only read its arrays
+    url = f'/api/analytics/dashboard?year={YEAR}&month={MONTH}&trend_months=12'
+    for engine, bound in ((True, 2), (False, 3)):
+        app.config['ANALYTICS_ENGINE_ENABLED'] = engine
+        client.get(url, headers=headers)
+        with QueryCounter(db.engine) as counter:
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            elapsed = time.perf_counter() - started
+        label = 'engine' if engine else 'summary table'
+        print(f"   - dashboard ({label}): {counter.count} queries, {elapsed * 1000:.1f} ms")
+        assert response.status_code == 200, response.json
+        assert response.json['summary']['total_payslips'] == HEADCOUNTS[-1], response.json['summary']
+        assert counter.count <= bound, f'dashboard made {counter.count} queries, expected at most {bound}'
+    app.config['ANALYTICS_ENGINE_ENABLED'] = True
+    app.config['ANALYTICS_CACHE_ENABLED'] = True
+
+def benchmark_list_queries():
+    """Queries list endpoints make at two page sizes (tests/test_list_queries.py checks they match)"""
+    print("\n📄 List endpoint queries per page")
+    app = current_app._get_current_object()
+    admin = User.query.filter_by(email='admin@payroll.com').one()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+    client = app.test_client()
+    
+    for path in ('/api/employees', '/api/payroll/runs', '/api/payslips'):
+        counts = []
+        for per_page in (10, 100):
+            url = f'{path}?per_page={per_page}'
+            client.get(url, headers=headers)  # loads the compensation index once
+            with QueryCounter(db.engine) as counter:
+                response = client.get(url, headers=headers)
+            assert response.status_code == 200, response.json
+            counts.append(counter.count)
+        print(f"   - {path}: {counts[0]} queries for 10 rows, {counts[1]} for 100")
+
+def benchmark_facets():
+    """Check that facet counts cost one query and plain list calls run none"""
+    print("\n📊 Employee list facets")
+    app = current_app._get_current_object()
+    admin = User.query.filter_by(email='admin@payroll.com').one()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+    client = app.test_client()
+    
+    counts = {}
+    for facets in ('', 'department', 'all'):
+        url = f'/api/employees?per_page=10&facets={facets}'
+        client.get(url, headers=headers)
+        with QueryCounter(db.engine) as counter:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.json
+        assert ('summary' in response.json) == bool(facets), response.json.keys()
+        counts[facets] = counter.count
+    print(f"   - list {counts['']} queries, one facet {counts['department']}, all facets {counts['all']}")
+    assert counts['department'] == counts['all'] == counts[''] + 1, counts
+    
+    summary = response.json['summary']
+    assert summary['total_filtered'] == Employee.query.filter_by(is_active=True).count()
+    assert sum(d['count'] for d in summary['genders']) <= summary['total_filtered']
+
+def benchmark_deep_pages(per_page=50):
+    """Compare the first and last payslip pages under OFFSET and cursor pagination"""
+    print(f"\n📄 Payslip pages of {per_page}, first vs last")
+    app = current_app._get_current_object()
+    admin = User.query.filter_by(email='admin@payroll.com').one()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+    client = app.test_client()
+    
+    last_page = Payslip.query.count() // per_page
+    boundary = Payslip.query.order_by(Payslip.created_at.desc(), Payslip.id.desc()).offset(
+        (last_page - 1) * per_page - 1
+    ).first()
+    cursor = encode_cursor([Payslip.created_at, Payslip.id], True, boundary, 'next')
+    
+    for label, first, last in (
+        ('offset', f'/api/payslips?per_page={per_page}&page=1', f'/api/payslips?per_page={per_page}&page={last_page}'),
+        ('cursor', f'/api/payslips?per_page={per_page}&cursor=', f'/api/payslips?per_page={per_page}&cursor={cursor}'),
+    ):
+        timings = []
+        for url in (first, last):
+            client.get(url, headers=headers)
+            started = time.perf_counter()
+            for _ in range(5):
+                response = client.get(url, headers=headers)
+            timings.append((time.perf_counter() - started) / 5 * 1000)
+            assert response.status_code == 200 and len(response.json['payslips']) == per_page, response.json
+        print(f"   - {label}: page 1 {timings[0]:.1f} ms, page {last_page} {timings[1]:.1f} ms")
+    
+    ids = [p['id'] for p in client.get(f'/api/payslips?per_page={per_page}&page={last_page}', headers=headers).json['payslips']]
+    assert ids == [p['id'] for p in response.json['payslips']], 'cursor and offset pages differ'
+
+def benchmark_import(rows, single_rows=200):
+    """Compare the bulk CSV import with one POST /api/employees per employee"""
+    print(f"\n📥 Employee import, {rows} rows")
+    app = current_app._get_current_object()
+    admin = User.query.filter_by(email='admin@payroll.com').one()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+    client = app.test_client()
+    before = Employee.query.count()
+    
+    started = time.perf_counter()
+    for i in range(single_rows):
+        response = client.post('/api/employees', headers=headers, json={
+            'name': f'Single {i}', 'email': f'single{i}@import.com', 'employee_id': f'SGL{i:06d}',
+            'department': 'Sales', 'basic_salary': 2500
+        })
+        assert response.status_code == 201, response.json
+    single = (time.perf_counter() - started) / single_rows
+    
+    lines = ['name,email,employee_id,department,employment_type,hire_date,basic_salary']
+    lines += [f'Imported {i},imported{i}@import.com,IMP{i:06d},Sales,Full-time,2024-03-01,{2000 + i % 40 * 50}'
+              for i in range(rows)]
+    lines.append('Broken,not-an-email,IMP999999,Sales,Full-time,2024-03-01,100')
+    body = io.BytesIO('\n'.join(lines).encode())
+    with QueryCounter(db.engine) as counter:
+        started = time.perf_counter()
+        response = client.post('/api/employees/import?chunk_size=1000', headers={**headers, 'Content-Type': 'text/csv'},
+                               data=body)
+        bulk = time.perf_counter() - started
+    assert response.status_code == 201, response.json
+    assert response.json['success_count'] == rows and response.json['error_count'] == 1, response.json
+    assert Employee.query.count() == before + single_rows + rows
+    
+    print(f"   - one request per employee: {single * 1000:.2f} ms per employee")
+    print(f"   - bulk import: {counter.count} queries, {bulk:.2f}s ({bulk / rows * 1000:.3f} ms per employee, "
+          f"{single / (bulk / rows):.0f}x faster)")
+    # Preload, then an employee insert, id read-back and salary insert per chunk, plus the auth lookup
+    assert counter.count <= 2 + 3 * -(-rows // 1000), f'{counter.count} queries for {rows} rows'
+
+def benchmark_engine(rows):
+    """Compare vectorized and scalar payroll arithmetic on synthetic inputs"""
+    print(f"\n🧮 Payroll engine, {rows} employees")
+    basic = [1500 + (i % 50) * 100 for i in range(rows)]
+    allowances = [250 if i % 2 == 0 else 0 for i in range(rows)]
+    deductions = [75 if i % 3 == 0 else 0 for i in range(rows)]
+    
+    results = {}
+    for vectorized in (True, False):
+        started = time.perf_counter()
+        results[vectorized] = payroll_engine.calculate_batch(
+            basic, allowances, deductions, vectorized=vectorized
+        )
+        elapsed = time.perf_counter() - started
+        label = 'vectorized' if vectorized else 'scalar'
+        print(f"   - {label}: {elapsed * 1000:.1f} ms")
+    
+    assert results[True] == results[False], 'vectorized and scalar results differ'
+
+def benchmark_pdf(count):
+    """Compare payslip render throughput with per-call and reused templates, and both renderers"""
+    print(f"\n📄 Payslip PDFs, {count} payslips")
+    payslips = [
+        (
+            SimpleNamespace(basic_salary=1500 + i, total_allowances=250, gross_salary=1750 + i,
+                            total_deductions=75, tax=100, net_salary=1575 + i),
+            SimpleNamespace(name=f'Employee {i}', employee_id=f'EMP{i:06d}',
+                            department='Finance' if i % 3 else None, position='Staff'),
+            SimpleNamespace(month=MONTH, year=YEAR)
+        )
+        for i in range(count)
+    ]
+    
+    def report(label, func):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        print(f"   - {label}: {count / elapsed:.1f} payslips/s")
+    
+    # Building the template on every call is what generate_payslip_pdf used to do
+    report('single, template per call', lambda: [PayslipTemplate().render([item]) for item in payslips])
+    report('single, shared template', lambda: [PDFService.generate_payslip_pdf(*item) for item in payslips])
+    report('batch, separate buffers', lambda: PDFService.generate_payslip_pdfs(payslips))
+    report('batch, combined document', lambda: PDFService.generate_combined_pdf(payslips))
+    report('single, direct renderer', lambda: [PDFService.generate_payslip_pdf(*item, renderer='direct')
+                                               for item in payslips])
+    report('batch, direct renderer', lambda: PDFService.generate_combined_pdf(payslips, renderer='direct'))
+
+def check_analytics_paths():
+    """Check that the analytics engine and the summary table give the payslips' exact totals"""
+    print("\n📊 Analytics engine vs summary table")
+    app = current_app._get_current_object()
+    net_totals(('department',))  # loads the engine before the move
+    # Payslips count under the employee's current department on both paths
+    moved = Employee.query.join(Payslip).order_by(Employee.id).first()
+    moved.department = 'Transferred'
+    db.session.commit()
+    
+    department = db.func.nullif(db.func.coalesce(Employee.department, ''), '')
+    for group_by, columns in (((), []), (('department',), [department]), (('year', 'month'), [PayrollRun.year, PayrollRun.month])):
+        query = db.session.query(*columns, db.func.count(Payslip.id), db.func.sum(Payslip.net_salary)).join(
+            PayrollRun, Payslip.payroll_run_id == PayrollRun.id
+        ).join(Employee, Payslip.employee_id == Employee.id)
+        if columns:
+            query = query.group_by(*columns)
+        exact = {tuple(row[:-2]): (row[-2], round(row[-1] or 0, 2)) for row in query.all()}
+        
+        for enabled in (True, False):
+            app.config['ANALYTICS_ENGINE_ENABLED'] = enabled
+            totals = {
+                tuple(value or None for value in row[:-2]): (row[-2], round(row[-1], 2))
+                for row in net_totals(group_by) if row[-2]
+            }
+            assert totals == exact, f"{'engine' if enabled else 'summary'} by {group_by}: {totals} != {exact}"
+        print(f"   - by {', '.join(group_by) or 'nothing'}: {len(exact)} groups agree")
+    app.config['ANALYTICS_ENGINE_ENABLED'] = True
+
+def benchmark_analytics(rows):
+    """Query latency of the in-memory analytics engine over synthetic payslip history"""
+    print(f"\n📊 Analytics engine, {rows} payslips")
+    rng = np.random.default_rng(0)
+    employees = 50000
+    engine = AnalyticsEngine(ttl=3600)
+    # Initial load from the empty benchmark database, then synthetic facts on top
+    engine.ensure_fresh()
+    engine.set_employees(np.arange(1, employees + 1), {
+        'department': rng.choice(['Engineering', 'Finance', 'HR', 'Sales', 'Operations', None], employees).tolist(),
+        'employment_type': rng.choice(['Full-time', 'Part-time', 'Contract'], employees).tolist(),
+        'gender': rng.choice(['Male', 'Female', 'Other'], employees).tolist(),
+    })
+    
+    started = time.perf_counter()
+    months = rows // employees
+    for period in range(months):
+        net = rng.normal(4000, 1200, employees)
+        engine.append(
+            np.arange(1, employees + 1), np.full(employees, 2020 + period // 12), np.full(employees, period % 12 + 1),
+            {metric: net * (1 + i / 10) for i, metric in enumerate(METRICS)}
+        )
+    print(f"   - load: {time.perf_counter() - started:.2f}s for {len(engine)} rows in {months} months")
+    
+    queries = [
+        ('summary, all time', dict(stats=('count', 'sum'))),
+        ('summary, one month', dict(stats=('count', 'sum'), filters={'year': 2022, 'month': 6})),
+        ('by department, all time', dict(group_by=('department',))),
+        ('monthly trend', dict(group_by=('year', 'month'))),
+        ('department x gender, one year, min/max/std',
+         dict(group_by=('department', 'gender'), stats=('count', 'mean', 'min', 'max', 'std'), filters={'year': 2023})),
+    ]
+    for label, kwargs in queries:
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            engine.aggregate(**kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"   - {label}: {timings[0]:.1f} ms first, {min(timings[1:]):.2f} ms repeated")
+    
+    # A new month of payslips only recomputes its own partition
+    engine.append(np.arange(1, employees + 1), np.full(employees, 2030), np.full(employees, 1),
+                  {metric: rng.normal(4000, 1200, employees) for metric in METRICS})
+    started = time.perf_counter()
+    engine.aggregate(group_by=('department',))
+    print(f"   - by department after appending a month: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+def benchmark_sketches(rows):
+    """Time building and merging quantile sketches and report their error against exact quantiles"""
+    print(f"\n📐 Quantile sketches, {rows} salaries")
+    rng = np.random.default_rng(0)
+    values = np.round(rng.lognormal(8.3, 0.6, rows), 2)
+    values[:rows // 100] = 0  # unpaid leave
+    groups = np.array_split(rng.permutation(values), 240)  # e.g. 20 months x 12 departments
+    
+    started = time.perf_counter()
+    sketches = []
+    for group in groups:
+        sketch = QuantileSketch()
+        sketch.add(group)
+        sketches.append(QuantileSketch.from_dict(sketch.to_dict()))
+    print(f"   - build: {time.perf_counter() - started:.2f}s for {len(groups)} sketches")
+    
+    started = time.perf_counter()
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    print(f"   - merge: {(time.perf_counter() - started) * 1000:.1f} ms, "
+          f"{len(merged.positive)} buckets vs {rows} values")
+    
+    qs = np.linspace(0, 1, 1001)
+    exact = np.quantile(values, qs, method='lower')
+    estimates = np.array(merged.quantiles(qs))
+    errors = np.abs(estimates - exact)
+    print(f"   - max relative error over {len(qs)} quantiles: "
+          f"{(errors / np.maximum(np.abs(exact), 1e-9)).max():.4%} (bound {merged.relative_accuracy:.0%})")
+    
+    histogram = merged.histogram(20)
+    exact_counts, _ = np.histogram(values, bins=[b['start'] for b in histogram] + [histogram[-1]['end']])
+    moved = int(np.abs(exact_counts - [b['count'] for b in histogram]).sum()) // 2
+    print(f"   - histogram: {moved} of {rows} values placed in a neighbouring bin")
+
+def benchmark_search(count):
+    """Build time and query latency of the employee search index over synthetic names"""
+    print(f"\n🔎 Employee search, {count} employees")
+    rng = np.random.default_rng(0)
+    onsets = ['b', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'w', 'z', 'ch', 'sh', 'br', 'tr']
+    vowels = ['a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'ou']
+    
+    def words(n):
+        return sorted({
+            ''.join(rng.choice(onsets) + rng.choice(vowels) for _ in range(rng.integers(2, 4))) + rng.choice(['', 'n', 's', 'r'])
+            for _ in range(n)
+        })
+    
+    # Popularity falls off with rank, as real first and last names do
+    first, last, streets = words(3000), words(20000), words(2000)
+    first_names = rng.choice(first, count, p=np.reciprocal(np.arange(1.0, len(first) + 1)) / np.sum(1 / np.arange(1.0, len(first) + 1)))
+    last_names = rng.choice(last, count)
+    positions = ['Software Engineer', 'Accountant', 'HR Specialist', 'Sales Manager', 'Operations Analyst',
+                 'Data Scientist', 'Payroll Officer', 'Recruiter', 'Product Designer', 'Support Agent']
+    
+    index = EmployeeSearchIndex()
+    index._stale_all = False
+    index._checked_at = float('inf')
+    started = time.perf_counter()
+    for i in range(count):
+        index.add(i + 1, True, {
+            'name': f'{first_names[i].title()} {last_names[i].title()}',
+            'employee_id': f'EMP{i + 1:06d}',
+            'email': f'{first_names[i]}.{last_names[i]}{i + 1}@payroll.com',
+            'position': positions[i % len(positions)],
+            'address': f'{i % 999 + 1} {streets[i % len(streets)].title()} Street',
+        }, keep_sorted=False)
+    index._vocabulary.sort()
+    print(f"   - build: {time.perf_counter() - started:.2f}s")
+    
+    target = count // 2
+    name = f'{first_names[target - 1]} {last_names[target - 1]}'
+    typo = name[:2] + name[3] + name[2] + name[4:]  # swapped letters in the first name
+    queries = [name, name[:-2], typo, last_names[target - 1][:4], f'EMP{target:06d}', str(target), 'acountant', 'sales man']
+    for query in queries:
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            results = index.search(query, limit=20)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"   - {query!r}: {min(timings):.2f} ms, {len(results)} results")
+    
+    assert index.search(f'EMP{target:06d}')[0][0] == target, 'employee id lookup failed'
+    assert target in [eid for eid, _ in index.search(name, limit=100)], 'exact name not found'
+    assert target in [eid for eid, _ in index.search(typo, limit=1000)], 'typo not matched'
+    assert index.search('acountant'), 'typo in position not matched'
+
+def main():
+    app = create_app('testing')
+    
+    with app.app_context():
+        print("Running payroll benchmarks...")
+        for headcount in HEADCOUNTS:
+            benchmark_bulk_create(headcount)
+        benchmark_dashboard()
+        benchmark_list_queries()
+        benchmark_facets()
+        benchmark_deep_pages()
+        check_analytics_paths()
+        benchmark_analytics(ANALYTICS_ROWS)
+        benchmark_import(IMPORT_ROWS)
+    
+    benchmark_engine(ENGINE_ROWS)
+    benchmark_pdf(PDF_COUNT)
+    benchmark_sketches(SKETCH_ROWS)
+    benchmark_search(SEARCH_EMPLOYEES)
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,35 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)  # 1 hour
     JWT_ALGORITHM = 'HS256'
+    
+    # Payroll
+    TAX_JURISDICTION = os.getenv('TAX_JURISDICTION', 'default')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_RECOVERY_ENABLED = os.getenv('JOB_RECOVERY_ENABLED', 'true').lower() == 'true'
+    JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 3600))  # seconds without progress before a running job counts as orphaned
+    INTERVAL_INDEX_ENABLED = os.getenv('INTERVAL_INDEX_ENABLED', 'true').lower() == 'true'
+    INTERVAL_INDEX_TTL = int(os.getenv('INTERVAL_INDEX_TTL', 300))
+    PDF_EXPORT_WORKERS = int(os.getenv('PDF_EXPORT_WORKERS', 2))
+    PDF_RENDERER = os.getenv('PDF_RENDERER', 'platypus')  # 'platypus' or 'direct'
+    PDF_CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'true').lower() == 'true'
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR')  # defaults to <instance path>/pdf_cache
+    PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    PDF_PRERENDER_ENABLED = os.getenv('PDF_PRERENDER_ENABLED', 'false').lower() == 'true'
+    PDF_PRERENDER_WORKERS = int(os.getenv('PDF_PRERENDER_WORKERS', 1))
+    PDF_PRERENDER_MAX_QUEUE = int(os.getenv('PDF_PRERENDER_MAX_QUEUE', 10000))
+    
+    # Analytics
+    ANALYTICS_CACHE_ENABLED = os.getenv('ANALYTICS_CACHE_ENABLED', 'true').lower() == 'true'
+    ANALYTICS_CACHE_BACKEND = os.getenv('ANALYTICS_CACHE_BACKEND', 'memory')  # 'memory' or 'sqlite'
+    ANALYTICS_CACHE_PATH = os.getenv('ANALYTICS_CACHE_PATH')  # defaults to <instance path>/analytics_cache.sqlite3
+    ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', 300))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYTICS_CACHE_MAX_ENTRIES', 256))
+    ANALYTICS_ENGINE_ENABLED = os.getenv('ANALYTICS_ENGINE_ENABLED', 'true').lower() == 'true'
+    ANALYTICS_ENGINE_TTL = int(os.getenv('ANALYTICS_ENGINE_TTL', 60))
+    
+    # Employee search
+    EMPLOYEE_SEARCH_ENABLED = os.getenv('EMPLOYEE_SEARCH_ENABLED', 'true').lower() == 'true'
+    EMPLOYEE_SEARCH_TTL = int(os.getenv('EMPLOYEE_SEARCH_TTL', 30))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -25,8 +54,15 @@ class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
 
+class TestingConfig(Config):
+    """Testing configuration (in-memory SQLite, used by the benchmark scripts)"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    JOB_RECOVERY_ENABLED = False
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
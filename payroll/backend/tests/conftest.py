@@ -0,0 +1,98 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Employee, Salary, Allowance, Deduction
+
+HEADCOUNT = 100
+DEPARTMENTS = ['Engineering', 'Finance', 'Human Resource', 'Operations', 'Sales']
+
+class QueryCounter:
+    """Count SQL statements executed on an engine inside a with block"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+    
+    def _on_execute(self, *args):
+        self.count += 1
+    
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+@pytest.fixture
+def app():
+    """Testing app on in-memory SQLite, inside an app context"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def seeded(app):
+    """An admin and HEADCOUNT employees with compensation; returns the admin user's id
+    
+    Every employee has a salary of 1500 + (id % 50) * 100 from 2024, even ids a 250
+    Housing allowance and multiples of three a 75 Pension deduction.
+    """
+    admin = User(email='admin@payroll.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.flush()
+    
+    db.session.execute(db.insert(Employee), [
+        {
+            'name': f'Employee {i}',
+            'email': f'employee{i}@payroll.com',
+            'employee_id': f'EMP{i:06d}',
+            'department': DEPARTMENTS[i % len(DEPARTMENTS)],
+            'position': 'Staff',
+            'is_active': True
+        }
+        for i in range(HEADCOUNT)
+    ])
+    employee_ids = [row[0] for row in db.session.query(Employee.id).order_by(Employee.id)]
+    
+    start = date(2024, 1, 1)
+    db.session.execute(db.insert(Salary), [
+        {'employee_id': eid, 'basic_salary': 1500 + (eid % 50) * 100, 'start_date': start}
+        for eid in employee_ids
+    ])
+    db.session.execute(db.insert(Allowance), [
+        {'employee_id': eid, 'allowance_type': 'Housing', 'amount': 250, 'start_date': start}
+        for eid in employee_ids if eid % 2 == 0
+    ])
+    db.session.execute(db.insert(Deduction), [
+        {'employee_id': eid, 'deduction_type': 'Pension', 'amount': 75, 'start_date': start}
+        for eid in employee_ids if eid % 3 == 0
+    ])
+    db.session.commit()
+    return admin.id
+
+@pytest.fixture
+def auth_headers(seeded):
+    """Authorization header for the seeded admin"""
+    return {'Authorization': f'Bearer {create_access_token(identity=str(seeded))}'}
+
+@pytest.fixture
+def queries(app):
+    """QueryCounter on the app's engine"""
+    return QueryCounter(db.engine)
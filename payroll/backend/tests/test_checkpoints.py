@@ -0,0 +1,42 @@
+from app.models import PayrollRun, PayrollCheckpoint, Payslip
+from app.services import PayrollService
+
+MONTH, YEAR = 1, 2025
+CHUNK = 30
+
+def fail_chunk(monkeypatch, number):
+    """Make the number-th payslip write of a process_month call raise"""
+    original = PayrollService._write_payslips
+    calls = []
+    
+    def write_payslips(*args):
+        calls.append(args)
+        if len(calls) == number:
+            raise RuntimeError('disk full')
+        return original(*args)
+    
+    monkeypatch.setattr(PayrollService, '_write_payslips', staticmethod(write_payslips))
+
+def test_resume_reprocesses_only_the_failed_chunk(seeded, monkeypatch):
+    PayrollService.create_bulk_runs(MONTH, YEAR, seeded)
+    run_ids = [row[0] for row in PayrollRun.query.with_entities(PayrollRun.id).order_by(PayrollRun.id)]
+    total = len(run_ids)
+    
+    fail_chunk(monkeypatch, 2)
+    result = PayrollService.process_month(MONTH, YEAR, chunk_size=CHUNK)
+    assert result['processed_count'] == total - CHUNK
+    assert sorted(error['payroll_run_id'] for error in result['errors']) == run_ids[CHUNK:2 * CHUNK]
+    
+    checkpoint = PayrollCheckpoint.query.filter_by(operation='process_month', month=MONTH, year=YEAR).one()
+    # last_id stops before the failed chunk even though later chunks committed
+    assert (checkpoint.status, checkpoint.last_id) == ('incomplete', run_ids[CHUNK - 1])
+    assert (checkpoint.processed_count, checkpoint.error_count) == (total - CHUNK, CHUNK)
+    
+    monkeypatch.undo()
+    result = PayrollService.process_month(MONTH, YEAR, chunk_size=CHUNK, resume=True)
+    assert result == {'processed_count': CHUNK, 'error_count': 0, 'errors': [], 'resumed_from': run_ids[CHUNK - 1]}
+    
+    checkpoint = PayrollCheckpoint.query.filter_by(operation='process_month', month=MONTH, year=YEAR).one()
+    assert (checkpoint.status, checkpoint.processed_count) == ('completed', total)
+    assert PayrollRun.query.filter_by(status='draft').count() == 0
+    assert Payslip.query.count() == total
@@ -0,0 +1,40 @@
+from collections import Counter
+from app import db
+from app.models import Employee
+
+def test_summary_only_when_asked_for(client, auth_headers, queries):
+    response = client.get('/api/employees', headers=auth_headers)
+    assert response.status_code == 200 and 'summary' not in response.json
+    
+    with queries:
+        client.get('/api/employees?department=Sales', headers=auth_headers)
+    plain = queries.count
+    with queries:
+        response = client.get('/api/employees?department=Sales&facets=all', headers=auth_headers)
+    # All facets come from one grouped query
+    assert queries.count == plain + 1
+    
+    summary = response.json['summary']
+    assert summary['total_filtered'] == Employee.query.filter_by(department='Sales', is_active=True).count()
+    assert summary['departments'] == [{'name': 'Sales', 'count': summary['total_filtered']}]
+
+def test_counts_match_the_filtered_employees(client, auth_headers):
+    employees = Employee.query.order_by(Employee.id).all()
+    for employee in employees:
+        employee.employment_type = ('full-time', 'part-time', 'contract', None)[employee.id % 4]
+        employee.gender = ('female', 'male', None)[employee.id % 3]
+    employees[0].is_active = False
+    db.session.commit()
+    
+    response = client.get('/api/employees?facets=employment_type,gender', headers=auth_headers)
+    summary = response.json['summary']
+    active = [employee for employee in employees if employee.is_active]
+    assert summary['total_filtered'] == len(active)
+    assert 'departments' not in summary
+    for name, values in (('employment_type', summary['employment_types']), ('gender', summary['genders'])):
+        expected = Counter(getattr(employee, name) for employee in active if getattr(employee, name))
+        assert {value['name']: value['count'] for value in values} == expected
+
+def test_unknown_facet_is_rejected(client, auth_headers):
+    response = client.get('/api/employees?facets=department,salary', headers=auth_headers)
+    assert response.status_code == 400 and 'salary' in response.json['error']
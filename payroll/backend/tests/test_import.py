@@ -0,0 +1,51 @@
+from app.models import Employee, Salary
+from app.services import ImportService
+
+HEADER = 'name,email,employee_id,basic_salary'
+
+def upload(client, auth_headers, lines, **params):
+    query = '&'.join(f'{key}={value}' for key, value in {'format': 'csv', **params}.items())
+    return client.post(f'/api/employees/import?{query}', data='\n'.join([HEADER, *lines]), headers=auth_headers)
+
+def test_invalid_rows_are_reported_by_line(client, auth_headers):
+    response = upload(client, auth_headers, [
+        'Ann Lee,ann@example.com,IMP1,5000',
+        'Bad Salary,bad@example.com,IMP2,nan',
+        'Too Much,much@example.com,IMP3,1e12',
+        'Taken,employee0@payroll.com,IMP4,4000',
+        'Repeat,ann@example.com,IMP5,4000',
+        ',noname@example.com,IMP6,4000',
+        'Ian Low,ian@example.com,IMP7,',
+    ])
+    assert response.status_code == 201, response.json
+    body = response.json
+    assert (body['success_count'], body['error_count']) == (2, 5)
+    # Line numbers count the header as line 1
+    assert [(error['line'], error['employee_id']) for error in body['errors']] == [
+        (3, 'IMP2'), (4, 'IMP3'), (5, 'IMP4'), (6, 'IMP5'), (7, 'IMP6')
+    ]
+    assert 'Email already exists' in body['errors'][2]['errors']
+    assert 'Email appears earlier in the file' in body['errors'][3]['errors']
+    assert {employee.employee_id for employee in Employee.query.filter(Employee.employee_id.like('IMP%'))} == {'IMP1', 'IMP7'}
+    assert Salary.query.join(Employee).filter(Employee.employee_id == 'IMP1').one().basic_salary == 5000
+
+def test_failed_chunk_still_reports_committed_rows(client, auth_headers, monkeypatch):
+    original = ImportService._insert_chunk
+    calls = []
+    
+    def insert_chunk(chunk):
+        calls.append(chunk)
+        if len(calls) == 2:
+            raise RuntimeError('connection lost')
+        return original(chunk)
+    
+    monkeypatch.setattr(ImportService, '_insert_chunk', staticmethod(insert_chunk))
+    lines = [f'Person {i},person{i}@example.com,IMP{i},3000' for i in range(10)]
+    response = upload(client, auth_headers, [*lines[:5], 'Bad,bad@example.com,BAD,-5', *lines[5:]], chunk_size=4)
+    
+    assert response.status_code == 500
+    body = response.json
+    assert body['error'] == 'Database error: connection lost'
+    assert (body['success_count'], body['error_count']) == (4, 1)
+    assert body['errors'][0]['line'] == 7
+    assert Employee.query.filter(Employee.employee_id.like('IMP%')).count() == 4
@@ -0,0 +1,73 @@
+from datetime import date
+import pytest
+from sqlalchemy import text
+from app import db
+from app.models import Salary
+from app.services import PayrollService
+from app.services.interval_index import IntervalIndex, get_compensation_index
+
+def record_loads(monkeypatch):
+    """Employee ids passed to every IntervalIndex.load call (None for a full load)"""
+    loads = []
+    original = IntervalIndex.load
+    
+    def load(self, employee_ids=None):
+        loads.append(None if employee_ids is None else set(employee_ids))
+        return original(self, employee_ids)
+    
+    monkeypatch.setattr(IntervalIndex, 'load', load)
+    return loads
+
+@pytest.fixture
+def settled(seeded):
+    """Seeded compensation written a minute ago, so only new writes fall after the watermark"""
+    with db.engine.begin() as connection:
+        for table in ('salaries', 'allowances', 'deductions'):
+            connection.execute(text(f"UPDATE {table} SET updated_at = datetime('now', '-1 minute')"))
+
+def test_local_edit_reloads_only_that_employee(settled, monkeypatch):
+    employee_ids = [1, 2, 3]
+    PayrollService.current_salaries(employee_ids)
+    db.session.commit()
+    loads = record_loads(monkeypatch)
+    
+    salary = Salary.query.filter_by(employee_id=2).first()
+    salary.basic_salary = 9999
+    db.session.commit()
+    
+    assert PayrollService.current_salaries(employee_ids)[2] == 9999
+    assert loads and None not in loads
+    assert all(employee_ids == {2} for employee_ids in loads)
+
+def test_foreign_writes_are_picked_up(settled, monkeypatch):
+    PayrollService.current_salaries([1, 2])
+    db.session.commit()
+    loads = record_loads(monkeypatch)
+    
+    # Another worker's update and insert: no session events reach this index
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'UPDATE salaries SET basic_salary = 4321, updated_at = CURRENT_TIMESTAMP WHERE employee_id = 1'
+        ))
+        connection.execute(text(
+            "INSERT INTO salaries (employee_id, basic_salary, start_date, updated_at) "
+            "VALUES (2, 7000, :start, CURRENT_TIMESTAMP)"
+        ), {'start': date(2024, 6, 1)})
+    
+    assert PayrollService.current_salaries([1, 2]) == {1: 4321, 2: 7000}
+    assert None not in loads
+    
+    # A delete can't be traced to an employee and reloads everything
+    db.session.commit()
+    with db.engine.begin() as connection:
+        connection.execute(text('DELETE FROM salaries WHERE employee_id = 2 AND basic_salary = 7000'))
+    assert PayrollService.current_salaries([2])[2] != 7000
+    assert None in loads
+
+def test_index_matches_database_after_edits(settled):
+    index = get_compensation_index()
+    PayrollService.current_salaries([1])
+    db.session.add(Salary(employee_id=5, basic_salary=1234, start_date=date(2024, 7, 1)))
+    db.session.commit()
+    PayrollService.current_salaries([5])
+    assert index.salaries.count == Salary.query.count()
@@ -0,0 +1,17 @@
+import pytest
+from app.services import PayrollService
+
+@pytest.mark.parametrize('path', ['/api/employees', '/api/payroll/runs', '/api/payslips'])
+def test_list_queries_do_not_grow_with_page_size(client, seeded, auth_headers, queries, path):
+    PayrollService.create_bulk_runs(1, 2025, seeded)
+    PayrollService.process_month(1, 2025)
+    
+    counts = []
+    for per_page in (10, 100):
+        url = f'{path}?per_page={per_page}'
+        client.get(url, headers=auth_headers)  # loads the compensation index once
+        with queries:
+            response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200, response.json
+        counts.append(queries.count)
+    assert counts[0] == counts[1], f'{path} queries grow with page size: {counts}'
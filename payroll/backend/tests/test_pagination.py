@@ -0,0 +1,48 @@
+from datetime import date
+import pytest
+from app import db
+from app.models import Employee
+from app.services.pagination import keyset_paginate
+
+PER_PAGE = 7
+
+@pytest.fixture
+def hire_dates(seeded):
+    """Hire dates with runs of duplicates and a quarter of them NULL, as {id: hire_date}"""
+    employees = Employee.query.all()
+    for employee in employees:
+        employee.hire_date = None if employee.id % 4 == 0 else date(2020, 1, 1 + employee.id % 5)
+    db.session.commit()
+    return {employee.id: employee.hire_date for employee in employees}
+
+def walk(columns, descending, cursor, direction):
+    """Pages of ids from cursor until the end in one direction"""
+    pages = []
+    while True:
+        page = keyset_paginate(Employee.query, columns, descending=descending, cursor=cursor, per_page=PER_PAGE)
+        pages.append([employee.id for employee in page.items])
+        cursor = page.next_cursor if direction == 'next' else page.prev_cursor
+        if cursor is None:
+            return pages
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_round_trip_with_null_sort_keys(hire_dates, descending):
+    # NULLs sort first ascending and last descending
+    def key(employee_id):
+        hire_date = hire_dates[employee_id]
+        return (hire_date is not None, hire_date or date.min, employee_id)
+    expected = sorted(hire_dates, key=key, reverse=descending)
+    columns = [Employee.hire_date, Employee.id]
+    
+    forward = walk(columns, descending, None, 'next')
+    assert [employee_id for page in forward for employee_id in page] == expected
+    assert all(len(page) == PER_PAGE for page in forward[:-1])
+    
+    # From the last page back to the first, the same pages come back in reverse
+    last = keyset_paginate(Employee.query, columns, descending=descending, per_page=PER_PAGE)
+    for _ in forward[1:]:
+        last = keyset_paginate(
+            Employee.query, columns, descending=descending, cursor=last.next_cursor, per_page=PER_PAGE
+        )
+    backward = walk(columns, descending, last.prev_cursor, 'prev')
+    assert backward == forward[-2::-1]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from app.services import payroll_engine
+from app.services.payroll_engine import compile_brackets, TAX_BRACKETS
+
+CUSTOM_BRACKETS = [(750.5, 0.05), (2000, 0.12), (12000, 0.3), (None, 0.45)]
+
+def bracket_edges(brackets):
+    """Zero and every bracket bound with its neighbours"""
+    values = [0.0, 0.01]
+    for upper, _ in brackets:
+        if upper is not None:
+            values += [upper - 0.01, upper, upper + 0.01, np.nextafter(upper, 0), np.nextafter(upper, np.inf)]
+    return values
+
+@pytest.mark.parametrize('brackets', [TAX_BRACKETS, CUSTOM_BRACKETS])
+def test_vectorized_matches_scalar_at_bracket_edges(brackets):
+    table = compile_brackets(brackets)
+    edges = bracket_edges(brackets)
+    spread = np.round(np.random.default_rng(3).uniform(0, 20000, 200), 2).tolist()
+    salaries = edges + spread
+    # No allowance on the edges, so gross lands exactly on them
+    allowances = [0.0] * len(edges) + [(i % 4) * 125.0 for i in range(len(spread))]
+    deductions = [(i % 3) * 40.0 for i in range(len(salaries))]
+    
+    scalar = payroll_engine.calculate_batch(salaries, allowances, deductions, table=table, vectorized=False)
+    vectorized = payroll_engine.calculate_batch(salaries, allowances, deductions, table=table, vectorized=True)
+    assert vectorized == scalar
+
+def test_bracket_bound_is_taxed_in_its_own_bracket():
+    # 1000 at 0%, then 2000 at 10%; the next cent is taxed at 15%
+    assert payroll_engine.calculate_tax(3000) == pytest.approx(200)
+    assert payroll_engine.calculate_tax(3000.01) == pytest.approx(200.0015)
+    assert payroll_engine.calculate_tax_array(np.array([1000.0, 3000.0, 5000.0])).tolist() == pytest.approx([0, 200, 500])
@@ -0,0 +1,54 @@
+import os
+import pytest
+from app import db
+from app.models import Payslip
+from app.services import PayrollService
+from app.services.pdf_cache import PDFCache
+
+def put_at(cache, key, size, mtime):
+    path = cache.put(key, b'%' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=1000)
+    put_at(cache, 'aa1', 400, 100)
+    put_at(cache, 'bb2', 400, 200)
+    os.utime(cache.path_for('aa1'), (300, 300))  # read more recently than bb2
+    put_at(cache, 'cc3', 400, 400)
+    
+    assert cache.get('bb2') is None
+    assert cache.get('aa1') and cache.get('cc3')
+    assert cache._scan_size() <= 900
+
+def test_open_handle_survives_eviction(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=1000)
+    put_at(cache, 'aa1', 600, 100)
+    with cache.open('aa1') as pdf:
+        put_at(cache, 'bb2', 600, 200)
+        assert cache.get('aa1') is None
+        assert pdf.read() == b'%' * 600
+
+@pytest.fixture
+def payslip(app, seeded, tmp_path):
+    app.config['PDF_CACHE_DIR'] = str(tmp_path)
+    PayrollService.create_bulk_runs(1, 2025, seeded)
+    PayrollService.process_month(1, 2025)
+    return Payslip.query.order_by(Payslip.id).first()
+
+def test_download_uses_etag_and_changes_with_the_payslip(client, auth_headers, payslip, tmp_path):
+    url = f'/api/payslips/{payslip.id}/pdf'
+    first = client.get(url, headers=auth_headers)
+    assert first.status_code == 200 and first.data.startswith(b'%PDF')
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+    assert len([name for _, _, files in os.walk(tmp_path) for name in files]) == 1
+    
+    assert client.get(url, headers=auth_headers).data == first.data
+    not_modified = client.get(url, headers={**auth_headers, 'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not not_modified.data
+    
+    payslip.net_salary += 10
+    db.session.commit()
+    changed = client.get(url, headers={**auth_headers, 'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
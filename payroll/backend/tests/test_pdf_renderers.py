@@ -0,0 +1,80 @@
+import re
+import zlib
+import base64
+from types import SimpleNamespace
+from app.services import PDFService
+from app.services.pdf_service import get_renderer
+
+PDF_TOKEN = re.compile(rb'\((?:\\.|[^\\()])*\)|/[^\s/\[\]()<>]+|[-+]?(?:\d+\.?\d*|\.\d+)|[A-Za-z*]+')
+
+def pdf_text_runs(data):
+    """(page, text, x, y, font, size, fill colour) for every text run in a PDF's page content
+    
+    Understands just what ReportLab and the direct renderer emit: translation-only
+    cm, q/Q, rg, Tf, Tm and Tj in Flate (optionally ASCII85) content streams.
+    """
+    fonts = {
+        name.decode(): base.decode()
+        for base, name in re.findall(rb'/BaseFont /(\S+) .*?/Name /(\S+)', data)
+    }
+    runs = []
+    streams = re.finditer(rb'<<([^<>]*/Filter[^<>]*)>>\s*stream\r?\n(.*?)endstream', data, re.S)
+    for page, (header, body) in enumerate((m.group(1), m.group(2)) for m in streams):
+        if b'ASCII85Decode' in header:
+            body = base64.a85decode(body.strip(), adobe=True)
+        content = zlib.decompress(body)
+        
+        state = {'origin': (0.0, 0.0), 'font': None, 'size': None, 'fill': None}
+        stack, operands, position = [], [], (0.0, 0.0)
+        for token in PDF_TOKEN.findall(content):
+            if token[:1] in b'(/' or token[:1].isdigit() or token[:1] in b'-+.':
+                operands.append(token)
+                continue
+            op = token.decode()
+            if op == 'q':
+                stack.append(dict(state))
+            elif op == 'Q':
+                state = stack.pop()
+            elif op == 'cm':
+                e, f = map(float, operands[4:6])
+                state['origin'] = (state['origin'][0] + e, state['origin'][1] + f)
+            elif op == 'rg':
+                state['fill'] = tuple(round(float(v), 4) for v in operands)
+            elif op == 'Tf':
+                state['font'], state['size'] = fonts[operands[0][1:].decode()], float(operands[1])
+            elif op == 'Tm':
+                position = (float(operands[4]), float(operands[5]))
+            elif op == 'Tj':
+                runs.append((
+                    page, operands[0].decode('latin-1'),
+                    round(state['origin'][0] + position[0], 2), round(state['origin'][1] + position[1], 2),
+                    state['font'], state['size'], state['fill']
+                ))
+            operands = []
+    return sorted(runs)
+
+def sample_payslips(count):
+    return [
+        (
+            SimpleNamespace(basic_salary=1500 + i, total_allowances=250, gross_salary=1750 + i,
+                            total_deductions=75, tax=100, net_salary=1575 + i),
+            SimpleNamespace(name=f'Employee {i}', employee_id=f'EMP{i:06d}',
+                            department='Finance' if i % 3 else None, position='Staff'),
+            SimpleNamespace(month=1, year=2025)
+        )
+        for i in range(count)
+    ]
+
+def test_direct_renderer_matches_platypus_layout(app):
+    # Same text, fonts, colours and positions on every page, whichever renderer drew it
+    payslips = sample_payslips(20)
+    platypus_runs = pdf_text_runs(get_renderer('platypus').render(payslips).getvalue())
+    direct_runs = pdf_text_runs(get_renderer('direct').render(payslips).getvalue())
+    assert platypus_runs
+    assert platypus_runs == direct_runs
+
+def test_single_payslip_matches_across_renderers(app):
+    payslip = sample_payslips(1)[0]
+    platypus = PDFService.generate_payslip_pdf(*payslip, renderer='platypus').getvalue()
+    direct = PDFService.generate_payslip_pdf(*payslip, renderer='direct').getvalue()
+    assert pdf_text_runs(platypus) == pdf_text_runs(direct)
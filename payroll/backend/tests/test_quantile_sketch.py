@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from app.services.quantile_sketch import QuantileSketch
+
+ROWS = 100000
+
+@pytest.fixture(scope='module')
+def salaries():
+    rng = np.random.default_rng(0)
+    values = np.round(rng.lognormal(8.3, 0.6, ROWS), 2)
+    values[:ROWS // 100] = 0  # unpaid leave
+    return values
+
+@pytest.fixture(scope='module')
+def merged(salaries):
+    """One sketch merged from 240 stored group sketches, e.g. 20 months x 12 departments"""
+    merged = QuantileSketch()
+    for group in np.array_split(np.random.default_rng(1).permutation(salaries), 240):
+        sketch = QuantileSketch()
+        sketch.add(group)
+        merged.merge(QuantileSketch.from_dict(sketch.to_dict()))
+    return merged
+
+def test_merging_is_exact(salaries, merged):
+    whole = QuantileSketch()
+    whole.add(salaries)
+    assert merged.to_dict() == whole.to_dict()
+
+def test_quantiles_stay_within_accuracy_bound(salaries, merged):
+    qs = np.linspace(0, 1, 1001)
+    exact = np.quantile(salaries, qs, method='lower')
+    errors = np.abs(np.array(merged.quantiles(qs)) - exact)
+    bound = merged.relative_accuracy * np.abs(exact) + 1e-9
+    assert (errors <= bound).all(), f'quantile error above bound at q={qs[np.argmax(errors - bound)]}'
+
+def test_histogram_counts_every_value(merged):
+    assert sum(b['count'] for b in merged.histogram(20)) == ROWS
@@ -0,0 +1,37 @@
+import pytest
+from app import db
+from app.models import Salary, Allowance, PayrollRun, Payslip
+from app.services import PayrollService
+
+MONTH, YEAR = 3, 2025
+EMPLOYEE_ID = 6  # has both the Housing allowance and the Pension deduction
+
+@pytest.fixture
+def draft_run(seeded):
+    PayrollService.create_bulk_runs(MONTH, YEAR, seeded, default_deductions=40)
+    return PayrollRun.query.filter_by(employee_id=EMPLOYEE_ID, month=MONTH, year=YEAR).one()
+
+def test_allowance_change_does_not_flag_runs(draft_run):
+    Allowance.query.filter_by(employee_id=EMPLOYEE_ID).one().amount = 900
+    db.session.commit()
+    assert not db.session.get(PayrollRun, draft_run.id).needs_recalculation
+
+def test_salary_change_flags_and_recalculates(draft_run):
+    Salary.query.filter_by(employee_id=EMPLOYEE_ID).one().basic_salary = 5000
+    Allowance.query.filter_by(employee_id=EMPLOYEE_ID).one().amount = 900
+    db.session.commit()
+    assert db.session.get(PayrollRun, draft_run.id).needs_recalculation
+    assert PayrollRun.query.filter_by(needs_recalculation=True).count() == 1
+    
+    result = PayrollService.recalculate_runs(month=MONTH, year=YEAR)
+    assert result['recalculated_count'] == 1 and not result['errors']
+    run = db.session.get(PayrollRun, draft_run.id)
+    assert (run.basic_salary, run.net_salary, run.needs_recalculation) == (5000, 5000 - 40, False)
+    
+    # Processing applies the current allowance and deduction records on top
+    PayrollService.process_month(MONTH, YEAR)
+    payslip = Payslip.query.filter_by(payroll_run_id=run.id).one()
+    expected = PayrollService.calculate_batch([EMPLOYEE_ID], MONTH, YEAR)[0]
+    assert payslip.basic_salary == expected['basic_salary'] == 5000
+    assert payslip.total_allowances == expected['total_allowances'] == 900
+    assert payslip.total_deductions == expected['total_deductions'] + 40 == 75 + 40
@@ -0,0 +1,61 @@
+import pytest
+from app import db
+from app.models import Employee
+from app.services.search_index import EmployeeSearchIndex, get_search_index, _deletes
+
+def build_index(*names):
+    """An index over employees 1..n with the given names, no database needed"""
+    index = EmployeeSearchIndex()
+    index._stale_all = False
+    index._checked_at = float('inf')
+    for employee_id, name in enumerate(names, start=1):
+        index.add(employee_id, True, {'name': name, 'employee_id': f'EMP{employee_id:06d}', 'position': 'Accountant'})
+    return index
+
+@pytest.mark.parametrize('query', [
+    'thornton',   # exact
+    'thorn',      # prefix
+    'thornten',   # substitution
+    'thornon',    # deletion
+    'thornnton',  # insertion
+    'thonrton',   # adjacent swap
+])
+def test_typo_tolerant_name_search(query):
+    index = build_index('Margaret Thornton', 'Jane Doe')
+    assert [employee_id for employee_id, _ in index.search(query)] == [1]
+
+def test_exact_match_outranks_typo():
+    index = build_index('Mark Tanner', 'Mary Tanner')
+    (first, exact), (second, typo) = index.search('mark')
+    assert (first, second) == (1, 2) and exact > typo
+
+def test_short_words_need_an_exact_or_prefix_match():
+    index = build_index('Ann Lee', 'Ian Low')
+    assert index.search('anx') == []
+    assert [employee_id for employee_id, _ in index.search('an')] == [1]
+
+def test_removed_words_and_variants_are_pruned():
+    index = build_index('Margaret Thornton', 'Peter Thornton', 'Jane Doe')
+    index.remove(1)
+    # Still held by employee 2
+    assert 'thornton' in index._postings and index._fuzzy_counts['thornton'] == 1
+    assert 'margaret' not in index._postings and 'margaret' not in index._vocabulary
+    assert not any(variant in index._variants for variant in _deletes('margaret'))
+    
+    index.remove(2)
+    assert 'thornton' not in index._postings and 'thornton' not in index._fuzzy_counts
+    assert all('thornton' not in words for words in index._variants.values())
+    assert index.search('thornton') == [] and index.search('thorton') == []
+    assert sorted(index._vocabulary) == index._vocabulary
+
+def test_renamed_employee_is_reindexed_on_commit(seeded):
+    employee = db.session.get(Employee, 1)
+    employee.name = 'Margaret Thornton'
+    db.session.commit()
+    assert [employee_id for employee_id, _ in get_search_index().search('thorntn')] == [1]
+    
+    employee.name = 'Alice Smith'
+    db.session.commit()
+    index = get_search_index()
+    assert index.search('thornton') == []
+    assert 'thornton' not in index._postings and 'thornton' not in index._fuzzy_counts
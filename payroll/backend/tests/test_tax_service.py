@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import text
+from app import db
+from app.services import TaxService
+from app.services.tax_service import _compiled_table
+
+YEAR = 2025
+
+def backdate_brackets(minutes):
+    """Move bracket edits into the past, so their version is settled and cached"""
+    with db.engine.begin() as connection:
+        connection.execute(text(f"UPDATE tax_brackets SET updated_at = datetime('now', '-{minutes} minutes')"))
+
+@pytest.fixture
+def brackets(app):
+    TaxService.invalidate()
+    TaxService.replace_brackets(YEAR, [{'upper_bound': 1000, 'rate': 0.1}, {'upper_bound': None, 'rate': 0.2}])
+    db.session.commit()
+    backdate_brackets(2)
+    yield
+    TaxService.invalidate()
+
+def test_settled_version_is_cached(brackets):
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(900)
+    db.session.commit()
+    hits = _compiled_table.cache_info().hits
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(900)
+    assert _compiled_table.cache_info().hits == hits + 1
+
+def test_local_replace_is_used_after_commit(brackets):
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(900)
+    TaxService.replace_brackets(YEAR, [{'upper_bound': None, 'rate': 0.05}])
+    db.session.commit()
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(250)
+
+def test_foreign_edit_is_used_from_the_next_transaction(brackets):
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(900)
+    
+    # Another process edits a rate: no session events reach this cache
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'UPDATE tax_brackets SET rate = 0.3, updated_at = CURRENT_TIMESTAMP WHERE upper_bound IS NULL'
+        ))
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(900)
+    db.session.commit()
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(1300)
+    
+    # Once the edit's second has passed, the new version is cached like any other
+    db.session.commit()
+    backdate_brackets(1)
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(1300)
+    db.session.commit()
+    hits = _compiled_table.cache_info().hits
+    assert TaxService.calculate_tax(5000, YEAR) == pytest.approx(1300)
+    assert _compiled_table.cache_info().hits == hits + 1
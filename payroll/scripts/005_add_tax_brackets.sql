@@ -0,0 +1,21 @@
+-- Migration to add configurable tax bracket tables
+-- Brackets are keyed by jurisdiction and year; a NULL upper_bound marks the open-ended top bracket
+
+CREATE TABLE IF NOT EXISTS tax_brackets (
+  id INT PRIMARY KEY AUTO_INCREMENT,
+  jurisdiction VARCHAR(50) NOT NULL DEFAULT 'default',
+  year INT NOT NULL,
+  upper_bound DECIMAL(12, 2),
+  rate DECIMAL(6, 4) NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_tax_brackets_jurisdiction_year ON tax_brackets(jurisdiction, year);
+
+-- Seed the brackets previously hardcoded in PayrollService._calculate_tax
+INSERT INTO tax_brackets (jurisdiction, year, upper_bound, rate) VALUES
+('default', 2000, 1000.00, 0.0000),
+('default', 2000, 3000.00, 0.1000),
+('default', 2000, 5000.00, 0.1500),
+('default', 2000, NULL, 0.2000);
@@ -0,0 +1,22 @@
+-- Migration to add the background jobs table
+-- Long-running payroll operations are recorded here so their progress can be polled
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id INT PRIMARY KEY AUTO_INCREMENT,
+  job_type VARCHAR(50) NOT NULL,
+  status VARCHAR(20) NOT NULL DEFAULT 'queued',
+  params JSON,
+  total INT DEFAULT 0,
+  processed INT DEFAULT 0,
+  failed INT DEFAULT 0,
+  errors JSON,
+  result JSON,
+  created_by INT NOT NULL,
+  started_at DATETIME,
+  finished_at DATETIME,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FOREIGN KEY (created_by) REFERENCES users(id)
+);
+
+CREATE INDEX idx_jobs_status ON jobs(status);
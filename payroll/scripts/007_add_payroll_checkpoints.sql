@@ -0,0 +1,16 @@
+-- Migration to add checkpoints for resumable bulk payroll operations
+-- One row per operation and payroll month, updated after every committed chunk
+
+CREATE TABLE IF NOT EXISTS payroll_checkpoints (
+  id INT PRIMARY KEY AUTO_INCREMENT,
+  operation VARCHAR(50) NOT NULL,
+  month INT NOT NULL,
+  year INT NOT NULL,
+  last_id INT,
+  processed_count INT DEFAULT 0,
+  error_count INT DEFAULT 0,
+  status VARCHAR(20) NOT NULL DEFAULT 'in_progress',
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  CONSTRAINT uk_payroll_checkpoints_operation_month_year UNIQUE (operation, month, year)
+);
@@ -0,0 +1,6 @@
+-- Migration to track draft payroll runs made stale by salary changes
+-- Salary edits flag the draft runs whose month they overlap; allowances and deductions are read at processing
+
+ALTER TABLE payroll_runs ADD COLUMN needs_recalculation BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX idx_payroll_runs_needs_recalculation ON payroll_runs(needs_recalculation, status);
@@ -0,0 +1,29 @@
+-- Migration to add running payslip aggregates per payroll month and department
+-- Maintained when payslips are created; backfill with `flask payroll rebuild-summary`
+-- Amounts are DOUBLE, matching the model's db.Double columns
+
+CREATE TABLE IF NOT EXISTS payroll_monthly_summary (
+  id INT PRIMARY KEY AUTO_INCREMENT,
+  year INT NOT NULL,
+  month INT NOT NULL,
+  department VARCHAR(100) NOT NULL DEFAULT '',
+  payslip_count INT NOT NULL DEFAULT 0,
+  net_sum DOUBLE NOT NULL DEFAULT 0,
+  net_min DOUBLE,
+  net_max DOUBLE,
+  net_sumsq DOUBLE NOT NULL DEFAULT 0,
+  gross_sum DOUBLE NOT NULL DEFAULT 0,
+  gross_min DOUBLE,
+  gross_max DOUBLE,
+  gross_sumsq DOUBLE NOT NULL DEFAULT 0,
+  tax_sum DOUBLE NOT NULL DEFAULT 0,
+  tax_min DOUBLE,
+  tax_max DOUBLE,
+  tax_sumsq DOUBLE NOT NULL DEFAULT 0,
+  deductions_sum DOUBLE NOT NULL DEFAULT 0,
+  deductions_min DOUBLE,
+  deductions_max DOUBLE,
+  deductions_sumsq DOUBLE NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  CONSTRAINT uk_payroll_monthly_summary_year_month_department UNIQUE (year, month, department)
+);
@@ -0,0 +1,16 @@
+-- Migration to add quantile sketches of net and gross salary per payroll month and department
+-- Maintained when payslips are created; backfill with `flask payroll rebuild-summary`
+-- sketch is MEDIUMTEXT, as the model declares for MySQL: a sketch with negative and positive
+-- values across the whole salary range can come close to TEXT's 64 KB
+
+CREATE TABLE IF NOT EXISTS payroll_distribution_sketches (
+  id INT PRIMARY KEY AUTO_INCREMENT,
+  year INT NOT NULL,
+  month INT NOT NULL,
+  department VARCHAR(100) NOT NULL DEFAULT '',
+  metric VARCHAR(50) NOT NULL,
+  value_count INT NOT NULL DEFAULT 0,
+  sketch MEDIUMTEXT NOT NULL,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  CONSTRAINT uk_payroll_distribution_sketches_key UNIQUE (year, month, department, metric)
+);
@@ -0,0 +1,6 @@
+-- Migration to index the sort keys used by cursor pagination of payroll runs and payslips
+-- Lets each page start with an index range scan instead of skipping OFFSET rows
+
+CREATE INDEX idx_payroll_runs_year_month_id ON payroll_runs(year, month, id);
+
+CREATE INDEX idx_payslips_created_at_id ON payslips(created_at, id);
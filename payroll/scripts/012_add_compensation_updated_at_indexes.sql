@@ -0,0 +1,8 @@
+-- Migration to index the update timestamps of compensation tables
+-- Lets each worker check cheaply whether its in-memory salary, allowance and deduction index is current
+
+CREATE INDEX idx_salaries_updated_at ON salaries(updated_at);
+
+CREATE INDEX idx_allowances_updated_at ON allowances(updated_at);
+
+CREATE INDEX idx_deductions_updated_at ON deductions(updated_at);
@@ -0,0 +1,4 @@
+-- Migration to record which process runs each background job
+-- A restarted server fails running jobs whose process is gone and requeues queued ones
+
+ALTER TABLE jobs ADD COLUMN worker VARCHAR(100) AFTER created_by;